@@ -5,13 +5,29 @@ This package provides an AI-powered assistant that can analyze screenshots of Le
 and provide comprehensive solutions, explanations, and coding guidance.
 """
 
-from .main import main
-from .crew_manager import LeetCodeCrewManager
-from .config import Config
-
 __version__ = "1.0.0"
 __author__ = "LeetCode AI Assistant"
 __description__ = "AI-powered LeetCode problem analysis tool"
 
 # Make main function available at package level
-__all__ = ["main", "LeetCodeCrewManager", "Config"] 
\ No newline at end of file
+__all__ = ["main", "LeetCodeCrewManager", "Config"]
+
+# Submodules are imported on first attribute access, so `import screengpt`
+# (and running one of its scripts) doesn't pay for CrewAI, Gemini or mss up front
+_LAZY_ATTRIBUTES = {
+    "main": ".main",
+    "LeetCodeCrewManager": ".crew_manager",
+    "Config": ".config",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
@@ -5,11 +5,28 @@ from crewai import Agent, LLM
 from .tools import ScreenshotTool, GeminiImageAnalysisTool
 from .config import Config
 
-# Configure LLM for non-vision tasks
-gemini_llm = LLM(
-    model=Config.GEMINI_MODEL,
-    temperature=Config.TEMPERATURE
-)
+def create_planning_llm():
+    """Create the LLM the agents use to plan tool calls, matching the vision backend"""
+    if Config.VISION_BACKEND == "ollama":
+        return LLM(
+            model=f"ollama/{Config.OLLAMA_VISION_MODEL}",
+            base_url=Config.OLLAMA_HOST,
+            temperature=Config.TEMPERATURE
+        )
+    return LLM(
+        model=Config.GEMINI_MODEL,
+        temperature=Config.TEMPERATURE
+    )
+
+# Configure LLM for non-vision tasks (created on first use, or replaced before it)
+planning_llm = None
+
+def get_planning_llm():
+    """Return the shared planning LLM, creating it on first use"""
+    global planning_llm
+    if planning_llm is None:
+        planning_llm = create_planning_llm()
+    return planning_llm
 
 def create_screen_scanner_agent():
     """Create the screen scanning agent"""
@@ -23,7 +40,7 @@ def create_screen_scanner_agent():
         tools=[ScreenshotTool()],
         verbose=Config.VERBOSE,
         allow_delegation=False,
-        llm=gemini_llm
+        llm=get_planning_llm()
     )
 
 def create_image_analysis_agent():
@@ -40,5 +57,5 @@ def create_image_analysis_agent():
         tools=[GeminiImageAnalysisTool()],
         verbose=Config.VERBOSE,
         allow_delegation=False,
-        llm=gemini_llm
+        llm=get_planning_llm()
     ) 
\ No newline at end of file
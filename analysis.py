@@ -0,0 +1,358 @@
+"""
+Vision analysis of screenshots for the LeetCode AI Assistant
+
+Plain functions used by the direct pipeline and wrapped by the CrewAI tools in
+tools.py. Nothing here imports CrewAI, so the direct pipeline starts quickly.
+"""
+import io
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from PIL import Image
+
+from .config import Config
+from .backends import VisionRequest, VisionResponse, create_backend
+from .cache import ResponseCache, perceptual_hash
+from .conversation import image_label
+from .metrics import span, record
+from .prompts import render_domain_prompt
+from .ocr import (
+    PATH_IMAGE, PATH_OCR_THUMBNAIL, PATH_OCR_TEXT, PATH_CACHE, PATH_HISTORY, PATH_TILES,
+    ocr_available, run_ocr, build_ocr_prompt,
+)
+from .tiling import (
+    TILE_SYSTEM_PROMPT, split_tiles, should_tile, tile_instruction, build_tiled_prompt,
+)
+
+_vision_backend = None
+_vision_backend_lock = threading.Lock()
+
+def get_vision_backend():
+    """Return the shared vision backend selected by Config.VISION_BACKEND, creating it on first use"""
+    global _vision_backend
+    with _vision_backend_lock:
+        if _vision_backend is None:
+            _vision_backend = create_backend()
+        return _vision_backend
+
+_text_backend = None
+_text_backend_lock = threading.Lock()
+
+def get_text_backend(backend):
+    """Return the backend for OCR text requests (Config.OCR_TEXT_MODEL on the same provider)"""
+    global _text_backend
+    if not Config.OCR_TEXT_MODEL or Config.OCR_TEXT_MODEL == backend.model:
+        return backend
+    with _text_backend_lock:
+        if _text_backend is None or _text_backend.name != backend.name:
+            _text_backend = create_backend(backend.name, model=Config.OCR_TEXT_MODEL)
+        return _text_backend
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the shared response cache, loading it from disk on first use"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+IMAGE_FORMATS = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+@dataclass
+class PreparedImage:
+    """An encoded image ready to upload to a vision model"""
+    
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    
+    def as_part(self) -> dict:
+        """Return the image as an inline blob for generate_content()"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+def prepare_image(img, max_edge=None, image_format=None, quality=None, grayscale=None) -> PreparedImage:
+    """
+    Downscale and encode an image before it is uploaded to the vision model
+    
+    Args:
+        img: RGB PIL image
+        max_edge: Longest edge in pixels (None or 0 keeps full resolution)
+        image_format: "JPEG", "WEBP" or "PNG"
+        quality: JPEG/WebP quality (1-100)
+        grayscale: Drop colour, which text-heavy screens rarely need
+        
+    Unset arguments fall back to the IMAGE_* settings in Config.
+    """
+    max_edge = Config.IMAGE_MAX_EDGE if max_edge is None else max_edge
+    image_format = (image_format or Config.IMAGE_FORMAT).upper()
+    quality = Config.IMAGE_QUALITY if quality is None else quality
+    grayscale = Config.IMAGE_GRAYSCALE if grayscale is None else grayscale
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format '{image_format}', expected one of {list(IMAGE_FORMATS)}")
+    
+    # Convert first so the resize only has one channel to filter
+    if grayscale:
+        img = img.convert("L")
+    
+    long_edge = max(img.size)
+    if max_edge and long_edge > max_edge:
+        scale = max_edge / long_edge
+        new_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        img.save(buffer, format="PNG", optimize=False)
+    elif image_format == "WEBP":
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buffer, format="JPEG", quality=quality, optimize=False)
+    
+    return PreparedImage(
+        data=buffer.getvalue(),
+        mime_type=IMAGE_FORMATS[image_format],
+        width=img.width,
+        height=img.height,
+    )
+
+# The analysis prompt goes out as the (cacheable) system prompt; this is the per-request part
+SCREENSHOT_INSTRUCTION = "Analyze the attached screenshot."
+
+def build_request(img, prompt, backend, ocr_mode=None):
+    """
+    Build the request for one screen: OCR text (with or without a thumbnail) when
+    the OCR pre-pass is on and reads the screen confidently, otherwise the image
+    
+    The analysis prompt itself becomes the request's system prompt, which backends
+    send as a stable prefix for provider-side context caching.
+    
+    Returns:
+        (VisionRequest, backend to send it to, input path)
+    """
+    ocr_mode = ocr_mode or Config.OCR_MODE
+    if ocr_mode not in Config.OCR_MODES:
+        raise ValueError(f"Unknown OCR mode '{ocr_mode}', expected one of {Config.OCR_MODES}")
+    
+    if ocr_mode != "off" and ocr_available():
+        with span("ocr") as ocr_span:
+            ocr_result = run_ocr(img)
+            ocr_span.set(words=ocr_result.words, confidence=round(ocr_result.confidence, 1))
+        if ocr_result.is_confident():
+            with_thumbnail = ocr_mode == "thumbnail"
+            images = []
+            if with_thumbnail:
+                with span("encode", thumbnail=True):
+                    images = [prepare_image(img, max_edge=Config.OCR_THUMBNAIL_EDGE)]
+            request = VisionRequest(
+                prompt=build_ocr_prompt(ocr_result, with_thumbnail),
+                images=images,
+                system_prompt=prompt,
+            )
+            if with_thumbnail:
+                return request, backend, PATH_OCR_THUMBNAIL
+            return request, get_text_backend(backend), PATH_OCR_TEXT
+        print(
+            f"[ocr] Low OCR confidence ({ocr_result.confidence:.0f}, {ocr_result.words} words "
+            f"in {ocr_result.seconds:.2f}s), sending the screenshot instead"
+        )
+    
+    # Downscale and encode before upload
+    with span("encode") as encode_span:
+        prepared = prepare_image(img)
+        encode_span.set(bytes=len(prepared.data))
+    request = VisionRequest(prompt=SCREENSHOT_INSTRUCTION, images=[prepared], system_prompt=prompt)
+    return request, backend, PATH_IMAGE
+
+def _generate(backend, request, stream, input_path):
+    """Send a request, timing the call and the model's time to first token"""
+    with span("vision", backend=backend.name, model=backend.model, input=input_path) as vision_span:
+        response = backend.generate(request, stream=stream)
+        vision_span.set(prompt_tokens=response.prompt_tokens, output_tokens=response.output_tokens)
+    response.input_path = input_path
+    record("first_token", response.time_to_first_token, backend=backend.name, input=input_path)
+    return response
+
+def analyze_image(img, backend=None, stream=None, use_cache=True, image_hash=None):
+    """
+    Run the LeetCode analysis prompt against an RGB image
+    
+    Args:
+        img: RGB PIL image
+        backend: Vision backend to use (defaults to the shared backend)
+        stream: Optional TokenStream that receives the response chunk by chunk
+        use_cache: Look the screen up in the response cache first (if Config.RESPONSE_CACHE)
+        image_hash: The image's perceptual_hash, if the caller already has it
+        
+    Returns:
+        The backend's VisionResponse (backend "cache" for a cache hit); its
+        input_path records whether the image or OCR text was sent (see build_request),
+        and its image_hash carries the perceptual hash if one was given or computed
+    """
+    if backend is None:
+        backend = get_vision_backend()
+    
+    # Get the LeetCode analysis prompt (re-read only when the file changes)
+    rendered_prompt = render_domain_prompt("leetcode")
+    leetcode_prompt = rendered_prompt.text
+    
+    cache = get_response_cache() if use_cache and Config.RESPONSE_CACHE else None
+    if cache is not None:
+        started_at = time.perf_counter()
+        with span("cache_lookup") as lookup_span:
+            if image_hash is None:
+                image_hash = perceptual_hash(img)
+            prompt_key = rendered_prompt.version
+            cached_text = cache.get(image_hash, prompt_key, backend.model)
+            lookup_span.set(hit=cached_text is not None)
+        if cached_text is not None:
+            if stream is not None:
+                stream.write(cached_text)
+            finished_at = time.perf_counter()
+            return VisionResponse(
+                text=cached_text,
+                backend="cache",
+                model=backend.model,
+                started_at=started_at,
+                first_token_at=finished_at,
+                finished_at=finished_at,
+                input_path=PATH_CACHE,
+                image_hash=image_hash,
+            )
+    
+    if should_tile(img, backend):
+        response = analyze_tiled(img, leetcode_prompt, backend, stream=stream)
+    else:
+        request, request_backend, input_path = build_request(img, leetcode_prompt, backend)
+        response = _generate(request_backend, request, stream, input_path)
+    if cache is not None:
+        cache.put(image_hash, prompt_key, backend.model, response.text)
+    response.image_hash = image_hash
+    return response
+
+def transcribe_tiles(img, backend, tile_size=None, overlap=None, max_tiles=None):
+    """
+    Transcribe the overlapping tiles of an image with concurrent requests
+    
+    Returns:
+        (tiles, rows, columns, responses); a tile whose request failed has None
+        as its response
+    """
+    tiles, rows, columns = split_tiles(img, tile_size, overlap, max_tiles)
+    
+    def extract(tile):
+        started = time.perf_counter()
+        prepared = prepare_image(tile.image, max_edge=Config.TILE_SIZE)
+        request = VisionRequest(
+            prompt=tile_instruction(tile, len(tiles), rows, columns),
+            images=[prepared],
+            system_prompt=TILE_SYSTEM_PROMPT,
+        )
+        return backend.generate(request), time.perf_counter() - started
+    
+    responses, errors = [], []
+    with span("tiles", count=len(tiles), rows=rows, columns=columns) as tiles_span:
+        with ThreadPoolExecutor(max_workers=max(1, min(Config.TILE_WORKERS, len(tiles)))) as pool:
+            futures = [pool.submit(extract, tile) for tile in tiles]
+            for tile, future in zip(tiles, futures):
+                try:
+                    response, seconds = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    responses.append(None)
+                    continue
+                # Worker threads have no trace of their own, so the tile timings are recorded here
+                record("tile_extract", seconds, tile=tile.index, backend=backend.name)
+                responses.append(response)
+        tiles_span.set(failed=len(errors))
+    if errors and len(errors) == len(tiles):
+        raise errors[0]
+    if errors:
+        print(f"[tiling] {len(errors)} of {len(tiles)} tiles could not be transcribed: {errors[0]}")
+    return tiles, rows, columns, responses
+
+def analyze_tiled(img, prompt, backend, stream=None):
+    """
+    Analyze a screen through tiling: concurrent tile transcription, then one
+    text request that reasons over all the transcripts
+    
+    The returned response's token counts include the tile requests, and its time
+    to first token runs from the start of the tile pass.
+    """
+    started_at = time.perf_counter()
+    tiles, rows, columns, responses = transcribe_tiles(img, backend)
+    if not tiles:
+        # Nothing but blank tiles: let the model see the screen as it is
+        request, request_backend, input_path = build_request(img, prompt, backend)
+        return _generate(request_backend, request, stream, input_path)
+    
+    transcripts = [response.text if response is not None else None for response in responses]
+    request = VisionRequest(
+        prompt=build_tiled_prompt(tiles, transcripts, rows, columns),
+        images=[],
+        system_prompt=prompt,
+    )
+    response = _generate(get_text_backend(backend), request, stream, PATH_TILES)
+    response.started_at = started_at
+    for tile_response in responses:
+        if tile_response is None:
+            continue
+        response.prompt_tokens = (response.prompt_tokens or 0) + (tile_response.prompt_tokens or 0)
+        response.output_tokens = (response.output_tokens or 0) + (tile_response.output_tokens or 0)
+        response.cached_prompt_tokens = (response.cached_prompt_tokens or 0) + (tile_response.cached_prompt_tokens or 0)
+    return response
+
+def ask_follow_up(conversation, question, img=None, backend=None, stream=None):
+    """
+    Answer a follow-up question in the context of a conversation
+    
+    Args:
+        conversation: conversation.Conversation holding the earlier turns
+        question: The user's question
+        img: Optional RGB PIL image of the current screen
+        backend: Vision backend to use (defaults to the shared backend)
+        stream: Optional TokenStream that receives the response chunk by chunk
+        
+    A screen the model has already seen is referenced by its hash instead of
+    being uploaded again. The question and answer are added to the conversation.
+    """
+    if backend is None:
+        backend = get_vision_backend()
+    rendered_prompt = render_domain_prompt("leetcode")
+    
+    images, image_hash, image_note = [], None, ""
+    if img is not None:
+        image_hash = perceptual_hash(img)
+        seen_hash = conversation.find_image(image_hash)
+        if seen_hash is not None:
+            image_hash = seen_hash
+            image_note = f"The screen still shows {image_label(seen_hash)} from above, so it is not attached again."
+        else:
+            with span("encode"):
+                images = [prepare_image(img)]
+            image_note = f"The current screen is attached as {image_label(image_hash)}."
+    
+    request = VisionRequest(
+        prompt=conversation.render(question, image_note),
+        images=images,
+        system_prompt=rendered_prompt.text,
+    )
+    response = _generate(backend, request, stream, PATH_IMAGE if images else PATH_HISTORY)
+    conversation.add("user", question, image_hash=image_hash)
+    conversation.add("assistant", response.text)
+    return response
+
+def analyze_screenshot(file_path: str, backend=None):
+    """Run the LeetCode analysis prompt against a screenshot file and return the VisionResponse"""
+    # Load and prepare the image
+    img = Image.open(file_path)
+    img = img.convert("RGB")
+    return analyze_image(img, backend=backend)
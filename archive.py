@@ -0,0 +1,377 @@
+"""
+Content-addressed screenshot archive for the LeetCode AI Assistant
+
+Each distinct frame is stored once, under objects/ab/cd/<sha256>.png. A frame
+whose perceptual hash is within Config.ARCHIVE_MAX_DISTANCE bits of a recently
+stored one is recorded as a reference to that object rather than written again.
+Every frame gets a line in index.jsonl, whether it was stored or referenced, so
+browsing the archive in time order reads one file instead of listing directories.
+
+A background pass enforces Config.ARCHIVE_MAX_BYTES and ARCHIVE_MAX_AGE_DAYS. It
+deletes objects no frame refers to any more and compacts the index, which keeps
+disk usage and load time bounded however long capture runs.
+
+    python -m screengpt.archive --stats
+    python -m screengpt.archive --import periodic_screenshots
+"""
+import io
+import os
+import json
+import time
+import bisect
+import hashlib
+import argparse
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Optional
+from PIL import Image
+
+from .config import Config
+from .cache import perceptual_hash
+
+INDEX_FILE = "index.jsonl"
+OBJECTS_DIR = "objects"
+SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+@dataclass
+class ArchiveEntry:
+    """One archived frame"""
+
+    captured_at: float
+    sha256: str  # Object holding the pixels; for a reference, the frame it resembles
+    width: int
+    height: int
+    kind: str  # "stored", "duplicate" (identical pixels) or "reference" (near-duplicate)
+    bytes: int = 0  # Size of the object written for this frame (0 unless stored)
+    phash: Optional[int] = None  # Kept for stored frames only, which are what new frames are compared with
+    source: str = ""
+
+    def to_json(self) -> str:
+        record = asdict(self)
+        record["phash"] = f"{self.phash:x}" if self.phash is not None else None
+        return json.dumps(record, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "ArchiveEntry":
+        record = json.loads(line)
+        if record.get("phash") is not None:
+            record["phash"] = int(record["phash"], 16)
+        return cls(**record)
+
+def content_hash(img) -> str:
+    """SHA-256 of an image's size and raw pixels (no encoding needed)"""
+    digest = hashlib.sha256(f"{img.mode}:{img.width}x{img.height}:".encode("ascii"))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+class ScreenshotArchive:
+    """Deduplicating frame store with a time-ordered index"""
+
+    def __init__(self, root=None, max_bytes=None, max_age_days=None, max_distance=None, recent_window=None):
+        self.root = root or Config.ARCHIVE_DIR
+        self.max_bytes = Config.ARCHIVE_MAX_BYTES if max_bytes is None else max_bytes
+        max_age_days = Config.ARCHIVE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.max_age = max_age_days * 24 * 60 * 60 if max_age_days else None
+        self.max_distance = Config.ARCHIVE_MAX_DISTANCE if max_distance is None else max_distance
+        self.index_path = os.path.join(self.root, INDEX_FILE)
+        os.makedirs(os.path.join(self.root, OBJECTS_DIR), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._entries = []  # Sorted by captured_at
+        self._times = []  # captured_at of each entry, for bisect
+        self._objects = {}  # sha256 -> [bytes on disk, entries referring to it]
+        self._recent = deque(maxlen=recent_window or Config.ARCHIVE_RECENT_WINDOW)  # (phash, sha256) of stored frames
+        self._index = None
+        self._retention_thread = None
+        self._stop = threading.Event()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = ArchiveEntry.from_json(line)
+                except (ValueError, TypeError):
+                    continue  # Torn last line from an interrupted write
+                self._insert(entry)
+                if entry.kind == "stored" and entry.phash is not None:
+                    self._recent.append((entry.phash, entry.sha256))
+        # Objects whose stored frame was pruned while references to it remain
+        for sha256, record in self._objects.items():
+            if not record[0]:
+                try:
+                    record[0] = os.path.getsize(self.object_path(sha256))
+                except OSError:
+                    pass
+
+    def _insert(self, entry):
+        position = bisect.bisect_right(self._times, entry.captured_at)
+        self._times.insert(position, entry.captured_at)
+        self._entries.insert(position, entry)
+        record = self._objects.setdefault(entry.sha256, [0, 0])
+        record[0] = max(record[0], entry.bytes)
+        record[1] += 1
+
+    def object_path(self, sha256: str) -> str:
+        """Where the pixels of an object live"""
+        return os.path.join(self.root, OBJECTS_DIR, sha256[:2], sha256[2:4], f"{sha256}.png")
+
+    def _append_index(self, entry):
+        if self._index is None:
+            self._index = open(self.index_path, "a", encoding="utf-8")
+        self._index.write(entry.to_json() + "\n")
+        self._index.flush()
+
+    def _find_similar(self, phash):
+        for seen_hash, sha256 in reversed(self._recent):
+            if bin(seen_hash ^ phash).count("1") <= self.max_distance and sha256 in self._objects:
+                return sha256
+        return None
+
+    def add(self, img, captured_at=None, phash=None, source="", compress_level=6) -> ArchiveEntry:
+        """
+        Archive an RGB PIL image
+
+        Args:
+            captured_at: time.time() of the grab (defaults to now)
+            phash: The frame's perceptual_hash, if the caller already has it
+            source: Free-form label, e.g. "hotkey" or "periodic"
+            compress_level: zlib level for a newly stored PNG
+
+        Returns:
+            The index entry; object_path(entry.sha256) holds the pixels
+        """
+        captured_at = time.time() if captured_at is None else captured_at
+        phash = perceptual_hash(img) if phash is None else phash
+        # Retention may delete an object whenever the lock is free, so whether an
+        # object exists is only decided under the same lock that records the entry
+        with self._lock:
+            similar = self._find_similar(phash)
+            if similar is not None:
+                return self._record(ArchiveEntry(captured_at, similar, img.width, img.height, "reference",
+                                                 source=source))
+        sha256 = content_hash(img)
+        with self._lock:
+            if sha256 in self._objects:
+                return self._record(ArchiveEntry(captured_at, sha256, img.width, img.height, "duplicate",
+                                                 source=source))
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG", compress_level=compress_level)
+        data = buffer.getvalue()
+        path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers never see a half-written object
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            if sha256 in self._objects:
+                # Another thread stored the same pixels meanwhile
+                os.remove(temp_path)
+                return self._record(ArchiveEntry(captured_at, sha256, img.width, img.height, "duplicate",
+                                                 source=source))
+            os.replace(temp_path, path)
+            return self._record(ArchiveEntry(captured_at, sha256, img.width, img.height, "stored",
+                                             bytes=len(data), phash=phash, source=source))
+
+    def _record(self, entry):
+        """Add an entry to the index (call with the lock held)"""
+        self._insert(entry)
+        self._append_index(entry)
+        if entry.kind == "stored":
+            self._recent.append((entry.phash, entry.sha256))
+        return entry
+
+    def frames(self, since=None, until=None):
+        """Index entries in capture order, optionally limited to [since, until)"""
+        with self._lock:
+            start = bisect.bisect_left(self._times, since) if since is not None else 0
+            end = bisect.bisect_left(self._times, until) if until is not None else len(self._times)
+            return self._entries[start:end]
+
+    def object_paths(self, since=None, until=None):
+        """Paths of the distinct objects in order of their first appearance"""
+        seen = set()
+        paths = []
+        for entry in self.frames(since, until):
+            if entry.sha256 not in seen:
+                seen.add(entry.sha256)
+                paths.append(self.object_path(entry.sha256))
+        return paths
+
+    def enforce_retention(self, now=None) -> dict:
+        """
+        Drop the oldest frames until none is older than the age limit and the
+        objects fit in the size limit, delete unreferenced objects and compact
+        the index
+
+        Returns:
+            Counts of removed frames and objects and bytes freed
+        """
+        now = time.time() if now is None else now
+        cutoff = now - self.max_age if self.max_age else None
+        with self._lock:
+            total = sum(size for size, _ in self._objects.values())
+            freed, freed_bytes, drop = [], 0, 0
+            while drop < len(self._entries):
+                entry = self._entries[drop]
+                too_old = cutoff is not None and entry.captured_at < cutoff
+                too_big = self.max_bytes and total > self.max_bytes
+                if not (too_old or too_big):
+                    break
+                record = self._objects[entry.sha256]
+                record[1] -= 1
+                if record[1] == 0:
+                    total -= record[0]
+                    freed_bytes += record[0]
+                    freed.append(entry.sha256)
+                drop += 1
+            if not drop:
+                return {"frames": 0, "objects": 0, "bytes": 0}
+
+            del self._entries[:drop]
+            del self._times[:drop]
+            for sha256 in freed:
+                del self._objects[sha256]
+                try:
+                    os.remove(self.object_path(sha256))
+                except FileNotFoundError:
+                    pass
+            self._recent = deque(
+                ((h, s) for h, s in self._recent if s in self._objects), maxlen=self._recent.maxlen
+            )
+
+            # Rewrite the index with the surviving entries
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for entry in self._entries:
+                    f.write(entry.to_json() + "\n")
+            os.replace(temp_path, self.index_path)
+        return {"frames": drop, "objects": len(freed), "bytes": freed_bytes}
+
+    def _retention_loop(self, interval):
+        # The first pass runs at once, so an index that outgrew the limits while
+        # nothing was capturing is pruned and compacted right after loading
+        while True:
+            try:
+                removed = self.enforce_retention()
+                if removed["frames"]:
+                    print(f"[archive] Retention removed {removed['frames']} frames, {removed['objects']} objects "
+                          f"({removed['bytes'] / 2**20:.1f} MB)")
+            except Exception as e:
+                print(f"[archive] Retention pass failed: {e}")
+            if self._stop.wait(interval):
+                return
+
+    def start_retention(self, interval=None):
+        """Run enforce_retention() now and then every interval seconds in a daemon thread"""
+        if self._retention_thread is not None:
+            return
+        interval = interval or Config.ARCHIVE_RETENTION_INTERVAL
+        self._retention_thread = threading.Thread(
+            target=self._retention_loop, args=(interval,), name="archive-retention", daemon=True
+        )
+        self._retention_thread.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            frames = len(self._entries)
+            objects = len(self._objects)
+            stored_bytes = sum(size for size, _ in self._objects.values())
+            kinds = {}
+            for entry in self._entries:
+                kinds[entry.kind] = kinds.get(entry.kind, 0) + 1
+        index_bytes = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        return {
+            "frames": frames,
+            "objects": objects,
+            "stored": kinds.get("stored", 0),
+            "duplicates": kinds.get("duplicate", 0),
+            "references": kinds.get("reference", 0),
+            "object_mb": stored_bytes / 2**20,
+            "index_mb": index_bytes / 2**20,
+            "dedup_ratio": frames / objects if objects else 0.0,
+        }
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+
+_archive = None
+_archive_lock = threading.Lock()
+
+def get_archive() -> ScreenshotArchive:
+    """
+    Return the shared archive at Config.ARCHIVE_DIR, starting its retention thread on first use
+
+    Loading replays the whole index, so call this once at startup off the
+    hotkey and analysis threads (see open_archive_in_background).
+    """
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = ScreenshotArchive()
+            _archive.start_retention()
+        return _archive
+
+def open_archive_in_background():
+    """Load the shared archive on a daemon thread so the first archived frame doesn't wait for it"""
+    threading.Thread(target=get_archive, name="archive-load", daemon=True).start()
+
+def archive_frame(img, **kwargs):
+    """get_archive().add(), resolving the archive on the calling (encoder) thread"""
+    return get_archive().add(img, **kwargs)
+
+def import_directory(archive, directory, delete=False):
+    """Move a folder of timestamp-named screenshots into the archive, oldest first"""
+    names = [name for name in os.listdir(directory) if name.lower().endswith(SUPPORTED_EXTENSIONS)]
+    paths = sorted((os.path.join(directory, name) for name in names), key=os.path.getmtime)
+    for path in paths:
+        with Image.open(path) as img:
+            archive.add(img.convert("RGB"), captured_at=os.path.getmtime(path), source=f"import:{directory}")
+        if delete:
+            os.remove(path)
+    return len(paths)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the screenshot archive")
+    parser.add_argument("--root", default=None, help=f"Archive directory (default: {Config.ARCHIVE_DIR})")
+    parser.add_argument("--stats", action="store_true", help="Show frame, object and disk usage counts")
+    parser.add_argument("--list", type=int, metavar="N", help="List the newest N frames")
+    parser.add_argument("--prune", action="store_true", help="Apply the retention limits now")
+    parser.add_argument("--import", dest="import_dir", metavar="DIR", help="Archive the screenshots in a folder")
+    parser.add_argument("--delete-imported", action="store_true", help="Remove imported files afterwards")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    archive = ScreenshotArchive(root=args.root)
+    print(f"Loaded {archive.root} in {(time.perf_counter() - started) * 1000:.1f} ms")
+    if args.import_dir:
+        count = import_directory(archive, args.import_dir, delete=args.delete_imported)
+        print(f"Imported {count} screenshots from {args.import_dir}")
+    if args.prune:
+        removed = archive.enforce_retention()
+        print(f"Removed {removed['frames']} frames and {removed['objects']} objects ({removed['bytes'] / 2**20:.1f} MB)")
+    if args.list:
+        for entry in archive.frames()[-args.list:]:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.captured_at))
+            print(f"{stamp}  {entry.kind:<9}  {entry.width}x{entry.height}  {archive.object_path(entry.sha256)}")
+    if args.stats or not (args.import_dir or args.prune or args.list):
+        stats = archive.stats()
+        print(f"{stats['frames']} frames in {stats['objects']} objects ({stats['stored']} stored, "
+              f"{stats['duplicates']} duplicates, {stats['references']} near-duplicate references, "
+              f"{stats['dedup_ratio']:.1f}x dedup); {stats['object_mb']:.1f} MB of objects, "
+              f"{stats['index_mb']:.2f} MB index")
+    archive.close()
+
+if __name__ == "__main__":
+    main()
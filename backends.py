@@ -0,0 +1,473 @@
+"""
+Vision model backends for the LeetCode AI Assistant
+
+Every backend takes a VisionRequest and returns a VisionResponse, so the rest of
+the pipeline doesn't care whether the answer came from Gemini, a local Ollama
+model or the offline fake used by tests and benchmarks.
+"""
+import time
+import hashlib
+import datetime
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .config import Config
+
+@dataclass
+class VisionRequest:
+    """
+    A prompt plus zero or more encoded images (analysis.PreparedImage)
+
+    system_prompt is the large fixed part shared by every analysis. Backends
+    send it as a separate, byte-identical prefix so the provider can cache it.
+    """
+
+    prompt: str
+    images: List = field(default_factory=list)
+    temperature: Optional[float] = None
+    system_prompt: Optional[str] = None
+
+    @property
+    def payload_bytes(self) -> int:
+        """Approximate upload size of the request"""
+        return (len(self.prompt.encode("utf-8")) + len((self.system_prompt or "").encode("utf-8"))
+                + sum(len(image.data) for image in self.images))
+
+    @property
+    def prefix_key(self) -> Optional[str]:
+        """Stable identifier of the system prompt"""
+        if not self.system_prompt:
+            return None
+        return hashlib.sha1(self.system_prompt.encode("utf-8")).hexdigest()[:16]
+
+@dataclass
+class VisionResponse:
+    """The text a backend produced plus what it cost"""
+
+    text: str
+    backend: str
+    model: str
+    started_at: float
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_prompt_tokens: Optional[int] = None  # Part of prompt_tokens served from the provider's cache
+    input_path: Optional[str] = None  # What the request was built from, see ocr.PATH_*
+    image_hash: Optional[int] = None  # perceptual_hash of the analyzed screen, when one was computed
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_seconds(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def billed_prompt_tokens(self):
+        """Prompt tokens the provider had to process (and bill) for this request"""
+        if self.prompt_tokens is None:
+            return None
+        return self.prompt_tokens - (self.cached_prompt_tokens or 0)
+
+class VisionBackend:
+    """Base class for vision backends"""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+        # Running totals, so the savings from context caching are visible per backend
+        self.usage = {"requests": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "output_tokens": 0}
+        self._usage_lock = threading.Lock()
+
+    def _finish(self, response, stream=None) -> VisionResponse:
+        """Add a response to the usage totals and hand its token counts to the stream"""
+        with self._usage_lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += response.prompt_tokens or 0
+            self.usage["cached_prompt_tokens"] += response.cached_prompt_tokens or 0
+            self.usage["output_tokens"] += response.output_tokens or 0
+        if stream is not None:
+            stream.record_usage(response.output_tokens, response.prompt_tokens, response.cached_prompt_tokens)
+        return response
+
+    def generate(self, request: VisionRequest, stream=None) -> VisionResponse:
+        """
+        Run a request against the model
+
+        Args:
+            request: Prompt and images to send
+            stream: Optional TokenStream that receives the response chunk by chunk
+        """
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Open connections / load the model so the first real request is fast"""
+
+def _chunk_text(chunk) -> str:
+    """Text of a streamed Gemini chunk, or "" for one without text parts"""
+    try:
+        return chunk.text
+    except ValueError:
+        # The SDK raises instead of returning "" when a chunk has no parts
+        return ""
+
+class GeminiBackend(VisionBackend):
+    """Google Gemini through the google-generativeai SDK"""
+
+    name = "gemini"
+
+    def __init__(self, model=None, api_key=None):
+        import google.generativeai as genai
+        super().__init__(model or Config.GEMINI_VISION_MODEL)
+        self._genai = genai
+        if Config.GEMINI_API_ENDPOINT:
+            genai.configure(
+                api_key=api_key or Config.initialize(),
+                transport="rest",
+                client_options={"api_endpoint": Config.GEMINI_API_ENDPOINT},
+            )
+        else:
+            genai.configure(api_key=api_key or Config.initialize())
+        self._model = genai.GenerativeModel(
+            self.model,
+            generation_config={"temperature": Config.TEMPERATURE}
+        )
+        # System prompt key -> (GenerativeModel, CachedContent or None, refresh deadline)
+        self._prefix_models = {}
+        self._prefix_lock = threading.Lock()
+        self._prefix_pending = {}  # System prompt key -> Event set once its model is ready
+
+    def _contents(self, request):
+        contents = [request.prompt] if request.prompt else []
+        return contents + [
+            {"mime_type": image.mime_type, "data": image.data} for image in request.images
+        ]
+
+    def _create_cached_model(self, request):
+        """Upload the system prompt as cached content and return a model bound to it"""
+        ttl = Config.CONTEXT_CACHE_TTL_SECONDS
+        cached = self._genai.caching.CachedContent.create(
+            model=f"models/{self.model}",
+            display_name=f"screengpt-{request.prefix_key}",
+            system_instruction=request.system_prompt,
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        model = self._genai.GenerativeModel.from_cached_content(
+            cached,
+            generation_config={"temperature": Config.TEMPERATURE}
+        )
+        return model, cached
+
+    def _model_for(self, request):
+        """
+        Return the model to send a request to
+
+        The system prompt is uploaded once as Gemini cached content and billed at
+        the cached rate afterwards. The cache is re-created shortly before its TTL
+        runs out; if the model or prompt can't be cached (e.g. the prompt is below
+        the minimum cacheable size) it is sent inline as the system instruction.
+        """
+        key = request.prefix_key
+        if key is None:
+            return self._model
+        now = time.monotonic()
+        with self._prefix_lock:
+            entry = self._prefix_models.get(key)
+            if entry is not None and (entry[2] is None or now < entry[2]):
+                return entry[0]
+            pending = self._prefix_pending.get(key)
+            if pending is None:
+                self._prefix_pending[key] = threading.Event()
+            elif entry is not None:
+                # Another thread is replacing it; the old cache is valid until its TTL runs out
+                return entry[0]
+        if pending is not None:
+            pending.wait()
+            return self._model_for(request)
+
+        # Creating the cache is a network round trip, so other prompts aren't held up meanwhile
+        try:
+            model, cached, refresh_at = None, None, None
+            if Config.CONTEXT_CACHE:
+                try:
+                    model, cached = self._create_cached_model(request)
+                    refresh_at = now + Config.CONTEXT_CACHE_TTL_SECONDS * 0.9
+                except Exception as e:
+                    print(f"[GeminiBackend] Context caching unavailable, sending the prompt inline: {e}")
+            if model is None:
+                model = self._genai.GenerativeModel(
+                    self.model,
+                    system_instruction=request.system_prompt,
+                    generation_config={"temperature": Config.TEMPERATURE}
+                )
+            with self._prefix_lock:
+                # Only the current prompt version is kept. Replaced caches are left to
+                # expire with their TTL rather than deleted, since requests still
+                # streaming against them would fail
+                self._prefix_models = {key: (model, cached, refresh_at)}
+            return model
+        finally:
+            with self._prefix_lock:
+                self._prefix_pending.pop(key).set()
+
+    def generate(self, request, stream=None):
+        started_at = time.perf_counter()
+        kwargs = {}
+        if request.temperature is not None:
+            kwargs["generation_config"] = {"temperature": request.temperature}
+        model = self._model_for(request)
+
+        if stream is None:
+            result = model.generate_content(self._contents(request), **kwargs)
+            finished_at = time.perf_counter()
+            text = result.text
+            first_token_at = finished_at
+        else:
+            result = model.generate_content(self._contents(request), stream=True, **kwargs)
+            chunks = []
+            first_token_at = None
+            for chunk in result:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                # Chunks that only carry usage or a finish reason have no text
+                chunk_text = _chunk_text(chunk)
+                chunks.append(chunk_text)
+                stream.write(chunk_text)
+            finished_at = time.perf_counter()
+            text = "".join(chunks)
+
+        usage = getattr(result, "usage_metadata", None)
+        response = VisionResponse(
+            text=text,
+            backend=self.name,
+            model=self.model,
+            started_at=started_at,
+            first_token_at=first_token_at,
+            finished_at=finished_at,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+            # Includes Gemini's implicit caching of repeated prefixes
+            cached_prompt_tokens=getattr(usage, "cached_content_token_count", None),
+        )
+        return self._finish(response, stream)
+
+    def warm_up(self):
+        # A metadata request establishes the API connection without generating anything
+        self._genai.get_model(f"models/{self.model}")
+
+class OllamaBackend(VisionBackend):
+    """A local model served by Ollama, kept resident between requests"""
+
+    name = "ollama"
+
+    def __init__(self, model=None, host=None, keep_alive=None):
+        import ollama
+        super().__init__(model or Config.OLLAMA_VISION_MODEL)
+        self.keep_alive = keep_alive or Config.OLLAMA_KEEP_ALIVE
+        # One client (and its HTTP connection pool) for the lifetime of the backend
+        self._client = ollama.Client(host=host or Config.OLLAMA_HOST)
+        self._prefix_tokens = {}  # system prompt key -> tokens in the evaluated prefix
+        self._last_prefix_key = None
+        self._prefix_lock = threading.Lock()
+        self._prefix_pending = {}  # System prompt key -> Event set once its prefix is primed
+
+    def _messages(self, request):
+        messages = []
+        if request.system_prompt:
+            # Byte-identical leading messages let Ollama reuse the KV cache of the
+            # prefix from the previous request instead of re-evaluating it
+            messages.append({"role": "system", "content": request.system_prompt})
+        messages.append({
+            "role": "user",
+            "content": request.prompt,
+            "images": [image.data for image in request.images],
+        })
+        return messages
+
+    def _prime_prefix(self, request):
+        """
+        Evaluate a new system prompt on its own, once
+
+        This loads the prefix into the KV cache ahead of the first real request
+        and tells us how many tokens later requests skip.
+        """
+        key = request.prefix_key
+        if key is None or not Config.CONTEXT_CACHE:
+            return
+        with self._prefix_lock:
+            if key in self._prefix_tokens:
+                return
+            pending = self._prefix_pending.get(key)
+            if pending is None:
+                self._prefix_pending[key] = threading.Event()
+        if pending is not None:
+            # Another worker is priming it; wait so this request reuses the prefix
+            pending.wait()
+            return
+
+        tokens = 0
+        try:
+            result = self._client.chat(
+                model=self.model,
+                messages=[{"role": "system", "content": request.system_prompt}],
+                options={"num_predict": 1},
+                keep_alive=self.keep_alive,
+            )
+            tokens = result.get("prompt_eval_count") or 0
+        except Exception as e:
+            print(f"[OllamaBackend] Could not prime the prompt prefix: {e}")
+        finally:
+            with self._prefix_lock:
+                self._prefix_tokens[key] = tokens
+                if tokens:
+                    self._last_prefix_key = key
+                self._prefix_pending.pop(key).set()
+
+    def generate(self, request, stream=None):
+        self._prime_prefix(request)
+        started_at = time.perf_counter()
+        options = {"temperature": request.temperature if request.temperature is not None else Config.TEMPERATURE}
+        kwargs = dict(
+            model=self.model,
+            messages=self._messages(request),
+            options=options,
+            keep_alive=self.keep_alive,
+        )
+
+        if stream is None:
+            result = self._client.chat(**kwargs)
+            finished_at = time.perf_counter()
+            text = result["message"]["content"]
+            first_token_at = finished_at
+        else:
+            chunks = []
+            first_token_at = None
+            result = None
+            for chunk in self._client.chat(stream=True, **kwargs):
+                text = chunk["message"]["content"]
+                if text and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks.append(text)
+                stream.write(text)
+                result = chunk
+            finished_at = time.perf_counter()
+            text = "".join(chunks)
+
+        # The final (or only) message carries Ollama's token counts. prompt_eval_count
+        # only covers tokens that were evaluated; a prefix reused from the KV cache
+        # (same system prompt as the previous request) is counted as cached.
+        evaluated = result.get("prompt_eval_count") if result else None
+        key = request.prefix_key
+        with self._prefix_lock:
+            cached = self._prefix_tokens.get(key, 0) if key is not None and key == self._last_prefix_key else 0
+            self._last_prefix_key = key
+        response = VisionResponse(
+            text=text,
+            backend=self.name,
+            model=self.model,
+            started_at=started_at,
+            first_token_at=first_token_at,
+            finished_at=finished_at,
+            prompt_tokens=evaluated + cached if evaluated is not None else None,
+            output_tokens=result.get("eval_count") if result else None,
+            cached_prompt_tokens=cached if evaluated is not None else None,
+        )
+        return self._finish(response, stream)
+
+    def warm_up(self):
+        # An empty generate request loads the model into memory without producing output
+        self._client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+
+class FakeBackend(VisionBackend):
+    """Offline backend with configurable timing, for tests and benchmarks"""
+
+    name = "fake"
+
+    def __init__(self, model="fake", first_token_latency=None, tokens_per_second=None,
+                 uplink_mbps=None, prefill_tokens_per_second=None, response_text=None):
+        super().__init__(model)
+        self.first_token_latency = Config.FAKE_FIRST_TOKEN_LATENCY if first_token_latency is None else first_token_latency
+        self.tokens_per_second = tokens_per_second or Config.FAKE_TOKENS_PER_SECOND
+        self.uplink_mbps = uplink_mbps
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.response_text = response_text or (
+            "**Problem Analysis**: Fake analysis of the screenshot.\n\n"
+            "**Complete Solution**:\n```python\nclass Solution:\n    pass\n```\n"
+        )
+        self.requests = 0
+        self.last_response = None
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_prompt_tokens(request):
+        """~4 characters per text token, 258 tokens per image (Gemini's per-tile cost)"""
+        text = request.prompt + (request.system_prompt or "")
+        return len(text) // 4 + 258 * len(request.images)
+
+    def _chunks(self):
+        # Roughly one token per word, like a real stream
+        words = self.response_text.split(" ")
+        return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+    def generate(self, request, stream=None):
+        started_at = time.perf_counter()
+        prompt_tokens = self.estimate_prompt_tokens(request)
+        # Like a provider cache: a system prompt seen before is neither uploaded nor re-processed
+        cached_tokens = 0
+        with self._lock:
+            self.requests += 1
+            if request.prefix_key is not None and Config.CONTEXT_CACHE:
+                if request.prefix_key in self._cached_prefixes:
+                    cached_tokens = len(request.system_prompt) // 4
+                self._cached_prefixes.add(request.prefix_key)
+        if self.uplink_mbps:
+            payload_bytes = request.payload_bytes - (len(request.system_prompt.encode("utf-8")) if cached_tokens else 0)
+            time.sleep(payload_bytes * 8 / (self.uplink_mbps * 1_000_000))
+        if self.prefill_tokens_per_second:
+            time.sleep((prompt_tokens - cached_tokens) / self.prefill_tokens_per_second)
+        time.sleep(self.first_token_latency)
+        first_token_at = time.perf_counter()
+
+        chunks = self._chunks()
+        delay = 1 / self.tokens_per_second
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(delay)
+            if stream is not None:
+                stream.write(chunk)
+
+        response = VisionResponse(
+            text=self.response_text,
+            backend=self.name,
+            model=self.model,
+            started_at=started_at,
+            first_token_at=first_token_at,
+            finished_at=time.perf_counter(),
+            prompt_tokens=prompt_tokens,
+            output_tokens=len(chunks),
+            cached_prompt_tokens=cached_tokens,
+        )
+        self.last_response = response
+        return self._finish(response, stream)
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    OllamaBackend.name: OllamaBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+def create_backend(name=None, **kwargs) -> VisionBackend:
+    """Create the backend named by Config.VISION_BACKEND (or `name`)"""
+    name = name or Config.VISION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown vision backend '{name}', expected one of {list(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the LeetCode AI Assistant
+Run a benchmark as a module, e.g.: python -m screengpt.benchmarks.pipeline_latency
+"""
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark: fixture screenshots through capture prep, analysis and logging
+
+Each fixture is handed to the crew manager as if it had just been grabbed. Chrome
+margins and auto-crop are applied to it. It is then analyzed by the real Gemini
+or Ollama client, which talks to the local fake server (benchmarks/fake_server.py),
+and the answer is stored in a throwaway solution store and markdown log. No
+display, network or API key is needed, so it runs on a headless CI box.
+
+Reports throughput, end-to-end and per-stage latency percentiles (from the
+pipeline's own timing spans), errors and memory. With --baseline the run fails
+when it is slower or heavier than a saved one.
+
+Usage:
+    python -m screengpt.benchmarks.end_to_end --backend gemini --fixtures periodic_screenshots --runs 3
+    python -m screengpt.benchmarks.end_to_end --backend ollama --error-rate 0.05 --save-baseline e2e.json
+    python -m screengpt.benchmarks.end_to_end --baseline e2e.json --tolerance 0.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .. import capture, crew_manager, metrics
+from ..capture import CaptureResult, trim_capture
+from ..config import Config
+from .fake_server import FakeModelServer
+from .fixtures import load_fixtures
+
+# Metrics where a higher value is better; all others regress upwards
+HIGHER_IS_BETTER = ("throughput_per_second",)
+
+def rss_mb():
+    """(current, peak) resident set size of this process in MB, None where unavailable"""
+    current = peak = None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KB on Linux
+    except ImportError:
+        pass
+    return current, peak
+
+def configure(args, workdir, server):
+    """Point the app's files at workdir and its backend at the fake server"""
+    Config.VISION_BACKEND = args.backend
+    Config.GEMINI_API_ENDPOINT = server.url if server else None
+    Config.OLLAMA_HOST = server.url if server else Config.OLLAMA_HOST
+    Config.FAKE_FIRST_TOKEN_LATENCY = args.first_token_latency
+    Config.FAKE_TOKENS_PER_SECOND = args.tokens_per_second
+    Config.STREAM_RESPONSES = not args.no_stream
+    Config.RESPONSE_CACHE = args.response_cache
+    Config.WARM_UP_ON_START = False
+    Config.SCREENSHOT_DIR = os.path.join(workdir, "screenshots")
+    Config.ARCHIVE_DIR = os.path.join(workdir, "archive")
+    Config.LOG_FILE = os.path.join(workdir, "solutions.md")
+    Config.SOLUTION_DB = os.path.join(workdir, "solutions.db")
+    Config.CACHE_FILE = os.path.join(workdir, "analysis_cache.json")
+    Config.METRICS_SINKS = ("jsonl",)
+    Config.METRICS_TRACE_FILE = os.path.join(workdir, "trace.jsonl")
+    # The fake server doesn't check the key, but Config.initialize() insists on one
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+def run(args, fixtures):
+    """Replay the fixtures through the pipeline; returns (per-press seconds, wall seconds, tracemalloc peak MB)"""
+    captures = [CaptureResult.from_image(img) for _, img in fixtures]
+    current = {"capture": captures[0]}
+    # Capture prep runs on the "grab" exactly as it does for a live screen
+    capture.grab_screen = lambda **kwargs: trim_capture(current["capture"])
+
+    manager = crew_manager.LeetCodeCrewManager(pipeline_mode="direct")
+    manager.warm_up(connect=True)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    latencies = []
+    output = contextlib.ExitStack()
+    if not args.verbose:
+        # Streamed answers and the tracebacks of injected errors would bury the report
+        output.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        output.enter_context(contextlib.redirect_stderr(io.StringIO()))
+    started = time.perf_counter()
+    with output:
+        for _ in range(args.runs):
+            for fixture in captures:
+                current["capture"] = fixture
+                pressed_at = time.perf_counter()
+                if not manager.run_analysis(timeout=args.timeout):
+                    raise RuntimeError(f"Analysis did not finish within {args.timeout}s")
+                latencies.append(time.perf_counter() - pressed_at)
+    wall = time.perf_counter() - started
+    traced_peak = None
+    if args.trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    metrics.get_tracer().flush()
+    return latencies, wall, traced_peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", default="gemini", choices=["gemini", "ollama", "fake"],
+                        help="Client to benchmark; gemini and ollama talk to the fake server")
+    parser.add_argument("--fixtures", help="Directory of screenshots (default: synthetic 2560x1440 screens)")
+    parser.add_argument("--count", type=int, default=5, help="Synthetic fixtures when --fixtures is not given")
+    parser.add_argument("--runs", type=int, default=2, help="Passes over the fixtures")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Seconds before the model's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Model streaming speed")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="Tokens per streamed chunk")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=None, help="Simulated prompt processing speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of model requests that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-stream", action="store_true", help="Wait for whole answers instead of streaming")
+    parser.add_argument("--response-cache", action="store_true", help="Let repeated fixtures hit the response cache")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report the Python allocation peak (slower)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for one analysis")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's console output")
+    parser.add_argument("--json", action="store_true", help="Print the metrics as JSON")
+    parser.add_argument("--baseline", help="JSON file with a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression over the baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", help="Write this run's metrics to a JSON file")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures, count=args.count)
+    rss_before, _ = rss_mb()
+    server = None
+    if args.backend != "fake":
+        server = FakeModelServer(
+            first_token_latency=args.first_token_latency,
+            tokens_per_second=args.tokens_per_second,
+            chunk_tokens=args.chunk_tokens,
+            prefill_tokens_per_second=args.prefill_tokens_per_second,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        ).start()
+
+    with tempfile.TemporaryDirectory(prefix="screengpt-e2e-") as workdir:
+        configure(args, workdir, server)
+        try:
+            latencies, wall, traced_peak = run(args, fixtures)
+        finally:
+            if server is not None:
+                server.stop()
+        spans = metrics.load_spans(Config.METRICS_TRACE_FILE)
+    rss_after, rss_peak = rss_mb()
+
+    stage_rows = metrics.summarize(spans)
+    stages = {row[0]: row for row in stage_rows}
+    errors = stages["job"][2] if "job" in stages else 0
+    latencies.sort()
+    results = {
+        "analyses": len(latencies),
+        "errors": errors,
+        "throughput_per_second": len(latencies) / wall,
+        "e2e_p50_seconds": metrics.percentile(latencies, 50),
+        "e2e_p95_seconds": metrics.percentile(latencies, 95),
+        "e2e_p99_seconds": metrics.percentile(latencies, 99),
+    }
+    for stage in ("capture", "encode", "first_token", "log_write"):
+        if stage in stages:
+            results[f"{stage}_p95_seconds"] = stages[stage][5]
+    if rss_peak is not None:
+        results["peak_rss_mb"] = rss_peak
+    if rss_before is not None and rss_after is not None:
+        results["rss_growth_mb"] = rss_after - rss_before
+    if traced_peak is not None:
+        results["python_alloc_peak_mb"] = traced_peak
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.backend} backend, {len(fixtures)} fixtures x {args.runs} runs"
+              f"{f', error rate {args.error_rate:.0%}' if args.error_rate else ''}")
+        print(f"  {results['analyses']} analyses in {wall:.2f}s: {results['throughput_per_second']:.2f}/s, "
+              f"{errors} failed")
+        print(f"  press to answer logged: p50 {results['e2e_p50_seconds']:.3f}s  "
+              f"p95 {results['e2e_p95_seconds']:.3f}s  p99 {results['e2e_p99_seconds']:.3f}s")
+        memory = [f"{label} {results[key]:.1f} MB" for key, label in (
+            ("peak_rss_mb", "peak RSS"), ("rss_growth_mb", "RSS growth"), ("python_alloc_peak_mb", "Python allocation peak"),
+        ) if key in results]
+        if memory:
+            print("  memory: " + ", ".join(memory))
+        if server is not None:
+            print(f"  fake server: {server.stats['requests']} requests, {server.stats['errors']} injected errors, "
+                  f"{server.stats['cached_prompt_tokens']}/{server.stats['prompt_tokens']} prompt tokens cached")
+        print()
+        print(metrics.format_summary(stage_rows))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = []
+        for key, value in results.items():
+            if key not in baseline or key in ("analyses", "errors") or not baseline[key]:
+                continue
+            if key in HIGHER_IS_BETTER:
+                regressed = value < baseline[key] * (1 - args.tolerance)
+            else:
+                regressed = value > baseline[key] * (1 + args.tolerance)
+            if regressed:
+                regressions.append(f"{key}: {value:.3f} vs baseline {baseline[key]:.3f}")
+        if errors > baseline.get("errors", 0):
+            regressions.append(f"errors: {errors} vs baseline {baseline.get('errors', 0)}")
+        if regressions:
+            print("End-to-end regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"No end-to-end regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Local HTTP server that emulates the Gemini and Ollama APIs
+
+The real backends talk to it unchanged: the Gemini SDK over its REST transport
+(Config.GEMINI_API_ENDPOINT) and the Ollama client through Config.OLLAMA_HOST.
+Latency to the first token, streaming cadence, prompt processing speed and error
+rate are all configurable, so benchmarks exercise the real client code, HTTP
+stack and streaming path without network access or an API key.
+
+Emulated endpoints:
+    Gemini  GET  /v1beta/models/{model}
+            POST /v1beta/models/{model}:generateContent
+            POST /v1beta/models/{model}:streamGenerateContent
+            POST /v1beta/cachedContents, DELETE /v1beta/cachedContents/{id}
+    Ollama  POST /api/chat, POST /api/generate, GET /api/tags
+
+Usage (then point the app at it with the printed settings):
+    python -m screengpt.benchmarks.fake_server --port 8765 --first-token-latency 0.8 --error-rate 0.05
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = (
+    "**Problem Analysis**: 1. Two Sum - find the indices of the two numbers that add up to target.\n\n"
+    "**Current Status**: The editor holds the starter code.\n\n"
+    "**Approach**: One pass with a hash map from value to index.\n\n"
+    "**Complete Solution**:\n```python\nclass Solution:\n"
+    "    def twoSum(self, nums, target):\n"
+    "        seen = {}\n"
+    "        for i, num in enumerate(nums):\n"
+    "            if target - num in seen:\n"
+    "                return [seen[target - num], i]\n"
+    "            seen[num] = i\n```\n\n"
+    "**Complexity**: O(n) time, O(n) space.\n\n"
+    "**Next Steps**: Try the sorted-input variant with two pointers.\n"
+)
+
+IMAGE_TOKENS = 258  # Gemini's cost per image tile, also used for Ollama
+
+def estimate_tokens(text):
+    """~4 characters per token, as FakeBackend estimates"""
+    return len(text) // 4
+
+class FakeModelServer:
+    """Threaded HTTP server answering Gemini and Ollama requests with a canned analysis"""
+
+    def __init__(self, host="127.0.0.1", port=0, first_token_latency=0.5, tokens_per_second=80,
+                 chunk_tokens=None, prefill_tokens_per_second=None, error_rate=0.0, seed=0,
+                 response_text=None):
+        """
+        Args:
+            port: 0 picks a free port (see .port)
+            first_token_latency: Fixed seconds before the first token of every answer
+            tokens_per_second: Generation speed while streaming
+            chunk_tokens: Tokens per streamed chunk (default: Gemini 8, Ollama 1, like the real services)
+            prefill_tokens_per_second: Simulated prompt processing; uncached prompt tokens add latency
+            error_rate: Fraction of generate requests answered with a retryable server error
+            seed: Seed for the error sampling, so runs are repeatable
+        """
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.error_rate = error_rate
+        self.response_text = response_text or DEFAULT_RESPONSE
+        self.stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cached_contents = {}  # Gemini cachedContents name -> system prompt tokens
+        self._last_system_prompt = None  # Ollama keeps the previous prompt's KV cache
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://{self._httpd.server_address[0]}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-model-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def should_fail(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+            return failed
+
+    def account(self, prompt_tokens, cached_tokens):
+        """Record token counts and sleep for the prompt processing and first-token latency"""
+        with self._lock:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_prompt_tokens"] += cached_tokens
+        if self.prefill_tokens_per_second:
+            time.sleep((prompt_tokens - cached_tokens) / self.prefill_tokens_per_second)
+        time.sleep(self.first_token_latency)
+
+    def chunks(self, chunk_tokens):
+        """The answer split into chunks of roughly chunk_tokens words"""
+        words = self.response_text.split(" ")
+        tokens = [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+        return ["".join(tokens[i:i + chunk_tokens]) for i in range(0, len(tokens), chunk_tokens)], len(tokens)
+
+    def cache_content(self, system_prompt):
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._cached_contents[name] = estimate_tokens(system_prompt)
+        return name
+
+    def cached_tokens(self, name):
+        with self._lock:
+            return self._cached_contents.get(name)
+
+    def drop_content(self, name):
+        with self._lock:
+            return self._cached_contents.pop(name, None) is not None
+
+    def reuse_prefix(self, system_prompt):
+        """Tokens of an Ollama system prompt still in the KV cache from the previous request"""
+        with self._lock:
+            cached = estimate_tokens(system_prompt) if system_prompt and system_prompt == self._last_system_prompt else 0
+            self._last_system_prompt = system_prompt
+        return cached
+
+def _gemini_text(contents):
+    """(text characters, image count) of Gemini request contents or a system instruction"""
+    characters, images = 0, 0
+    for content in contents or []:
+        for part in content.get("parts", []):
+            if "text" in part:
+                characters += len(part["text"])
+            elif "inlineData" in part or "inline_data" in part:
+                images += 1
+    return characters, images
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _stream(self, pieces, chunk_tokens, content_type, encode):
+        """Send pieces at the configured cadence; encode(piece, index, is_last) -> bytes"""
+        self._start_chunked(content_type)
+        delay = chunk_tokens / self.fake.tokens_per_second
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(delay)
+            self._write_chunk(encode(piece, i, i == len(pieces) - 1))
+        self._end_chunked()
+
+    # Gemini
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/v1beta/models/"):
+            name = path[len("/v1beta/"):]
+            self._send_json(200, {
+                "name": name,
+                "baseModelId": name.split("/", 1)[1],
+                "version": "001",
+                "displayName": "Fake model",
+                "inputTokenLimit": 1048576,
+                "outputTokenLimit": 8192,
+                "supportedGenerationMethods": ["generateContent", "createCachedContent"],
+            })
+        elif path == "/api/tags":
+            self._send_json(200, {"models": []})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"Not found: {path}", "status": "NOT_FOUND"}})
+
+    def do_DELETE(self):
+        path = self.path.split("?", 1)[0]
+        name = path[len("/v1beta/"):]
+        if path.startswith("/v1beta/cachedContents/") and self.fake.drop_content(name):
+            self._send_json(200, {})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"Not found: {name}", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        body = self._read_json()
+        match = re.match(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$", path)
+        if match:
+            self._gemini_generate(match.group(1), body, stream=match.group(2) == "streamGenerateContent")
+        elif path == "/v1beta/cachedContents":
+            self._gemini_cache(body)
+        elif path == "/api/chat":
+            self._ollama_chat(body, chat=True)
+        elif path == "/api/generate":
+            self._ollama_chat(body, chat=False)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"Not found: {path}", "status": "NOT_FOUND"}})
+
+    def _gemini_cache(self, body):
+        characters, _ = _gemini_text([body.get("systemInstruction") or body.get("system_instruction") or {}])
+        name = self.fake.cache_content("x" * characters)
+        self._send_json(200, {
+            "name": name,
+            "model": body.get("model"),
+            "displayName": body.get("displayName", ""),
+            "usageMetadata": {"totalTokenCount": characters // 4},
+            "createTime": "2024-01-01T00:00:00Z",
+            "updateTime": "2024-01-01T00:00:00Z",
+            "expireTime": "2999-01-01T00:00:00Z",
+        })
+
+    def _gemini_generate(self, model, body, stream):
+        if self.fake.should_fail():
+            self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded (fake)", "status": "UNAVAILABLE"}})
+            return
+        characters, images = _gemini_text(body.get("contents"))
+        system_characters, _ = _gemini_text([body.get("systemInstruction") or {}])
+        cached_tokens = 0
+        if body.get("cachedContent"):
+            cached_tokens = self.fake.cached_tokens(body["cachedContent"])
+            if cached_tokens is None:
+                self._send_json(404, {"error": {"code": 404, "message": "Cached content not found", "status": "NOT_FOUND"}})
+                return
+        prompt_tokens = (characters + system_characters) // 4 + IMAGE_TOKENS * images + cached_tokens
+        self.fake.account(prompt_tokens, cached_tokens)
+
+        chunk_tokens = self.fake.chunk_tokens or 8
+        pieces, output_tokens = self.fake.chunks(chunk_tokens if stream else 10 ** 9)
+
+        def candidate(text, is_last):
+            result = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+            if is_last:
+                result["candidates"][0]["finishReason"] = 1  # STOP, int-encoded like the REST transport asks for
+                result["usageMetadata"] = {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": output_tokens,
+                    "totalTokenCount": prompt_tokens + output_tokens,
+                    "cachedContentTokenCount": cached_tokens,
+                }
+            return result
+
+        if not stream:
+            self._send_json(200, candidate(pieces[0], True))
+            return
+        # The REST transport reads one JSON array, element by element
+        self._stream(
+            pieces, chunk_tokens, "application/json",
+            lambda piece, i, is_last: (
+                ("[" if i == 0 else ",\r\n") + json.dumps(candidate(piece, is_last)) + ("]" if is_last else "")
+            ).encode("utf-8"),
+        )
+
+    # Ollama
+
+    def _ollama_chat(self, body, chat):
+        if chat and self.fake.should_fail():
+            self._send_json(500, {"error": "model runner has unexpectedly stopped (fake)"})
+            return
+        model = body.get("model", "fake")
+        if chat:
+            messages = body.get("messages") or []
+            system_prompt = "".join(m.get("content", "") for m in messages if m.get("role") == "system")
+            characters = sum(len(m.get("content") or "") for m in messages)
+            images = sum(len(m.get("images") or []) for m in messages)
+            for message in messages:
+                for image in message.get("images") or []:
+                    base64.b64decode(image, validate=False)  # Pay the decode cost the real server does
+        else:
+            system_prompt = body.get("system")
+            characters = len(body.get("prompt") or "") + len(system_prompt or "")
+            images = len(body.get("images") or [])
+        cached_tokens = self.fake.reuse_prefix(system_prompt) if chat else 0
+        prompt_tokens = characters // 4 + IMAGE_TOKENS * images
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+        num_predict = (body.get("options") or {}).get("num_predict")
+        if not chat and not body.get("prompt"):
+            # An empty generate request only loads the model
+            self._send_json(200, {"model": model, "created_at": created_at, "response": "", "done": True, "done_reason": "load"})
+            return
+        started = time.perf_counter()
+        self.fake.account(prompt_tokens, cached_tokens)
+        chunk_tokens = self.fake.chunk_tokens or 1
+        pieces, output_tokens = self.fake.chunks(chunk_tokens)
+        if num_predict:
+            pieces, output_tokens = pieces[:max(1, num_predict // chunk_tokens)], min(output_tokens, num_predict)
+
+        def message(text, done):
+            result = {"model": model, "created_at": created_at, "done": done}
+            if chat:
+                result["message"] = {"role": "assistant", "content": text}
+            else:
+                result["response"] = text
+            if done:
+                elapsed_ns = int((time.perf_counter() - started) * 1e9)
+                result.update({
+                    "done_reason": "stop",
+                    "total_duration": elapsed_ns,
+                    "load_duration": 0,
+                    # Only tokens that had to be evaluated; a reused prefix isn't counted
+                    "prompt_eval_count": prompt_tokens - cached_tokens,
+                    "prompt_eval_duration": int(self.fake.first_token_latency * 1e9),
+                    "eval_count": output_tokens,
+                    "eval_duration": max(1, elapsed_ns - int(self.fake.first_token_latency * 1e9)),
+                })
+            return result
+
+        if body.get("stream") is False:
+            result = message("".join(pieces), True)
+            self._send_json(200, result)
+            return
+        self._stream(
+            pieces + [""], chunk_tokens, "application/x-ndjson",
+            lambda piece, i, is_last: (json.dumps(message(piece, is_last)) + "\n").encode("utf-8"),
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="Streaming speed")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="Tokens per streamed chunk")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=None, help="Simulated prompt processing speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeModelServer(
+        host=args.host,
+        port=args.port,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        chunk_tokens=args.chunk_tokens,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(f"Fake Gemini/Ollama server on {server.url}")
+    print(f"  Gemini: Config.GEMINI_API_ENDPOINT = {server.url!r}")
+    print(f"  Ollama: Config.OLLAMA_HOST = {server.url!r}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+if __name__ == "__main__":
+    main()
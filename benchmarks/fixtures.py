@@ -0,0 +1,65 @@
+"""
+Screenshot fixtures for the benchmarks
+"""
+import os
+import random
+from PIL import Image, ImageDraw
+
+SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+def synthetic_screenshot(width=2560, height=1440, seed=0, lines=None):
+    """
+    Draw a LeetCode-like screen: problem text on the left, code editor on the right
+
+    Every string drawn is appended to `lines` when a list is given, as ground
+    truth for transcription benchmarks.
+    """
+    rng = random.Random(seed)
+    lines = [] if lines is None else lines
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    split = width * 2 // 5
+
+    # Title bar and problem statement
+    draw.rectangle([0, 0, width, 48], fill=(40, 40, 40))
+    title = f"{seed + 1}. Two Sum Variant {seed}"
+    draw.text((16, 16), title, fill=(255, 255, 255))
+    lines.append(title)
+    words = ["array", "nums", "target", "return", "indices", "integer", "exactly", "solution", "may", "not", "use", "same", "element", "twice"]
+    y = 80
+    while y < height - 40:
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(6, 14)))
+        draw.text((24, y), line, fill=(30, 30, 30))
+        lines.append(line)
+        y += 22
+
+    # Code editor
+    draw.rectangle([split, 48, width, height], fill=(30, 30, 30))
+    keywords = ["def", "for", "in", "if", "return", "while", "class", "self", "range", "len"]
+    y = 64
+    while y < height - 40:
+        indent = 4 * rng.randint(0, 3)
+        line = " " * indent + " ".join(rng.choice(keywords) for _ in range(rng.randint(2, 7)))
+        colour = rng.choice([(86, 156, 214), (206, 145, 120), (220, 220, 170), (212, 212, 212)])
+        draw.text((split + 16, y), line, fill=colour)
+        lines.append(line)
+        y += 20
+    return img
+
+def load_fixtures(directory=None, count=3):
+    """
+    Return (name, RGB image) pairs from a fixture directory
+    
+    Falls back to synthetic screenshots when no directory is given.
+    """
+    if directory is None:
+        return [(f"synthetic_{i}", synthetic_screenshot(seed=i)) for i in range(count)]
+
+    fixtures = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            img = Image.open(os.path.join(directory, filename)).convert("RGB")
+            fixtures.append((filename, img))
+    if not fixtures:
+        raise FileNotFoundError(f"No fixture screenshots found in {directory}")
+    return fixtures
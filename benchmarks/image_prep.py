@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Bytes sent, encode time and end-to-end latency per image-preparation setting
+
+Each setting is applied through the IMAGE_* Config fields and run through the real
+analyze_image() path against the offline fake backend. The fake simulates the
+upload over a link of --uplink-mbps, so smaller payloads show up as lower latency.
+
+Usage:
+    python -m screengpt.benchmarks.image_prep --fixtures periodic_screenshots
+"""
+import argparse
+import statistics
+import time
+
+from .. import analysis
+from ..backends import FakeBackend
+from ..config import Config
+from .fixtures import load_fixtures
+
+# (label, max edge, format, quality, grayscale)
+SETTINGS = [
+    ("png-full", None, "PNG", 85, False),
+    ("jpeg-1920-q85", 1920, "JPEG", 85, False),
+    ("jpeg-1280-q75", 1280, "JPEG", 75, False),
+    ("webp-1920-q80", 1920, "WEBP", 80, False),
+    ("jpeg-1600-q80-gray", 1600, "JPEG", 80, True),
+]
+
+def apply_setting(max_edge, image_format, quality, grayscale):
+    """Point the IMAGE_* Config fields at one setting"""
+    Config.IMAGE_MAX_EDGE = max_edge
+    Config.IMAGE_FORMAT = image_format
+    Config.IMAGE_QUALITY = quality
+    Config.IMAGE_GRAYSCALE = grayscale
+
+def measure(fixtures, runs, backend):
+    """Return (bytes sent, encode seconds, end-to-end seconds) samples for the current setting"""
+    sizes, encode_times, latencies = [], [], []
+    for _, img in fixtures:
+        for _ in range(runs):
+            started = time.perf_counter()
+            prepared = analysis.prepare_image(img)
+            encode_times.append(time.perf_counter() - started)
+            sizes.append(len(prepared.data))
+
+            started = time.perf_counter()
+            analysis.analyze_image(img, backend=backend, use_cache=False)
+            latencies.append(time.perf_counter() - started)
+    return sizes, encode_times, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", help="Directory of screenshots (default: synthetic 2560x1440 screens)")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per fixture and setting")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="Simulated upload bandwidth")
+    parser.add_argument("--model-latency", type=float, default=0.5, help="Seconds the fake model takes once the upload is done")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    backend = FakeBackend(
+        first_token_latency=args.model_latency,
+        tokens_per_second=1_000_000,
+        uplink_mbps=args.uplink_mbps,
+    )
+
+    print(f"{len(fixtures)} fixture(s), {args.runs} run(s) each, {args.uplink_mbps:g} Mbit/s uplink\n")
+    print(f"{'setting':<20} {'KiB sent':>9} {'encode (ms)':>12} {'e2e p50 (ms)':>13} {'e2e max (ms)':>13}")
+    for label, *setting in SETTINGS:
+        apply_setting(*setting)
+        sizes, encode_times, latencies = measure(fixtures, args.runs, backend)
+        print(
+            f"{label:<20} {statistics.mean(sizes) / 1024:>9.1f} {statistics.mean(encode_times) * 1000:>12.1f} "
+            f"{statistics.median(latencies) * 1000:>13.1f} {max(latencies) * 1000:>13.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Latency and payload of the OCR pre-pass compared with sending the screenshot
+
+Every fixture goes through analyze_image() once per OCR mode against the offline
+fake backend, which simulates the upload (--uplink-mbps) and prompt processing
+(--prefill-tokens-per-second), so the table weighs the local OCR time against
+the smaller request it produces. Needs pytesseract and the tesseract binary.
+
+Usage:
+    python -m screengpt.benchmarks.ocr_prepass --fixtures periodic_screenshots
+"""
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+
+from .. import analysis
+from ..backends import FakeBackend
+from ..config import Config
+from ..ocr import ocr_available
+from ..prompts import render_domain_prompt
+from .fixtures import load_fixtures
+
+def measure(fixtures, runs, backend):
+    """Return (payload bytes, prompt tokens, end-to-end seconds, input paths) for the current OCR mode"""
+    sizes, tokens, latencies, paths = [], [], [], Counter()
+    prompt = render_domain_prompt("leetcode").text
+    for _, img in fixtures:
+        for _ in range(runs):
+            request, _, _ = analysis.build_request(img, prompt, backend)
+            sizes.append(request.payload_bytes)
+            tokens.append(FakeBackend.estimate_prompt_tokens(request))
+
+            started = time.perf_counter()
+            response = analysis.analyze_image(img, backend=backend, use_cache=False)
+            latencies.append(time.perf_counter() - started)
+            paths[response.input_path] += 1
+    return sizes, tokens, latencies, paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", help="Directory of screenshots (default: synthetic 2560x1440 screens)")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per fixture and mode")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="Simulated upload bandwidth")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000, help="Simulated prompt processing speed")
+    parser.add_argument("--model-latency", type=float, default=0.3, help="Fixed seconds before the fake model's first token")
+    args = parser.parse_args()
+
+    if not ocr_available():
+        sys.exit("Install pytesseract and the tesseract binary to run this benchmark")
+
+    fixtures = load_fixtures(args.fixtures)
+    backend = FakeBackend(
+        first_token_latency=args.model_latency,
+        tokens_per_second=1_000_000,
+        uplink_mbps=args.uplink_mbps,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+    )
+
+    print(f"{len(fixtures)} fixture(s), {args.runs} run(s) each, {args.uplink_mbps:g} Mbit/s uplink\n")
+    print(f"{'OCR mode':<10} {'KiB sent':>9} {'prompt tok':>11} {'e2e p50 (ms)':>13} {'e2e max (ms)':>13}  paths taken")
+    for mode in Config.OCR_MODES:
+        Config.OCR_MODE = mode
+        sizes, tokens, latencies, paths = measure(fixtures, args.runs, backend)
+        taken = ", ".join(f"{path} x{count}" for path, count in paths.most_common())
+        print(
+            f"{mode:<10} {statistics.mean(sizes) / 1024:>9.1f} {statistics.mean(tokens):>11.0f} "
+            f"{statistics.median(latencies) * 1000:>13.1f} {max(latencies) * 1000:>13.1f}  {taken}"
+        )
+
+if __name__ == "__main__":
+    main()
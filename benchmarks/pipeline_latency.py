@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Hotkey-to-first-token latency for the direct and CrewAI pipelines
+
+The planning LLM used by the CrewAI agents is replaced with a stub and the vision
+model with the offline fake backend, both sleeping for a configurable time, so the
+numbers show the cost of the pipeline itself (agent planning round trips, capture,
+image preparation) without network access.
+
+Usage:
+    python -m screengpt.benchmarks.pipeline_latency --runs 5 --fixture shot.png
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from typing import ClassVar
+
+from crewai.llms.base_llm import BaseLLM
+from PIL import Image
+
+from .. import agents, capture, crew_manager, tools
+from ..backends import FakeBackend
+from ..capture import CaptureResult
+from ..config import Config
+from ..streaming import TokenStream
+
+class StubPlanningLLM(BaseLLM):
+    """ReAct-speaking stand-in for the agents' planning LLM"""
+
+    latency: ClassVar[float] = 1.0
+    calls: ClassVar[int] = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        time.sleep(self.latency)
+        StubPlanningLLM.calls += 1
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        # After a tool call the executor appends "Observation: <tool result>" to our reply
+        replies = [str(message.get("content", "")) for message in messages if message.get("role") == "assistant"]
+        if replies and "Observation:" in replies[-1]:
+            # Tool results here are one paragraph; CrewAI may append a tool reminder after it
+            observation = replies[-1].split("Observation:", 1)[1].strip().split("\n\n", 1)[0]
+            return f"Thought: I now know the final answer\nFinal Answer: {observation}"
+
+        # The system prompt documents the ReAct format; only the current task matters
+        text = "\n".join(str(message.get("content", "")) for message in messages)
+        text = text.rsplit("Current Task:", 1)[-1]
+        if "Gemini Image Analysis Tool" in text:
+            # The capture task's answer is handed over as task context
+            context = text.split("This is the context you're working with:", 1)[-1]
+            paths = re.findall(r"\S+\.png", context)
+            file_path = paths[0] if paths else ""
+            return (
+                "Thought: I should analyze the screenshot\n"
+                "Action: Gemini Image Analysis Tool\n"
+                f'Action Input: {{"file_path": "{file_path}"}}'
+            )
+        return (
+            "Thought: I should capture the screen\n"
+            "Action: Screen Capture Tool\n"
+            "Action Input: {}"
+        )
+
+def install_stubs(args):
+    """Swap the real models (and optionally the screen grab) for stubs"""
+    StubPlanningLLM.latency = args.planning_latency
+    Config.WARM_UP_ON_START = False
+    Config.RESPONSE_CACHE = False  # Every run must reach the vision backend
+    Config.VISION_BACKEND = FakeBackend.name
+    Config.FAKE_FIRST_TOKEN_LATENCY = args.first_token_latency
+    Config.FAKE_TOKENS_PER_SECOND = args.tokens_per_second
+    agents.planning_llm = StubPlanningLLM(model="stub-planner")
+
+    if args.fixture:
+        fixture_path = os.path.abspath(args.fixture)
+        fixture_capture = CaptureResult.from_image(Image.open(fixture_path))
+        tools.capture_screenshot = lambda: fixture_path
+        capture.grab_screen = lambda **kwargs: fixture_capture
+
+def measure(mode, runs):
+    """Return hotkey-to-first-token latencies (seconds) for a pipeline mode"""
+    manager = crew_manager.LeetCodeCrewManager(pipeline_mode=mode)
+    manager.warm_up(connect=False)
+    backend = manager.session.backend
+    latencies = []
+    planning_calls = []
+    for _ in range(runs):
+        backend.last_response = None
+        StubPlanningLLM.calls = 0
+        pressed_at = time.perf_counter()
+        if mode == "direct" and Config.STREAM_RESPONSES:
+            # Same path as a real hotkey press, minus the console echo and log file
+            with TokenStream(log_file=os.devnull, echo=False) as stream:
+                manager._run_direct(stream=stream)
+        else:
+            manager._run_pipeline()
+        if backend.last_response is None:
+            raise RuntimeError(f"{mode} pipeline never reached the vision backend")
+        latencies.append(backend.last_response.first_token_at - pressed_at)
+        planning_calls.append(StubPlanningLLM.calls)
+    return latencies, planning_calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Analyses per pipeline mode")
+    parser.add_argument("--modes", nargs="+", default=["direct", "crew"], help="Pipeline modes to measure")
+    parser.add_argument("--planning-latency", type=float, default=1.0, help="Seconds per stubbed planning LLM call")
+    parser.add_argument("--first-token-latency", type=float, default=0.5, help="Seconds until the fake vision backend's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="Generation speed of the fake vision backend")
+    parser.add_argument("--fixture", help="Use this image instead of grabbing the screen (for headless machines)")
+    args = parser.parse_args()
+
+    install_stubs(args)
+
+    print(f"{'mode':<8} {'runs':>4} {'p50 (s)':>9} {'min (s)':>9} {'max (s)':>9} {'LLM plans':>10}")
+    for mode in args.modes:
+        latencies, planning_calls = measure(mode, args.runs)
+        print(
+            f"{mode:<8} {len(latencies):>4} {statistics.median(latencies):>9.3f} "
+            f"{min(latencies):>9.3f} {max(latencies):>9.3f} {statistics.mean(planning_calls):>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Load test for the analysis server (server.py) against the fake model backend
+
+Starts the server in-process on a free port. It is backed by the offline
+FakeBackend, or by the real Gemini/Ollama client talking to
+benchmarks/fake_server.py. Then --clients concurrent clients each upload
+fixture screenshots back to back, over server-sent events or WebSocket.
+--url loads an already running server instead.
+
+Reports requests/sec and the latency to the first streamed chunk and to the
+full answer (p50/p95/p99). Requests the server turned away as busy, failures
+and cancellations are counted separately. With --cancel-rate, that fraction of
+requests is cancelled after the first chunk, which exercises per-client
+cancellation under load.
+
+Usage:
+    python -m screengpt.benchmarks.server_load --clients 16 --requests 8
+    python -m screengpt.benchmarks.server_load --transport ws --workers 8 --cancel-rate 0.2
+    python -m screengpt.benchmarks.server_load --backend gemini --first-token-latency 0.5 --json
+    python -m screengpt.benchmarks.server_load --url http://127.0.0.1:5000 --clients 4
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+import aiohttp
+
+from .. import metrics
+from ..config import Config
+from .fake_server import FakeModelServer
+from .fixtures import load_fixtures
+
+TERMINAL_EVENTS = ("done", "error", "cancelled")
+
+def encode_fixtures(fixtures, max_edge):
+    """PNG bytes of each fixture, downscaled as a frontend would before uploading"""
+    encoded = []
+    for _, img in fixtures:
+        img = img.copy()
+        img.thumbnail((max_edge, max_edge))
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        encoded.append(buffer.getvalue())
+    return encoded
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def configure(args, workdir, model_server):
+    """Point the app's files at workdir and its backend at the fake model"""
+    Config.VISION_BACKEND = args.backend
+    Config.GEMINI_API_ENDPOINT = model_server.url if model_server else None
+    Config.OLLAMA_HOST = model_server.url if model_server else Config.OLLAMA_HOST
+    Config.FAKE_FIRST_TOKEN_LATENCY = args.first_token_latency
+    Config.FAKE_TOKENS_PER_SECOND = args.tokens_per_second
+    Config.RESPONSE_CACHE = args.response_cache
+    Config.WARM_UP_ON_START = False
+    Config.LOG_FILE = os.path.join(workdir, "solutions.md")
+    Config.SOLUTION_DB = os.path.join(workdir, "solutions.db")
+    Config.CACHE_FILE = os.path.join(workdir, "analysis_cache.json")
+    Config.METRICS_SINKS = ("jsonl",)
+    Config.METRICS_TRACE_FILE = os.path.join(workdir, "trace.jsonl")
+    # The fake models don't check the key, but Config.initialize() insists on one
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+def start_server(args):
+    """Serve server.create_app() from a background event loop; returns (url, stop)"""
+    from aiohttp import web
+    from ..server import AnalysisService, create_app
+
+    port = free_port()
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        try:
+            service = AnalysisService(workers=args.workers, max_pending=args.max_pending)
+            runner = web.AppRunner(create_app(service))
+            loop.run_until_complete(runner.setup())
+            loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+            state["runner"] = runner
+        except Exception as e:
+            state["error"] = e
+            return
+        finally:
+            ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=serve, name="analysis-server", daemon=True)
+    thread.start()
+    ready.wait()
+    if "error" in state:
+        raise state["error"]
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"http://127.0.0.1:{port}", stop
+
+class Results:
+    """Outcomes and latencies collected by all clients"""
+
+    def __init__(self):
+        self.latencies = []  # Full answers only
+        self.first_chunk = []
+        self.outcomes = {"done": 0, "error": 0, "cancelled": 0, "busy": 0}
+
+    def record(self, outcome, seconds=None, first_chunk=None):
+        self.outcomes[outcome] += 1
+        if outcome == "done":
+            self.latencies.append(seconds)
+        if first_chunk is not None:
+            self.first_chunk.append(first_chunk)
+
+async def sse_request(session, url, image, cancel, results):
+    """One analysis over server-sent events"""
+    started = time.perf_counter()
+    first_chunk = None
+    headers = {"Accept": "text/event-stream", "Content-Type": "image/png"}
+    async with session.post(f"{url}/analyze", data=image, headers=headers) as response:
+        if response.status == 503:
+            results.record("busy")
+            return False
+        job_id = response.headers["X-Analysis-Id"]
+        event = None
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif not line.startswith("data: "):
+                continue
+            elif event == "chunk" and first_chunk is None:
+                first_chunk = time.perf_counter() - started
+                if cancel:
+                    await session.delete(f"{url}/analyze/{job_id}")
+            elif event in TERMINAL_EVENTS:
+                results.record(event, time.perf_counter() - started, first_chunk)
+                return True
+    results.record("error")
+    return True
+
+async def run_sse_client(session, url, images, args, rng, results):
+    for i in range(args.requests):
+        while not await sse_request(session, url, images[i % len(images)], rng.random() < args.cancel_rate, results):
+            await asyncio.sleep(args.busy_backoff)
+
+async def run_ws_client(session, url, images, args, rng, results):
+    """One WebSocket connection sending its requests one after another"""
+    async with session.ws_connect(url.replace("http", "ws", 1) + "/ws", max_msg_size=0) as ws:
+        i = 0
+        while i < args.requests:
+            cancel = rng.random() < args.cancel_rate
+            started = time.perf_counter()
+            first_chunk = None
+            await ws.send_bytes(images[i % len(images)])
+            async for message in ws:
+                data = json.loads(message.data)
+                if data.get("busy"):
+                    results.record("busy")
+                    await asyncio.sleep(args.busy_backoff)
+                    break
+                if data["type"] == "chunk" and first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                    if cancel:
+                        await ws.send_json({"type": "cancel", "id": data["id"]})
+                elif data["type"] in TERMINAL_EVENTS:
+                    results.record(data["type"], time.perf_counter() - started, first_chunk)
+                    i += 1
+                    break
+            else:
+                raise RuntimeError("Server closed the WebSocket")
+
+async def load(url, images, args):
+    """Run all clients against the server; returns (results, wall seconds, server stats)"""
+    results = Results()
+    rng = random.Random(args.seed)
+    client = run_ws_client if args.transport == "ws" else run_sse_client
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client(session, url, images, args, random.Random(rng.random()), results) for _ in range(args.clients)
+        ))
+        wall = time.perf_counter() - started
+        async with session.get(f"{url}/health") as response:
+            server_stats = await response.json()
+    return results, wall, server_stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Load a running server instead of starting one")
+    parser.add_argument("--transport", default="sse", choices=["sse", "ws"])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=5, help="Analyses per client")
+    parser.add_argument("--cancel-rate", type=float, default=0.0, help="Fraction of requests cancelled after the first chunk")
+    parser.add_argument("--backend", default="fake", choices=["fake", "gemini", "ollama"],
+                        help="fake runs in-process; gemini and ollama talk to benchmarks/fake_server.py")
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS, help="Server worker threads")
+    parser.add_argument("--max-pending", type=int, default=Config.SERVER_MAX_PENDING, help="Server queue limit")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Seconds before the model's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Model streaming speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of model requests that fail (fake_server only)")
+    parser.add_argument("--response-cache", action="store_true", help="Let repeated fixtures hit the response cache")
+    parser.add_argument("--fixtures", help="Directory of screenshots (default: synthetic screens)")
+    parser.add_argument("--count", type=int, default=4, help="Synthetic fixtures when --fixtures is not given")
+    parser.add_argument("--max-edge", type=int, default=1600, help="Longest edge of the uploaded images")
+    parser.add_argument("--busy-backoff", type=float, default=0.1, help="Seconds a client waits after a busy reply")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds before the whole run is abandoned")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the metrics as JSON")
+    args = parser.parse_args()
+
+    images = encode_fixtures(load_fixtures(args.fixtures, count=args.count), args.max_edge)
+    model_server = None
+    spans = []
+    with tempfile.TemporaryDirectory(prefix="screengpt-load-") as workdir:
+        if args.url:
+            url, stop = args.url.rstrip("/"), None
+        else:
+            if args.backend != "fake":
+                model_server = FakeModelServer(
+                    first_token_latency=args.first_token_latency,
+                    tokens_per_second=args.tokens_per_second,
+                    error_rate=args.error_rate,
+                    seed=args.seed,
+                ).start()
+            configure(args, workdir, model_server)
+            url, stop = start_server(args)
+        try:
+            results, wall, server_stats = asyncio.run(load(url, images, args))
+        finally:
+            if stop is not None:
+                stop()
+            if model_server is not None:
+                model_server.stop()
+        if stop is not None:
+            metrics.get_tracer().flush()
+            spans = metrics.load_spans(Config.METRICS_TRACE_FILE)
+
+    latencies, first_chunk = sorted(results.latencies), sorted(results.first_chunk)
+    report = dict(
+        {f"{outcome}_requests": count for outcome, count in results.outcomes.items()},
+        requests_per_second=results.outcomes["done"] / wall,
+        wall_seconds=wall,
+    )
+    for name, values in (("latency", latencies), ("first_chunk", first_chunk)):
+        for p in (50, 95, 99):
+            report[f"{name}_p{p}_seconds"] = metrics.percentile(values, p) if values else None
+    report["server"] = server_stats
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.clients} {args.transport.upper()} clients x {args.requests} requests against {url} "
+          f"({server_stats['backend']} backend, {server_stats['workers']} workers)")
+    print(f"  {results.outcomes['done']} answered in {wall:.2f}s: {report['requests_per_second']:.2f} requests/s; "
+          f"{results.outcomes['cancelled']} cancelled, {results.outcomes['error']} failed, "
+          f"{results.outcomes['busy']} turned away busy")
+    for label, name in (("full answer", "latency"), ("first chunk", "first_chunk")):
+        if report[f"{name}_p50_seconds"] is not None:
+            print(f"  {label}: p50 {report[f'{name}_p50_seconds']:.3f}s  p95 {report[f'{name}_p95_seconds']:.3f}s  "
+                  f"p99 {report[f'{name}_p99_seconds']:.3f}s")
+    if model_server is not None:
+        print(f"  fake server: {model_server.stats['requests']} requests, {model_server.stats['errors']} injected errors")
+    if spans:
+        print()
+        print(metrics.format_summary(metrics.summarize(spans)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Import time of the entry points and time until the hotkey listener is ready
+
+Each measurement runs in a fresh interpreter. The entry points are imported under
+`-X importtime` and the slowest modules are listed; time-to-listener-ready covers
+interpreter start, imports, building the crew manager and the pynput listener, and
+can be checked against a saved baseline so a slow import sneaking back in fails CI.
+
+Usage:
+    python -m screengpt.benchmarks.startup --runs 5 --backend fake
+    python -m screengpt.benchmarks.startup --save-baseline startup_baseline.json
+    python -m screengpt.benchmarks.startup --baseline startup_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE = __package__.rsplit(".", 1)[0]
+
+# What each entry point imports before main() runs
+ENTRY_POINTS = {
+    "__main__": f"import {PACKAGE}.__main__",
+    "run": f"from {PACKAGE} import main",
+    "standalone": f"import {PACKAGE}.standalone",
+}
+
+# Modules that should stay out of the startup path
+HEAVY_MODULES = ("crewai", "google.generativeai", "ollama", "mss", "numpy")
+
+LISTENER_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from {package}.config import Config
+Config.VISION_BACKEND = {backend!r}
+from {package}.crew_manager import LeetCodeCrewManager
+manager = LeetCodeCrewManager()
+listener = None
+try:
+    from pynput import keyboard
+    listener = keyboard.GlobalHotKeys({{Config.HOTKEY_COMBINATION: manager.run_analysis_async}})
+except Exception as e:
+    print(f"[startup] Listener not created ({{e}}), timing stops at the manager", file=sys.stderr)
+print(json.dumps({{
+    "ready_seconds": time.perf_counter() - started,
+    "listener": listener is not None,
+    "heavy_modules": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+def package_root():
+    """Directory the package is importable from"""
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run_python(args, code):
+    """Run code in a fresh interpreter, returning (wall seconds, stdout, stderr)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *args, "-c", code],
+        cwd=package_root(),
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Probe failed ({result.returncode}):\n{result.stderr[-2000:]}")
+    return elapsed, result.stdout, result.stderr
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into {module: (self_us, cumulative_us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def profile_entry_point(name, top):
+    """Print the import breakdown of one entry point"""
+    _, _, stderr = run_python(["-X", "importtime"], ENTRY_POINTS[name])
+    modules = parse_importtime(stderr)
+    total_us = sum(self_us for self_us, _ in modules.values())
+    package_us = sum(
+        self_us for module, (self_us, _) in modules.items()
+        if module == PACKAGE or module.startswith(PACKAGE + ".")
+    )
+    heavy = [module for module in HEAVY_MODULES if module in modules]
+    print(f"\n{name}: {total_us / 1000:.1f} ms importing, {package_us / 1000:.1f} ms of it in {PACKAGE} itself"
+          f" (heavy modules loaded: {', '.join(heavy) or 'none'})")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for module, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:>8.1f} ms self {cumulative_us / 1000:>9.1f} ms cumulative  {module}")
+    return total_us / 1_000_000
+
+def measure_listener_ready(runs, backend):
+    """Return (process wall seconds, in-process seconds) medians and the last probe result"""
+    code = LISTENER_PROBE.format(package=PACKAGE, backend=backend, heavy=HEAVY_MODULES)
+    walls, readies, probe = [], [], None
+    for _ in range(runs):
+        wall, stdout, _ = run_python([], code)
+        probe = json.loads(stdout.strip().splitlines()[-1])
+        walls.append(wall)
+        readies.append(probe["ready_seconds"])
+    return statistics.median(walls), statistics.median(readies), probe
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list per entry point")
+    parser.add_argument("--entry-points", nargs="+", default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS))
+    parser.add_argument("--backend", default=None, help="Vision backend for the listener probe (default: Config)")
+    parser.add_argument("--baseline", help="JSON file with a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown over the baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", help="Write this run's metrics to a JSON file")
+    args = parser.parse_args()
+
+    if args.backend is None:
+        from ..config import Config
+        args.backend = Config.VISION_BACKEND
+
+    metrics = {}
+    for name in args.entry_points:
+        metrics[f"import_{name}_seconds"] = profile_entry_point(name, args.top)
+
+    wall, ready, probe = measure_listener_ready(args.runs, args.backend)
+    metrics["listener_ready_seconds"] = ready
+    metrics["process_ready_seconds"] = wall
+    print(f"\nTime to listener ready ({args.backend} backend, median of {args.runs}): "
+          f"{ready:.3f}s in process, {wall:.3f}s including interpreter start")
+    if not probe["listener"]:
+        print("  (pynput listener unavailable here; measured up to the crew manager)")
+    if probe["heavy_modules"]:
+        print(f"  Heavy modules loaded before ready: {', '.join(probe['heavy_modules'])}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = []
+        for key, value in metrics.items():
+            if key in baseline and value > baseline[key] * (1 + args.tolerance):
+                regressions.append(f"{key}: {value:.3f}s vs baseline {baseline[key]:.3f}s")
+        if regressions:
+            print("Startup regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"No startup regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tiled analysis compared with sending the whole screen as one image
+
+For every fixture, both modes are measured:
+- Wall-clock time of a full analyze_image() call, with Config.TILING off and then on.
+- Transcription quality: how much of the screen's text the model can read, once
+  from the single downscaled image and once from the tiles. It is scored against
+  ground truth as bag-of-words recall and as the share of lines transcribed
+  verbatim.
+
+Synthetic fixtures carry their own ground truth. For --fixtures, a <name>.txt
+next to a screenshot is used when present.
+
+Runs offline against the fake backend by default, which exercises the timing
+and concurrency but returns canned text, so quality scores need a real model
+(--backend ollama --host ...).
+
+Usage:
+    python -m screengpt.benchmarks.tiling --width 3840 --height 2160
+    python -m screengpt.benchmarks.tiling --backend ollama --host http://localhost:11434 --model gemma3:4b-it-qat
+    python -m screengpt.benchmarks.tiling --backend gemini --fixtures periodic_screenshots --runs 3
+"""
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+
+from .. import analysis
+from ..backends import VisionRequest, create_backend
+from ..config import Config
+from ..tiling import TILE_SYSTEM_PROMPT, tile_grid
+from .fake_server import FakeModelServer
+from .fixtures import load_fixtures, synthetic_screenshot
+
+WHOLE_SCREEN_INSTRUCTION = "This is a whole screenshot. Transcribe it."
+
+def load_ground_truth(args):
+    """(name, image, ground-truth lines or None) for every fixture"""
+    if args.fixtures is None:
+        fixtures = []
+        for seed in range(args.count):
+            lines = []
+            img = synthetic_screenshot(args.width, args.height, seed=seed, lines=lines)
+            fixtures.append((f"synthetic_{seed}", img, lines))
+        return fixtures
+    fixtures = []
+    for name, img in load_fixtures(args.fixtures):
+        truth_path = os.path.join(args.fixtures, os.path.splitext(name)[0] + ".txt")
+        lines = None
+        if os.path.exists(truth_path):
+            with open(truth_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f.read().splitlines() if line.strip()]
+        fixtures.append((name, img, lines))
+    return fixtures
+
+def _words(text):
+    return re.findall(r"[a-z0-9_]+", text.lower())
+
+def _normalize(line):
+    return " ".join(line.lower().split())
+
+def recall(lines, transcript):
+    """(bag-of-words recall, share of lines found verbatim) of a transcript against ground truth"""
+    truth = Counter(word for line in lines for word in _words(line))
+    seen = Counter(_words(transcript))
+    word_recall = sum(min(count, seen[word]) for word, count in truth.items()) / max(1, sum(truth.values()))
+    text = _normalize(transcript)
+    verbatim = [line for line in lines if _normalize(line) and _normalize(line) in text]
+    return word_recall, len(verbatim) / max(1, len([line for line in lines if _normalize(line)]))
+
+def transcribe_whole(img, backend):
+    """Transcribe the screen as one image, downscaled as a normal analysis would send it"""
+    request = VisionRequest(
+        prompt=WHOLE_SCREEN_INSTRUCTION,
+        images=[analysis.prepare_image(img)],
+        system_prompt=TILE_SYSTEM_PROMPT,
+    )
+    return backend.generate(request).text
+
+def transcribe_tiled(img, backend):
+    _, _, _, responses = analysis.transcribe_tiles(img, backend)
+    return "\n".join(response.text for response in responses if response is not None)
+
+def time_analysis(img, backend, tiling, runs):
+    """Seconds per analyze_image() call with the given tiling mode, plus the last response"""
+    Config.TILING = tiling
+    seconds, response = [], None
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = analysis.analyze_image(img, backend=backend, use_cache=False)
+        seconds.append(time.perf_counter() - started)
+    return seconds, response
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", default="fake", choices=["fake", "gemini", "ollama"],
+                        help="gemini and ollama talk to benchmarks/fake_server.py unless --host is given")
+    parser.add_argument("--host", help="Real model server for --backend ollama (quality needs a real model)")
+    parser.add_argument("--model", help="Model name (default: the configured vision model)")
+    parser.add_argument("--fixtures", help="Directory of screenshots, with optional <name>.txt ground truth")
+    parser.add_argument("--count", type=int, default=3, help="Synthetic fixtures when --fixtures is not given")
+    parser.add_argument("--width", type=int, default=3840, help="Synthetic screen width")
+    parser.add_argument("--height", type=int, default=2160, help="Synthetic screen height")
+    parser.add_argument("--runs", type=int, default=2, help="Timed analyses per fixture and mode")
+    parser.add_argument("--tile-size", type=int, default=Config.TILE_SIZE)
+    parser.add_argument("--overlap", type=int, default=Config.TILE_OVERLAP)
+    parser.add_argument("--workers", type=int, default=Config.TILE_WORKERS, help="Concurrent tile requests")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="Fake model: seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Fake model: streaming speed")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000,
+                        help="Fake model: prompt processing speed, so tile transcripts cost time in the final call")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    Config.TILE_SIZE, Config.TILE_OVERLAP, Config.TILE_WORKERS = args.tile_size, args.overlap, args.workers
+    Config.RESPONSE_CACHE = False
+    Config.METRICS_SINKS = ()
+    model_server = None
+    kwargs = {"model": args.model} if args.model else {}
+    if args.backend == "fake":
+        kwargs.update(first_token_latency=args.first_token_latency, tokens_per_second=args.tokens_per_second,
+                      prefill_tokens_per_second=args.prefill_tokens_per_second)
+    elif args.host:
+        Config.OLLAMA_HOST = args.host
+        Config.GEMINI_API_ENDPOINT = args.host if args.backend == "gemini" else None
+    else:
+        model_server = FakeModelServer(
+            first_token_latency=args.first_token_latency,
+            tokens_per_second=args.tokens_per_second,
+            prefill_tokens_per_second=args.prefill_tokens_per_second,
+        ).start()
+        Config.OLLAMA_HOST = model_server.url
+        Config.GEMINI_API_ENDPOINT = model_server.url
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    backend = create_backend(args.backend, **kwargs)
+
+    fixtures = load_ground_truth(args)
+    results = {"single": {"seconds": [], "word_recall": [], "line_recall": [], "requests": 0},
+               "tiled": {"seconds": [], "word_recall": [], "line_recall": [], "requests": 0}}
+    try:
+        for name, img, lines in fixtures:
+            rows, columns, boxes = tile_grid(img.width, img.height)
+            for mode, tiling, transcribe in (("single", "off", transcribe_whole), ("tiled", "on", transcribe_tiled)):
+                before = backend.usage["requests"]
+                seconds, response = time_analysis(img, backend, tiling, args.runs)
+                results[mode]["seconds"].extend(seconds)
+                results[mode]["requests"] += backend.usage["requests"] - before
+                results[mode].setdefault("input_paths", Counter())[response.input_path] += 1
+                if lines:
+                    word_recall, line_recall = recall(lines, transcribe(img, backend))
+                    results[mode]["word_recall"].append(word_recall)
+                    results[mode]["line_recall"].append(line_recall)
+            if not args.json:
+                print(f"{name}: {img.width}x{img.height}, {rows}x{columns} grid of up to {len(boxes)} tiles")
+    finally:
+        if model_server is not None:
+            model_server.stop()
+
+    report = {}
+    for mode, values in results.items():
+        seconds = sorted(values["seconds"])
+        report[mode] = {
+            "analyses": len(seconds),
+            "mean_seconds": sum(seconds) / len(seconds),
+            "p50_seconds": seconds[len(seconds) // 2],
+            "max_seconds": seconds[-1],
+            "requests_per_analysis": values["requests"] / len(seconds),
+            "input_paths": dict(values["input_paths"]),
+            "word_recall": sum(values["word_recall"]) / len(values["word_recall"]) if values["word_recall"] else None,
+            "line_recall": sum(values["line_recall"]) / len(values["line_recall"]) if values["line_recall"] else None,
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print()
+    print(f"{backend.name} backend ({backend.model}), {len(fixtures)} fixtures x {args.runs} runs, "
+          f"{Config.TILE_SIZE}px tiles, {Config.TILE_OVERLAP}px overlap, {Config.TILE_WORKERS} workers")
+    header = f"{'mode':<8}{'mean':>9}{'p50':>9}{'max':>9}{'requests':>10}{'word recall':>13}{'line recall':>13}"
+    print(header)
+    print("-" * len(header))
+    for mode, row in report.items():
+        quality = "".join(f"{row[key]:>13.1%}" if row[key] is not None else f"{'n/a':>13}"
+                          for key in ("word_recall", "line_recall"))
+        print(f"{mode:<8}{row['mean_seconds']:>8.2f}s{row['p50_seconds']:>8.2f}s{row['max_seconds']:>8.2f}s"
+              f"{row['requests_per_analysis']:>10.1f}{quality}")
+    if args.backend == "fake" or (model_server is not None):
+        print("\nThe fake model returns canned text, so recall only means something against a real model.")
+
+if __name__ == "__main__":
+    main()
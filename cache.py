@@ -0,0 +1,159 @@
+"""
+Perceptual-hash response cache for the LeetCode AI Assistant
+
+Analyses are keyed by (perceptual hash of the screenshot, prompt version from
+prompts.content_hash, model). Screens that differ only by a blinking cursor or a
+ticking clock produce hashes a few bits apart, so they are matched by Hamming
+distance rather than by exact equality.
+"""
+import os
+import json
+import math
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+from .config import Config
+
+def perceptual_hash(img, hash_size=None) -> int:
+    """
+    Difference hash (dHash) of an image
+
+    The image is shrunk to (hash_size + 1) x hash_size grayscale pixels and each
+    bit records whether a pixel is brighter than its right-hand neighbour, so
+    small local changes flip at most a few bits.
+    """
+    # Deferred: the hash is first needed by an analysis, not at startup
+    import numpy as np
+    hash_size = hash_size or Config.CACHE_HASH_SIZE
+    small = np.asarray(img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX))
+    bits = small[:, :-1] > small[:, 1:]
+    # Row-major, first pixel in the most significant bit; packbits pads the last byte with zeros
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-bits.size % 8)
+
+def max_hash_distance(hash_size=None, fraction=None) -> int:
+    """Bits two hashes may differ by to count as the same screen: Config.CACHE_MAX_DISTANCE_FRACTION of the hash"""
+    hash_size = hash_size or Config.CACHE_HASH_SIZE
+    fraction = Config.CACHE_MAX_DISTANCE_FRACTION if fraction is None else fraction
+    return math.ceil(hash_size * hash_size * fraction)
+
+class ResponseCache:
+    """LRU + TTL cache of analysis text, persisted to a JSON file"""
+
+    def __init__(self, path=None, max_entries=None, ttl_seconds=None, max_distance=None):
+        self.path = path if path is not None else Config.CACHE_FILE
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.ttl_seconds = Config.CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_distance = max_hash_distance() if max_distance is None else max_distance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # entry id -> entry dict, least recently used first
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Read entries that survived the last run, dropping expired ones"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ResponseCache] Ignoring unreadable cache file {self.path}: {e}")
+            return
+        now = time.time()
+        for entry in entries:
+            if not self._is_expired(entry, now):
+                self._entries[self._entry_id(entry["phash"], entry["prompt"], entry["model"])] = entry
+
+    def _save(self):
+        """Atomically rewrite the cache file"""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".cache-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(list(self._entries.values()), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[ResponseCache] Could not write cache file {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _entry_id(phash, prompt, model):
+        return f"{phash:x}|{prompt}|{model}"
+
+    def _is_expired(self, entry, now):
+        return bool(self.ttl_seconds) and now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, phash: int, prompt: str, model: str):
+        """Return cached text for a screen within max_distance bits of phash, or None"""
+        now = time.time()
+        with self._lock:
+            match_id = None
+            best_distance = self.max_distance + 1
+            expired = []
+            for entry_id, entry in self._entries.items():
+                if self._is_expired(entry, now):
+                    expired.append(entry_id)
+                    continue
+                if entry["prompt"] != prompt or entry["model"] != model:
+                    continue
+                distance = bin(entry["phash"] ^ phash).count("1")
+                if distance < best_distance:
+                    match_id, best_distance = entry_id, distance
+            for entry_id in expired:
+                del self._entries[entry_id]
+            self.expirations += len(expired)
+
+            if match_id is None:
+                self.misses += 1
+                if expired:
+                    self._save()
+                return None
+            self.hits += 1
+            self._entries.move_to_end(match_id)
+            if expired:
+                self._save()
+            return self._entries[match_id]["text"]
+
+    def put(self, phash: int, prompt: str, model: str, text: str):
+        """Store an analysis, evicting the least recently used entries beyond max_entries"""
+        with self._lock:
+            entry_id = self._entry_id(phash, prompt, model)
+            self._entries[entry_id] = {
+                "phash": phash,
+                "prompt": prompt,
+                "model": model,
+                "text": text,
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._save()
+
+    def clear(self):
+        """Drop every entry, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+        }
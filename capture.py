@@ -0,0 +1,293 @@
+"""
+In-memory screen capture for the LeetCode AI Assistant
+"""
+import os
+import json
+import time
+import datetime
+from dataclasses import dataclass, field
+from PIL import Image
+
+from .config import Config
+from .metrics import record
+
+@dataclass
+class CaptureResult:
+    """A screen grab kept in memory as the raw BGRA buffer mss produced"""
+    
+    raw: bytes
+    width: int
+    height: int
+    left: int = 0
+    top: int = 0
+    captured_at: float = field(default_factory=time.time)
+    
+    @property
+    def size(self):
+        return (self.width, self.height)
+    
+    @property
+    def buffer(self) -> memoryview:
+        """Zero-copy view of the BGRA pixel data"""
+        return memoryview(self.raw)
+    
+    def to_image(self) -> Image.Image:
+        """Decode the BGRA buffer into an RGB PIL image (one pass, no compression)"""
+        return Image.frombuffer("RGB", self.size, self.raw, "raw", "BGRX", 0, 1)
+    
+    def save(self, directory=None, prefix="cs_") -> str:
+        """
+        Write the capture to disk as PNG (optional archival side channel)
+        
+        Returns:
+            The absolute path of the written file
+        """
+        directory = directory or Config.SCREENSHOT_DIR
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.datetime.fromtimestamp(self.captured_at).strftime("%Y%m%d_%H%M%S_%f")
+        full_path = os.path.abspath(os.path.join(directory, f"{prefix}{timestamp}.png"))
+        self.to_image().save(full_path, format="PNG")
+        return full_path
+    
+    def crop(self, box):
+        """
+        Return the capture cut down to box = (left, top, right, bottom), relative to this capture
+        
+        Rows are sliced straight out of the BGRA buffer, so nothing is decoded.
+        """
+        left, top, right, bottom = box
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(self.width, right), min(self.height, bottom)
+        if right <= left or bottom <= top:
+            raise ValueError(f"Crop box {box} is outside the {self.width}x{self.height} capture")
+        if (left, top, right, bottom) == (0, 0, self.width, self.height):
+            return self
+        stride = self.width * 4
+        view = self.buffer
+        raw = b"".join(
+            view[row * stride + left * 4:row * stride + right * 4] for row in range(top, bottom)
+        )
+        return CaptureResult(
+            raw=raw,
+            width=right - left,
+            height=bottom - top,
+            left=self.left + left,
+            top=self.top + top,
+            captured_at=self.captured_at,
+        )
+    
+    @classmethod
+    def from_image(cls, img: Image.Image, captured_at=None):
+        """Wrap an existing image (e.g. a fixture screenshot) as a capture"""
+        raw = img.convert("RGBA").tobytes("raw", "BGRA")
+        return cls(raw=raw, width=img.width, height=img.height,
+                   captured_at=captured_at if captured_at is not None else time.time())
+
+def select_monitor(sct):
+    """Pick the primary monitor, falling back to the virtual screen"""
+    if len(sct.monitors) > 1:
+        return sct.monitors[1]
+    if sct.monitors:
+        return sct.monitors[0]
+    raise RuntimeError("No monitors found by mss.")
+
+def load_capture_region(path=None):
+    """Return the saved capture rectangle as (left, top, width, height), or None"""
+    path = path or Config.CAPTURE_REGION_FILE
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        region = json.load(f)
+    return (region["left"], region["top"], region["width"], region["height"])
+
+def save_capture_region(left, top, width, height, path=None):
+    """Remember a capture rectangle (in virtual-screen pixels) for the "region" capture target"""
+    path = path or Config.CAPTURE_REGION_FILE
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"left": left, "top": top, "width": width, "height": height}, f)
+    return path
+
+def cursor_position():
+    """Current mouse position in virtual-screen pixels"""
+    from pynput.mouse import Controller
+    x, y = Controller().position
+    return int(x), int(y)
+
+def monitor_at(sct, x, y):
+    """Return the monitor containing the point (x, y), or None"""
+    for monitor in sct.monitors[1:]:
+        if (monitor["left"] <= x < monitor["left"] + monitor["width"]
+                and monitor["top"] <= y < monitor["top"] + monitor["height"]):
+            return monitor
+    return None
+
+def resolve_target(sct, target=None):
+    """
+    Translate a capture target into the rectangle to grab
+    
+    Args:
+        sct: Open mss instance
+        target: One of Config.CAPTURE_TARGETS (defaults to Config.CAPTURE_TARGET)
+        
+    Returns:
+        An mss monitor dict (left, top, width, height)
+    """
+    target = target or Config.CAPTURE_TARGET
+    if target not in Config.CAPTURE_TARGETS:
+        raise ValueError(f"Unknown capture target '{target}', expected one of {Config.CAPTURE_TARGETS}")
+    
+    if target == "monitor":
+        index = Config.CAPTURE_MONITOR
+        if not 0 <= index < len(sct.monitors):
+            raise ValueError(f"Monitor {index} not found, mss reports {len(sct.monitors) - 1} monitor(s)")
+        return sct.monitors[index]
+    
+    if target == "region":
+        region = Config.CAPTURE_REGION or load_capture_region()
+        if region is None:
+            raise ValueError(
+                f"Capture target 'region' needs Config.CAPTURE_REGION or a saved {Config.CAPTURE_REGION_FILE}"
+            )
+        left, top, width, height = region
+        # Keep the rectangle on screen; mss fails on areas outside the virtual screen
+        screen = sct.monitors[0]
+        right = min(left + width, screen["left"] + screen["width"])
+        bottom = min(top + height, screen["top"] + screen["height"])
+        left, top = max(left, screen["left"]), max(top, screen["top"])
+        if right <= left or bottom <= top:
+            raise ValueError(f"Capture region {region} lies outside the screen")
+        return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+    
+    if target == "mouse":
+        try:
+            monitor = monitor_at(sct, *cursor_position())
+        except Exception as e:
+            print(f"[capture] Cursor position unavailable, using the primary screen: {e}")
+            monitor = None
+        if monitor is not None:
+            return monitor
+    
+    return select_monitor(sct)
+
+def content_box(capture: CaptureResult, tolerance=None, step=None):
+    """
+    Bounding box (left, top, right, bottom) of the capture without uniform borders
+    
+    Edge rows and columns are peeled off while each one is a single colour (to
+    within tolerance), so bars of different colours on different edges all go.
+    Only every `step`-th pixel of the raw buffer is looked at, without decoding
+    it; the box is widened to the sampling grid. Returns None for a uniform screen.
+    """
+    # Deferred like mss: only needed once the first capture is trimmed
+    import numpy as np
+    tolerance = Config.AUTO_CROP_TOLERANCE if tolerance is None else tolerance
+    step = step or Config.AUTO_CROP_STEP
+    frame = np.frombuffer(capture.raw, dtype=np.uint8, count=capture.width * capture.height * 4)
+    small = frame.reshape(capture.height, capture.width, 4)[::step, ::step, :3].astype(np.int32)
+    # Integer approximation of ITU-R 601 luma for BGR channel order
+    gray = (small[..., 0] * 29 + small[..., 1] * 150 + small[..., 2] * 77) >> 8
+    
+    def uniform(line):
+        return int(line.max()) - int(line.min()) <= tolerance
+    
+    left, top, right, bottom = 0, 0, gray.shape[1], gray.shape[0]
+    changed = True
+    while changed:
+        changed = False
+        while top < bottom and left < right and uniform(gray[top, left:right]):
+            top += 1
+            changed = True
+        while bottom > top and left < right and uniform(gray[bottom - 1, left:right]):
+            bottom -= 1
+            changed = True
+        while left < right and top < bottom and uniform(gray[top:bottom, left]):
+            left += 1
+            changed = True
+        while right > left and top < bottom and uniform(gray[top:bottom, right - 1]):
+            right -= 1
+            changed = True
+    if right <= left or bottom <= top:
+        return None
+    # Content may start right after the last uniform sample and end right before the next one
+    return (
+        max(0, (left - 1) * step + 1),
+        max(0, (top - 1) * step + 1),
+        min(capture.width, right * step),
+        min(capture.height, bottom * step),
+    )
+
+def trim_capture(capture: CaptureResult, margins=None, auto_crop=None) -> CaptureResult:
+    """Cut fixed UI chrome margins and then uniform borders from a capture"""
+    margins = Config.CAPTURE_CHROME_MARGINS if margins is None else margins
+    auto_crop = Config.AUTO_CROP if auto_crop is None else auto_crop
+    
+    top, right, bottom, left = margins
+    if any(margins) and left + right < capture.width and top + bottom < capture.height:
+        capture = capture.crop((left, top, capture.width - right, capture.height - bottom))
+    
+    if auto_crop:
+        box = content_box(capture)
+        if box is not None:
+            pad = Config.AUTO_CROP_PADDING
+            capture = capture.crop((box[0] - pad, box[1] - pad, box[2] + pad, box[3] + pad))
+    return capture
+
+def grab_screen(target=None, trim=True, before=None) -> CaptureResult:
+    """
+    Grab the configured capture target without encoding or touching the disk
+    
+    Args:
+        target: One of Config.CAPTURE_TARGETS (defaults to Config.CAPTURE_TARGET)
+        trim: Apply CAPTURE_CHROME_MARGINS and AUTO_CROP to the grab
+        before: With the capture daemon running, take its newest frame captured
+                at or before this time.time() value (e.g. the hotkey press)
+    
+    With Config.CAPTURE_DAEMON on, the frame comes from the daemon's ring and
+    nothing is grabbed here, unless a specific target is asked for.
+    """
+    if target is None and Config.CAPTURE_DAEMON != "off":
+        from .capture_daemon import latest_frame
+        capture = latest_frame(before=before)
+        if capture is not None:
+            return trim_capture(capture) if trim else capture
+    
+    # Loads the platform screen-capture bindings, so it waits until the first grab
+    import mss
+    with mss.mss() as sct:
+        monitor = resolve_target(sct, target)
+        sct_img = sct.grab(monitor)
+        capture = CaptureResult(
+            raw=sct_img.raw,
+            width=sct_img.width,
+            height=sct_img.height,
+            left=monitor["left"],
+            top=monitor["top"],
+        )
+    return trim_capture(capture) if trim else capture
+
+def grab_timed(pressed_at=None):
+    """
+    Grab the screen for an analysis and time it
+
+    Shared by the hotkey pipeline and the server, so both honour
+    CAPTURE_TARGET, the chrome margins and AUTO_CROP. Safe to call off the
+    job's thread: the caller records the timing in the job's trace.
+
+    Args:
+        pressed_at: time.time() of the hotkey press or request (see grab_screen's before)
+
+    Returns:
+        (capture, seconds, attributes of the "capture" stage)
+    """
+    started = time.perf_counter()
+    capture = grab_screen(before=pressed_at)
+    seconds = time.perf_counter() - started
+    attributes = {"width": capture.width, "height": capture.height,
+                  "frame_age": round(time.time() - capture.captured_at, 4)}
+    return capture, seconds, attributes
+
+def capture_screen(pressed_at=None) -> CaptureResult:
+    """grab_timed() recorded as the "capture" stage of the current trace"""
+    capture, seconds, attributes = grab_timed(pressed_at)
+    record("capture", seconds, source="screen", **attributes)
+    return capture
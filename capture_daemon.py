@@ -0,0 +1,367 @@
+"""
+Background capture daemon for the LeetCode AI Assistant
+
+Every on-demand grab opens a new mss session first, which means a display
+connection and a monitor enumeration, and only then grabs. The daemon keeps one
+mss session open and grabs at Config.CAPTURE_DAEMON_FPS into a small ring of
+frame slots in shared memory. A hotkey press copies the newest frame out of the
+ring, or the newest one taken before the press, instead of grabbing itself.
+
+The grabber runs either as a thread of the app (CAPTURE_DAEMON = "thread") or as
+a separate process (CAPTURE_DAEMON = "process"). The separate process keeps the
+grabbing off the app's GIL; start it with:
+
+    python -m screengpt.capture_daemon --fps 4
+"""
+import os
+import time
+import atexit
+import struct
+import argparse
+import threading
+from multiprocessing import shared_memory
+
+from .config import Config
+from .capture import CaptureResult, resolve_target
+
+MAGIC = b"SGFR"
+VERSION = 1
+# magic, version, slots, slot bytes, latest sequence number, frames captured,
+# frames dropped, started at, grab interval, duration of the last grab
+HEADER = struct.Struct("<4sIIQQQQddd")
+# Sequence number at write start, capture time, width, height, left, top, sequence
+# number at write end. A reader that sees the two numbers differ raced the writer.
+SLOT_HEADER = struct.Struct("<QdIIiiQ")
+ALIGN = 64
+
+def _aligned(size):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+class FrameRing:
+    """Fixed-size ring of BGRA frames in shared memory, one writer and any number of readers"""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self._buf = shm.buf
+        magic, version, self.slots, self.slot_bytes, *_ = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError(f"Shared memory '{shm.name}' does not hold a frame ring")
+        self._slot_stride = _aligned(SLOT_HEADER.size) + self.slot_bytes
+        self._base = _aligned(HEADER.size)
+        # Writer-side counters, published in the header after every frame
+        self._seq = 0
+        self._frames = 0
+        self._dropped = 0
+        self._started_at = time.time()
+
+    @classmethod
+    def create(cls, name, slots, slot_bytes, interval):
+        size = _aligned(HEADER.size) + slots * (_aligned(SLOT_HEADER.size) + slot_bytes)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a daemon that didn't exit cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, slots, slot_bytes, 0, 0, 0, time.time(), interval, 0.0)
+        for i in range(slots):
+            offset = _aligned(HEADER.size) + i * (_aligned(SLOT_HEADER.size) + slot_bytes)
+            SLOT_HEADER.pack_into(shm.buf, offset, 0, 0.0, 0, 0, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Open the ring published by a daemon process"""
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            # Readers must not unlink the segment when they exit (Python < 3.13 would)
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, owner=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def _publish(self, last_grab_seconds, interval):
+        HEADER.pack_into(
+            self._buf, 0, MAGIC, VERSION, self.slots, self.slot_bytes, self._seq,
+            self._frames, self._dropped, self._started_at, interval, last_grab_seconds,
+        )
+
+    def write(self, raw, width, height, left, top, captured_at, grab_seconds=0.0, interval=0.0) -> bool:
+        """Store a frame in the next slot; returns False (and counts a drop) if it doesn't fit"""
+        size = width * height * 4
+        if size > self.slot_bytes or len(raw) < size:
+            self._dropped += 1
+            self._publish(grab_seconds, interval)
+            return False
+        seq = self._seq + 1
+        offset = self._base + (seq % self.slots) * self._slot_stride
+        data = offset + _aligned(SLOT_HEADER.size)
+        # Mark the slot as being written, copy the pixels, then seal it with the same number
+        struct.pack_into("<Q", self._buf, offset, seq)
+        self._buf[data:data + size] = memoryview(raw)[:size]
+        SLOT_HEADER.pack_into(self._buf, offset, seq, captured_at, width, height, left, top, seq)
+        self._seq = seq
+        self._frames += 1
+        self._publish(grab_seconds, interval)
+        return True
+
+    def count_dropped(self, count, interval=0.0):
+        self._dropped += count
+        self._publish(0.0, interval)
+
+    def header(self) -> dict:
+        _, _, slots, slot_bytes, seq, frames, dropped, started_at, interval, grab_seconds = HEADER.unpack_from(self._buf, 0)
+        return {
+            "slots": slots,
+            "slot_bytes": slot_bytes,
+            "latest_seq": seq,
+            "frames": frames,
+            "dropped": dropped,
+            "started_at": started_at,
+            "interval": interval,
+            "last_grab_seconds": grab_seconds,
+        }
+
+    def read(self, before=None):
+        """
+        Copy a frame out of the ring
+
+        Args:
+            before: Return the newest frame captured at or before this time.time()
+                    value instead of the newest frame overall
+
+        Returns:
+            A CaptureResult, or None if no suitable frame is in the ring
+        """
+        latest = HEADER.unpack_from(self._buf, 0)[4]
+        for seq in range(latest, max(0, latest - self.slots), -1):
+            offset = self._base + (seq % self.slots) * self._slot_stride
+            for _ in range(3):
+                end_seq = SLOT_HEADER.unpack_from(self._buf, offset)[6]
+                begin_seq, captured_at, width, height, left, top, _ = SLOT_HEADER.unpack_from(self._buf, offset)
+                if begin_seq != end_seq:
+                    continue  # Being written right now
+                if end_seq != seq:
+                    break  # Already overwritten by a newer frame
+                if before is not None and captured_at > before:
+                    break
+                data = offset + _aligned(SLOT_HEADER.size)
+                raw = bytes(self._buf[data:data + width * height * 4])
+                if struct.unpack_from("<Q", self._buf, offset)[0] != seq:
+                    continue  # The writer wrapped around onto this slot while we copied
+                return CaptureResult(raw=raw, width=width, height=height, left=left, top=top, captured_at=captured_at)
+        return None
+
+    def stats(self) -> dict:
+        """Capture fps, dropped frames and buffer memory as seen in the shared header"""
+        header = self.header()
+        elapsed = max(1e-9, time.time() - header["started_at"])
+        return {
+            "fps": header["frames"] / elapsed,
+            "frames": header["frames"],
+            "dropped": header["dropped"],
+            "last_grab_ms": header["last_grab_seconds"] * 1000,
+            "buffer_mb": self.nbytes / 2**20,
+            "slots": header["slots"],
+        }
+
+    def close(self):
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+def _slot_bytes(sct, monitor, target):
+    """Largest frame the daemon may have to store"""
+    if (target or Config.CAPTURE_TARGET) == "mouse":
+        screens = sct.monitors[1:] or sct.monitors
+        return max(m["width"] * m["height"] for m in screens) * 4
+    return monitor["width"] * monitor["height"] * 4
+
+class CaptureDaemon:
+    """Grabs the capture target at a fixed rate into a FrameRing from a background thread"""
+
+    def __init__(self, fps=None, slots=None, target=None, name=None):
+        self.fps = fps or Config.CAPTURE_DAEMON_FPS
+        self.interval = 1 / self.fps
+        self.slots = slots or Config.CAPTURE_DAEMON_SLOTS
+        self.target = target
+        self.name = name or f"{Config.CAPTURE_DAEMON_SHM_NAME}_{os.getpid()}"
+        self.ring = None
+        self.error = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, timeout=5.0):
+        """Start grabbing; waits until the first frame is in the ring (or the daemon failed)"""
+        self._thread = threading.Thread(target=self._run, name="capture-daemon", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self.error is not None:
+            raise RuntimeError(f"Capture daemon failed to start: {self.error}")
+        return self
+
+    def _run(self):
+        # mss sessions are bound to the thread that opened them
+        import mss
+        try:
+            with mss.mss() as sct:
+                monitor = resolve_target(sct, self.target)
+                self.ring = FrameRing.create(self.name, self.slots, _slot_bytes(sct, monitor, self.target), self.interval)
+                follow_mouse = (self.target or Config.CAPTURE_TARGET) == "mouse"
+                next_at = time.monotonic()
+                while not self._stop.is_set():
+                    now = time.monotonic()
+                    if now < next_at:
+                        self._stop.wait(next_at - now)
+                        continue
+                    # Ticks that passed while the previous grab overran are dropped, not made up
+                    missed = int((now - next_at) / self.interval)
+                    if missed:
+                        self.ring.count_dropped(missed, self.interval)
+                    next_at += (missed + 1) * self.interval
+                    try:
+                        if follow_mouse:
+                            monitor = resolve_target(sct, "mouse")
+                        started = time.perf_counter()
+                        sct_img = sct.grab(monitor)
+                        self.ring.write(
+                            sct_img.raw, sct_img.width, sct_img.height, monitor["left"], monitor["top"],
+                            time.time(), time.perf_counter() - started, self.interval,
+                        )
+                    except Exception as e:
+                        # A locked screen or display change; keep trying at the same rate
+                        self.ring.count_dropped(1, self.interval)
+                        if not self._ready.is_set():
+                            raise
+                        print(f"[capture-daemon] Grab failed: {e}")
+                    self._ready.set()
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+        finally:
+            if self.ring is not None:
+                self.ring.close()
+                self.ring = None
+
+    def read(self, before=None):
+        ring = self.ring
+        return ring.read(before) if ring is not None else None
+
+    def stats(self) -> dict:
+        ring = self.ring
+        return ring.stats() if ring is not None else {}
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+_daemon = None
+_daemon_lock = threading.Lock()
+_attach_failed_at = None
+
+def get_capture_daemon():
+    """
+    Return the frame source selected by Config.CAPTURE_DAEMON, starting it on first use
+
+    Returns a CaptureDaemon ("thread"), a FrameRing attached to a daemon process
+    ("process") or None ("off", or no daemon process running yet).
+    """
+    global _daemon, _attach_failed_at
+    mode = Config.CAPTURE_DAEMON
+    if mode not in Config.CAPTURE_DAEMON_MODES:
+        raise ValueError(f"Unknown capture daemon mode '{mode}', expected one of {Config.CAPTURE_DAEMON_MODES}")
+    if mode == "off":
+        return None
+    with _daemon_lock:
+        if _daemon is not None:
+            return _daemon
+        if mode == "thread":
+            try:
+                _daemon = CaptureDaemon().start()
+                # Unlink the shared memory on exit instead of leaving it to the resource tracker
+                atexit.register(_daemon.stop)
+                print(f"[capture-daemon] Grabbing at {_daemon.fps:g} fps into "
+                      f"{_daemon.stats().get('buffer_mb', 0):.0f} MB of shared memory")
+            except Exception as e:
+                print(f"[capture-daemon] Not available, grabbing on each press: {e}")
+                Config.CAPTURE_DAEMON = "off"
+            return _daemon
+        # The daemon process may be started after the app; retry now and then
+        if _attach_failed_at is not None and time.monotonic() - _attach_failed_at < 5:
+            return None
+        try:
+            _daemon = FrameRing.attach(Config.CAPTURE_DAEMON_SHM_NAME)
+        except (FileNotFoundError, RuntimeError) as e:
+            if _attach_failed_at is None:
+                print(f"[capture-daemon] No daemon process found ({e}); start it with `python -m screengpt.capture_daemon`")
+            _attach_failed_at = time.monotonic()
+        return _daemon
+
+def latest_frame(before=None, max_age=None):
+    """
+    The daemon's newest frame (taken at or before `before`, if given), or None to grab live
+
+    Frames older than max_age seconds (Config.CAPTURE_DAEMON_MAX_AGE) are not used:
+    the daemon has stalled, e.g. because the screen is locked.
+    """
+    source = get_capture_daemon()
+    if source is None:
+        return None
+    frame = source.read(before)
+    if frame is None and before is not None:
+        # Nothing older than the press yet (daemon just started)
+        frame = source.read()
+    max_age = Config.CAPTURE_DAEMON_MAX_AGE if max_age is None else max_age
+    if frame is None or time.time() - frame.captured_at > max_age:
+        return None
+    return frame
+
+def main():
+    parser = argparse.ArgumentParser(description="Grab the screen continuously into shared memory for the assistant")
+    parser.add_argument("--fps", type=float, default=None, help=f"Grabs per second (default: {Config.CAPTURE_DAEMON_FPS})")
+    parser.add_argument("--slots", type=int, default=None, help=f"Frames kept (default: {Config.CAPTURE_DAEMON_SLOTS})")
+    parser.add_argument("--target", choices=Config.CAPTURE_TARGETS, default=None, help="Capture target (default: Config)")
+    parser.add_argument("--report-every", type=float, default=10, help="Seconds between stats lines")
+    parser.add_argument("--stats", action="store_true", help="Print the stats of a running daemon and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        ring = FrameRing.attach(Config.CAPTURE_DAEMON_SHM_NAME)
+        stats = ring.stats()
+        ring.close()
+        print(", ".join(f"{key} {value:.1f}" if isinstance(value, float) else f"{key} {value}" for key, value in stats.items()))
+        return
+
+    daemon = CaptureDaemon(fps=args.fps, slots=args.slots, target=args.target, name=Config.CAPTURE_DAEMON_SHM_NAME)
+    daemon.start()
+    print(f"Capture daemon publishing '{daemon.name}' at {daemon.fps:g} fps. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(args.report_every)
+            stats = daemon.stats()
+            if not stats:
+                print(f"Capture daemon stopped: {daemon.error}")
+                return
+            print(f"{stats['fps']:.1f} fps, {stats['frames']} frames, {stats['dropped']} dropped, "
+                  f"last grab {stats['last_grab_ms']:.1f} ms, {stats['buffer_mb']:.0f} MB buffer")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,6 @@ Configuration settings for the LeetCode AI Assistant
 import os
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
 class Config:
     """Configuration class for the application"""
     
@@ -15,23 +12,179 @@ class Config:
     
     # Directory settings
     SCREENSHOT_DIR = "crew_temp_screenshots"
+    # The direct pipeline keeps captures in memory; set this to also keep a PNG copy
+    ARCHIVE_SCREENSHOTS = False
+    ARCHIVE_DIR = "screenshot_archive"
+    # The archive stores each distinct frame once (see archive.py) and prunes it in the background
+    ARCHIVE_MAX_BYTES = 2 * 1024**3        # Object storage limit; the oldest frames go first
+    ARCHIVE_MAX_AGE_DAYS = 30              # Frames older than this are dropped (None keeps them)
+    ARCHIVE_MAX_DISTANCE = 4               # Hash bits within which a frame is stored as a reference
+    ARCHIVE_RECENT_WINDOW = 64             # Recently stored frames a new one is compared with
+    ARCHIVE_RETENTION_INTERVAL = 600       # Seconds between retention passes
     LOG_FILE = "leetcode_solutions.md"
+    # Analyses are indexed in SQLite; LOG_FILE is then a markdown export of the store
+    SOLUTION_STORE = True
+    SOLUTION_DB = "leetcode_solutions.db"
     
     # Hotkey settings
     HOTKEY_COMBINATION = '<ctrl>+<shift>+a'
     HOTKEY_COMBINATION_MAC = '<cmd>+<shift>+a'
     
+    # Capture settings
+    # "primary" screen, "monitor" (CAPTURE_MONITOR, numbered as in mss), "region"
+    # (CAPTURE_REGION, or the rectangle saved in CAPTURE_REGION_FILE) or "mouse"
+    # (whichever monitor the cursor is on)
+    CAPTURE_TARGET = "primary"
+    CAPTURE_TARGETS = ("primary", "monitor", "region", "mouse")
+    CAPTURE_MONITOR = 1
+    CAPTURE_REGION = None  # (left, top, width, height) in virtual-screen pixels
+    CAPTURE_REGION_FILE = "capture_region.json"
+    # Pixels always cut from each edge (top, right, bottom, left), e.g. a menu bar or browser tabs
+    CAPTURE_CHROME_MARGINS = (0, 0, 0, 0)
+    # Trim uniform borders (desktop background, letterboxing, empty editor margins)
+    AUTO_CROP = True
+    AUTO_CROP_TOLERANCE = 8
+    AUTO_CROP_PADDING = 16  # Border pixels kept around the content
+    AUTO_CROP_STEP = 4  # Sample every Nth pixel when looking for the borders
+    # Background capture daemon: "off" grabs on each press; "thread" keeps one mss
+    # session open and grabs CAPTURE_DAEMON_FPS times a second into a shared-memory
+    # ring, so a press reads the newest frame instead of grabbing; "process" reads
+    # the ring of a separate `python -m screengpt.capture_daemon`
+    CAPTURE_DAEMON = "off"
+    CAPTURE_DAEMON_MODES = ("off", "thread", "process")
+    CAPTURE_DAEMON_FPS = 4
+    CAPTURE_DAEMON_SLOTS = 4
+    CAPTURE_DAEMON_SHM_NAME = "screengpt_frames"
+    CAPTURE_DAEMON_MAX_AGE = 1.0  # Older frames mean the daemon has stalled; grab live instead
+    CAPTURE_DAEMON_BEFORE_PRESS = True  # Use the newest frame taken before the hotkey press
+    
     # Model settings
     GEMINI_MODEL = "gemini/gemini-2.0-flash"
     GEMINI_VISION_MODEL = "gemini-2.0-flash"
+    # Send Gemini requests over REST to this endpoint instead of Google's (e.g. benchmarks/fake_server.py)
+    GEMINI_API_ENDPOINT = None
     TEMPERATURE = 0.1
     
+    # Vision backend: "gemini", "ollama" (local) or "fake" (offline, for tests and benchmarks)
+    VISION_BACKEND = "gemini"
+    OLLAMA_HOST = "http://localhost:11434"
+    OLLAMA_VISION_MODEL = "gemma3:4b-it-qat"
+    OLLAMA_KEEP_ALIVE = "30m"  # Keep the model resident in memory between presses
+    FAKE_FIRST_TOKEN_LATENCY = 0.5
+    FAKE_TOKENS_PER_SECOND = 80
+    
+    # Image preparation before upload to the vision model
+    IMAGE_MAX_EDGE = 1920      # Longest edge in pixels; None keeps full resolution
+    IMAGE_FORMAT = "JPEG"      # "JPEG", "WEBP" or "PNG"
+    IMAGE_QUALITY = 85         # JPEG/WebP quality (1-100)
+    IMAGE_GRAYSCALE = False    # Text-heavy screens rarely need colour
+    
+    # Local OCR pre-pass (needs pytesseract and the tesseract binary)
+    # "off", "thumbnail" (OCR text plus a small image) or "text" (OCR text only);
+    # screens OCR can't read confidently are still sent as a full image
+    OCR_MODE = "off"
+    OCR_MODES = ("off", "thumbnail", "text")
+    OCR_LANGUAGE = "eng"
+    OCR_MIN_CONFIDENCE = 80  # Mean word confidence (0-100)
+    OCR_MIN_WORDS = 20
+    OCR_THUMBNAIL_EDGE = 512
+    # Model for OCR text requests on the same backend (None uses the vision model)
+    OCR_TEXT_MODEL = None
+    
+    # Tiled analysis (see tiling.py): the screen is cut into overlapping tiles that are
+    # transcribed concurrently, then one text request (on OCR_TEXT_MODEL if set) reasons
+    # over the transcripts. "off", "on", or "auto" (only for TILE_AUTO_BACKENDS and
+    # screens at least TILE_AUTO_MIN_EDGE pixels across)
+    TILING = "off"
+    TILING_MODES = ("off", "on", "auto")
+    TILE_SIZE = 896            # gemma3's input size; Gemini works in 768px tiles
+    TILE_OVERLAP = 96          # Pixels shared by neighbouring tiles (a few lines of text)
+    TILE_MAX_TILES = 12        # Larger screens get larger tiles, downscaled to TILE_SIZE
+    TILE_WORKERS = 4           # Concurrent tile requests (Ollama needs OLLAMA_NUM_PARALLEL to match)
+    TILE_AUTO_BACKENDS = ("ollama",)
+    TILE_AUTO_MIN_EDGE = 2560
+    
+    # Follow-up questions: recent turns are sent verbatim, older ones as a running summary
+    CONVERSATION_MAX_TURNS = 8
+    CONVERSATION_TURN_CHARS = 4000
+    CONVERSATION_SUMMARY_CHARS = 2000
+    
+    # Provider-side caching of the fixed analysis prompt: Gemini cached content,
+    # and for Ollama a stable system-message prefix whose KV cache is reused
+    CONTEXT_CACHE = True
+    CONTEXT_CACHE_TTL_SECONDS = 3600
+    
+    # Response cache: re-analyzing an (almost) unchanged screen returns the stored answer
+    RESPONSE_CACHE = True
+    CACHE_FILE = "analysis_cache.json"
+    CACHE_MAX_ENTRIES = 256
+    CACHE_TTL_SECONDS = 24 * 60 * 60
+    CACHE_HASH_SIZE = 64       # 64x64 difference hash; smaller hashes can't tell two problem pages apart
+    # Share of the hash bits that may differ for two screens to count as the same:
+    # 16 of 4096 absorbs a clock tick or cursor blink, different problems differ by hundreds
+    CACHE_MAX_DISTANCE_FRACTION = 1 / 256
+    
+    # Pipeline settings
+    # "direct" calls capture and vision analysis as plain functions;
+    # "crew" runs the two-agent CrewAI workflow (extra LLM planning calls)
+    PIPELINE_MODE = "direct"
+    PIPELINE_MODES = ("direct", "crew")
+    # Print and log the direct pipeline's answer as tokens arrive
+    STREAM_RESPONSES = True
+    
+    # A hotkey press during an analysis cancels it and analyzes the newer screen instead
+    CANCEL_STALE_ANALYSES = True
+    
+    # Pipeline timing spans (see metrics.py): "jsonl" appends every span to
+    # METRICS_TRACE_FILE, "prometheus" keeps per-stage histograms, rewritten to
+    # METRICS_PROMETHEUS_FILE after each analysis and served on METRICS_PORT if set.
+    # Off (an empty tuple) unless opted into, since the trace file is never rotated
+    METRICS_SINKS = ()
+    METRICS_SINK_CHOICES = ("jsonl", "prometheus")
+    METRICS_TRACE_FILE = "pipeline_trace.jsonl"
+    METRICS_PROMETHEUS_FILE = "pipeline_metrics.prom"
+    METRICS_PORT = None  # e.g. 9464
+    
+    # Server mode (`python -m screengpt.server`) for the Electron frontend: analyses
+    # run on SERVER_WORKERS threads sharing one vision backend, and requests beyond
+    # SERVER_MAX_PENDING waiting ones are turned away
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 5000
+    SERVER_WORKERS = 4
+    SERVER_MAX_PENDING = 32
+    SERVER_MAX_UPLOAD_MB = 20
+    
+    # Build the crew and vision model (and open the API connection) at startup
+    WARM_UP_ON_START = True
+    
     # Crew settings
     VERBOSE = False
     
+    @classmethod
+    def vision_model_name(cls):
+        """Name of the model used by the configured vision backend"""
+        if cls.VISION_BACKEND == "ollama":
+            return cls.OLLAMA_VISION_MODEL
+        if cls.VISION_BACKEND == "gemini":
+            return cls.GEMINI_VISION_MODEL
+        return cls.VISION_BACKEND
+    
+    _initialized = False
+    
     @classmethod
     def initialize(cls):
-        """Initialize configuration and validate environment variables"""
+        """
+        Initialize configuration and validate environment variables
+        
+        Entry points call this explicitly (the crew manager does it on construction)
+        rather than it running on import; later calls are no-ops.
+        """
+        if cls._initialized:
+            return cls.GOOGLE_API_KEY
+        
+        # Load environment variables
+        load_dotenv()
+        
         # Check for API key
         cls.GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
         if not cls.GOOGLE_API_KEY:
@@ -39,7 +192,7 @@ class Config:
             if cls.GOOGLE_API_KEY:
                 os.environ["GOOGLE_API_KEY"] = cls.GOOGLE_API_KEY
                 print("Found GEMINI_API_KEY, using it for GOOGLE_API_KEY.")
-            else:
+            elif cls.VISION_BACKEND == "gemini":
                 print("CRITICAL ERROR: Neither GOOGLE_API_KEY nor GEMINI_API_KEY environment variable is set.")
                 exit(1)
         
@@ -47,7 +200,5 @@ class Config:
         if not os.path.exists(cls.SCREENSHOT_DIR):
             os.makedirs(cls.SCREENSHOT_DIR)
         
+        cls._initialized = True
         return cls.GOOGLE_API_KEY
-
-# Initialize configuration when module is imported
-Config.initialize() 
\ No newline at end of file
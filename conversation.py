@@ -0,0 +1,141 @@
+"""
+Conversation memory for follow-up questions in the LeetCode AI Assistant
+
+Recent turns are kept verbatim in a bounded ring buffer. When it overflows, the
+oldest turns are folded into a running summary, so the history sent with a
+follow-up stays roughly the same size however long the session runs. Screens
+the model has already seen are remembered by perceptual hash and referenced
+instead of uploaded again.
+"""
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .config import Config
+from .cache import max_hash_distance
+
+@dataclass
+class Turn:
+    """One message in the conversation"""
+
+    role: str  # "user" or "assistant"
+    text: str
+    image_hash: Optional[int] = None  # Perceptual hash of the screenshot sent with the turn
+    created_at: float = field(default_factory=time.time)
+
+def image_label(image_hash: int) -> str:
+    """Short name for a screenshot, used to refer back to it in the history"""
+    return f"screenshot #{image_hash & 0xFFFFFFFF:08x}"
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def summarize_turns(summary: str, turns, limit: int) -> str:
+    """
+    Fold turns into a running summary without a model call
+
+    Each turn keeps its opening (the question, or the first lines of the answer,
+    which in the analysis format names the problem and approach). The oldest
+    lines are dropped once the summary exceeds limit characters.
+    """
+    lines = [line for line in summary.splitlines() if line]
+    for turn in turns:
+        if turn.role == "user":
+            text = turn.text or image_label(turn.image_hash)
+            lines.append(f"- User: {_clip(text, 200)}")
+        else:
+            lines.append(f"- Assistant: {_clip(turn.text, 300)}")
+    while lines and sum(len(line) + 1 for line in lines) > limit:
+        lines.pop(0)
+    return "\n".join(lines)
+
+class Conversation:
+    """Bounded history of one problem-solving session"""
+
+    def __init__(self, max_turns=None, turn_chars=None, summary_chars=None, summarizer=None):
+        """
+        Args:
+            max_turns: Turns kept verbatim before the oldest are summarized
+            turn_chars: Longest stored text per turn (answers are clipped)
+            summary_chars: Longest running summary
+            summarizer: Callable (summary, turns, limit) -> summary, e.g. one that asks a model
+        """
+        self.max_turns = max_turns or Config.CONVERSATION_MAX_TURNS
+        self.turn_chars = turn_chars or Config.CONVERSATION_TURN_CHARS
+        self.summary_chars = summary_chars or Config.CONVERSATION_SUMMARY_CHARS
+        self.summarizer = summarizer or summarize_turns
+        self.turns = deque()
+        self.summary = ""
+        self.image_hashes = deque(maxlen=32)  # Screens the model has seen, newest last
+        self.compactions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, role: str, text: str, image_hash=None):
+        """Append a turn, compacting the oldest turns into the summary when the buffer is full"""
+        with self._lock:
+            if len(text) > self.turn_chars:
+                text = text[:self.turn_chars] + "\n[…]"
+            self.turns.append(Turn(role, text, image_hash))
+            if image_hash is not None:
+                self.image_hashes.append(image_hash)
+            if len(self.turns) > self.max_turns:
+                self._compact()
+
+    def _compact(self):
+        # Fold the older half in one go, keeping question/answer pairs together
+        count = max(2, len(self.turns) // 2)
+        count += count % 2
+        evicted = [self.turns.popleft() for _ in range(min(count, len(self.turns)))]
+        self.summary = self.summarizer(self.summary, evicted, self.summary_chars)
+        self.compactions += 1
+
+    def record_analysis(self, image_hash, text: str):
+        """Remember a hotkey analysis so follow-ups can refer to it"""
+        self.add("user", "", image_hash=image_hash)
+        self.add("assistant", text)
+
+    def find_image(self, image_hash, max_distance=None):
+        """Return the hash of an already-sent screenshot within max_distance bits, or None"""
+        max_distance = max_hash_distance() if max_distance is None else max_distance
+        with self._lock:
+            for seen in reversed(self.image_hashes):
+                if bin(seen ^ image_hash).count("1") <= max_distance:
+                    return seen
+        return None
+
+    def render(self, question: str, image_note: str = "") -> str:
+        """The history plus the new question, as the per-request message of a follow-up"""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+            if self.turns:
+                history = []
+                for turn in self.turns:
+                    if turn.role == "user":
+                        text = turn.text
+                        if turn.image_hash is not None:
+                            text = f"[{image_label(turn.image_hash)}] {text}".strip()
+                        history.append(f"User: {text}")
+                    else:
+                        history.append(f"Assistant: {turn.text}")
+                parts.append("Earlier in this conversation:\n" + "\n\n".join(history))
+        question_text = f"Follow-up question: {question}"
+        if image_note:
+            question_text += f"\n{image_note}"
+        parts.append(question_text)
+        return "\n\n".join(parts)
+
+    def reset(self):
+        """Start a new session"""
+        with self._lock:
+            self.turns.clear()
+            self.summary = ""
+            self.image_hashes.clear()
+            self.compactions = 0
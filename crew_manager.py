@@ -1,78 +1,263 @@
 """
 CrewAI workflow manager for the LeetCode AI Assistant
 """
+import os
+import time
 import threading
-from crewai import Crew, Process
-from .agents import create_screen_scanner_agent, create_image_analysis_agent
-from .tasks import create_capture_task, create_analyze_task
+from concurrent.futures import ThreadPoolExecutor
+from .session import AnalysisSession
+from .jobs import AnalysisJob, AnalysisQueue, AnalysisCancelled
+from .capture import capture_screen, grab_timed
+from .capture_daemon import get_capture_daemon
+from .archive import archive_frame, open_archive_in_background
+from .analysis import analyze_image, ask_follow_up, get_response_cache
+from .cache import perceptual_hash
+from .conversation import Conversation
+from .solution_store import get_solution_store, extract_problem_title
+from .streaming import TokenStream
+from .metrics import span, trace, record
 from .logger import LeetCodeLogger
 from .config import Config
 
 class LeetCodeCrewManager:
     """Manages the CrewAI workflow for LeetCode analysis"""
     
-    def __init__(self):
-        self.analysis_in_progress = False
+    def __init__(self, pipeline_mode=None):
+        Config.initialize()
+        self.pipeline_mode = pipeline_mode or Config.PIPELINE_MODE
+        if self.pipeline_mode not in Config.PIPELINE_MODES:
+            raise ValueError(
+                f"Unknown pipeline mode '{self.pipeline_mode}', expected one of {Config.PIPELINE_MODES}"
+            )
+        self.queue = AnalysisQueue(self._process_job, cancel_in_flight=Config.CANCEL_STALE_ANALYSES)
+        # Presses are grabbed here, in parallel with whatever analysis the queue is running
+        self.capture_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="capture")
+        self.last_stream_stats = None
+        self.last_response = None
+        self.last_image_hash = None
+        self.conversation = Conversation()
         self.logger = LeetCodeLogger()
-        self._setup_crew()
+        self.session = AnalysisSession(self.pipeline_mode)
+        if Config.CAPTURE_DAEMON != "off":
+            # Start grabbing now so the first press already finds a frame
+            get_capture_daemon()
+        if Config.ARCHIVE_SCREENSHOTS:
+            # Replaying the archive index takes a while; do it now, not on the first analysis
+            open_archive_in_background()
+        if Config.WARM_UP_ON_START:
+            self.warm_up(background=True)
     
-    def _setup_crew(self):
-        """Initialize the CrewAI agents, tasks, and crew"""
-        # Create agents
-        self.screen_scanner_agent = create_screen_scanner_agent()
-        self.image_analysis_agent = create_image_analysis_agent()
+    def warm_up(self, background=False, connect=True):
+        """Build the crew and vision backend up front so the first hotkey press doesn't pay for it"""
+        if background:
+            threading.Thread(target=self.session.warm_up, kwargs={"connect": connect}, daemon=True).start()
+        else:
+            self.session.warm_up(connect=connect)
+    
+    @property
+    def analysis_in_progress(self):
+        return self.queue.busy
+    
+    def run_analysis(self, timeout=None):
+        """Capture and analyze the current screen, waiting for the answer"""
+        self.queue.submit(self._new_job())
+        return self.queue.join(timeout)
+    
+    def ask_follow_up(self, question, include_screen=True, timeout=None):
+        """
+        Ask a follow-up about the problem being discussed and wait for the answer
         
-        # Create tasks
-        self.capture_task = create_capture_task(self.screen_scanner_agent)
-        self.analyze_task = create_analyze_task(self.image_analysis_agent, self.capture_task)
+        Args:
+            question: The question to ask
+            include_screen: Capture the screen too (only uploaded if it changed)
+            timeout: Seconds to wait (None waits until done)
+        """
+        self.queue.submit(self._new_job(question=question, include_screen=include_screen))
+        return self.queue.join(timeout)
+    
+    def _capture(self, pressed_at=None):
+        capture = capture_screen(pressed_at)
+        print(f"[DEBUG] Screen captured in memory: {capture.width}x{capture.height}")
+        return capture
+    
+    def _new_job(self, question=None, include_screen=True):
+        """
+        Start grabbing the screen at the press, so the analysis reflects that moment
         
-        # Create crew
-        self.crew = Crew(
-            agents=[self.screen_scanner_agent, self.image_analysis_agent],
-            tasks=[self.capture_task, self.analyze_task],
-            process=Process.sequential,
-            verbose=Config.VERBOSE
-        )
+        The grab runs on the capture executor rather than the hotkey listener or
+        the queue's thread; a superseded job's frame is simply dropped.
+        """
+        pressed_at = time.time() if Config.CAPTURE_DAEMON_BEFORE_PRESS else None
+        job = AnalysisJob(question=question, pressed_at=pressed_at)
+        if self.pipeline_mode == "crew" and question is None:
+            # The crew's capture agent takes its own screenshot
+            return job
+        if include_screen:
+            job.pending_capture = self.capture_executor.submit(grab_timed, pressed_at)
+        return job
     
-    def run_analysis(self):
-        """Run the screen analysis in a separate thread"""
-        if self.analysis_in_progress:
-            print("⚠️  Analysis already in progress, skipping...")
-            return
+    def _process_job(self, job):
+        """Analyze one queued job (runs on the queue's consumer thread)"""
+        print(f"[DEBUG] run_analysis: started job {job.id}")
         
-        self.analysis_in_progress = True
-        print("[DEBUG] run_analysis: started, analysis_in_progress set to True")
+        with trace(job.id) as job_trace:
+            try:
+                # Follow-ups always take the direct path, which holds the conversation
+                direct = self.pipeline_mode == "direct" or job.question is not None
+                with span("job", pipeline="direct" if direct else self.pipeline_mode, follow_up=job.question is not None,
+                          queued_seconds=round(time.perf_counter() - job.created_at, 6)):
+                    self._analyze_job(job, direct)
+            except AnalysisCancelled:
+                print(f"\n⏭️  Newer screenshot arrived, dropped stale analysis (job {job.id})")
+            except Exception as e:
+                print(f"❌ Error during LeetCode analysis: {e}")
+                import traceback
+                traceback.print_exc()
+            finally:
+                print(f"[DEBUG] run_analysis: finished job {job.id}")
+                # Cleanup screenshots
+                with span("cleanup"):
+                    self.logger.cleanup_screenshots()
+                if job_trace.spans:
+                    print(f"[DEBUG] Stage timings: {job_trace.summary()}")
+    
+    def _analyze_job(self, job, direct):
+        """Run the analysis for a job and log the answer"""
+        job.check()
+        if job.pending_capture is not None:
+            job.capture, seconds, attributes = job.pending_capture.result()
+            job.pending_capture = None
+            # Grabbed on the capture executor; its timing belongs to this job's trace
+            record("capture", seconds, source="screen", **attributes)
+            print(f"[DEBUG] Screen captured in memory: {job.capture.width}x{job.capture.height}")
+        if job.question is not None:
+            print(f"💬 Follow-up: {job.question}")
+        else:
+            print(f"🔍 Analyzing LeetCode problem ({self.pipeline_mode} pipeline)...")
+        streaming = direct and Config.STREAM_RESPONSES
+        if streaming:
+            # Tokens go to the console and the log file as they arrive,
+            # until a newer press cancels the job
+            title = "Follow-up" if job.question is not None else "LeetCode Analysis"
+            # With the solution store, the markdown log is written as an export once the answer is stored
+            log_file = os.devnull if Config.SOLUTION_STORE else None
+            with TokenStream(log_file=log_file, title=title, cancel_check=job.check) as stream:
+                raw_output = self._run_direct(stream=stream, capture=job.capture, question=job.question)
+            self.last_stream_stats = stream.stats
+        elif direct:
+            raw_output = self._run_direct(capture=job.capture, question=job.question)
+            # Blocking calls can't be interrupted, but a superseded answer is never shown
+            job.check()
+        else:
+            raw_output = self._run_pipeline(capture=job.capture)
+            # Blocking calls can't be interrupted, but a superseded answer is never shown
+            job.check()
         
-        try:
-            print("🔍 Analyzing LeetCode problem...")
-            self._setup_crew()  # Recreate agents, tasks, and crew for every analysis
-            print("[DEBUG] Before self.crew.kickoff()")
-            crew_output = self.crew.kickoff()
-            print("[DEBUG] After self.crew.kickoff()")
-            
-            # Process the output
-            raw_output = self._extract_raw_output(crew_output)
-            
-            # Log the results
-            if raw_output:
+        # Log the results
+        if raw_output and Config.SOLUTION_STORE:
+            with span("log_write", sink="solution_store"):
+                self._store_solution(raw_output, job, response=self.last_response if direct else None)
+            summary = f" ({stream.stats.summary()})" if streaming else ""
+            print(f"✅ LeetCode analysis complete! Saved to {Config.SOLUTION_DB} and {Config.LOG_FILE}{summary}")
+        elif raw_output and streaming:
+            print(f"✅ LeetCode analysis complete! Streamed to {Config.LOG_FILE} ({stream.stats.summary()})")
+        elif raw_output:
+            with span("log_write", sink="markdown"):
                 self.logger.log_analysis(raw_output, "")
-                print("✅ LeetCode analysis complete! Solution saved to leetcode_solutions.md")
-                
-                # Show preview
-                preview = self.logger.get_analysis_preview(raw_output)
-                print(preview)
-            else:
-                print("❌ No analysis output received")
-                
-        except Exception as e:
-            print(f"❌ Error during LeetCode analysis: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            self.analysis_in_progress = False
-            print("[DEBUG] run_analysis: finished, analysis_in_progress set to False")
-            # Cleanup screenshots
-            self.logger.cleanup_screenshots()
+            print("✅ LeetCode analysis complete! Solution saved to leetcode_solutions.md")
+            
+            # Show preview
+            preview = self.logger.get_analysis_preview(raw_output)
+            print(preview)
+        else:
+            print("❌ No analysis output received")
+    
+    def _store_solution(self, text, job, response=None):
+        """Index an answer in the solution store and append it to the markdown export"""
+        if response is not None and response.backend == "cache":
+            # Already stored when it was first generated
+            return None
+        store = get_solution_store()
+        title = extract_problem_title(text)
+        if job.question is None:
+            previous = store.find_solved(title=title, screenshot_hash=self.last_image_hash)
+            if previous is not None:
+                print(f"📚 Analyzed before: {previous.title or 'same screen'} on {previous.timestamp} (#{previous.id})")
+        solution_id = store.add(
+            text,
+            title=title,
+            model=response.model if response is not None else Config.vision_model_name(),
+            backend=response.backend if response is not None else None,
+            input_path=response.input_path if response is not None else None,
+            latency_seconds=time.perf_counter() - job.created_at,
+            first_token_seconds=response.time_to_first_token if response is not None else None,
+            prompt_tokens=response.prompt_tokens if response is not None else None,
+            output_tokens=response.output_tokens if response is not None else None,
+            screenshot_hash=self.last_image_hash if response is not None else None,
+        )
+        store.append_markdown(solution_id)
+        return solution_id
+    
+    def _run_pipeline(self, capture=None):
+        """Run capture and analysis with the configured pipeline and return the raw text"""
+        if self.pipeline_mode == "crew":
+            return self._run_crew()
+        return self._run_direct(capture=capture)
+    
+    def _run_direct(self, stream=None, capture=None, question=None):
+        """
+        Analyze a capture (or a fresh grab) with plain function calls, skipping agent planning
+        
+        With a question, answer it as a follow-up in the current conversation instead
+        (the capture, if any, is only uploaded when the screen changed).
+        """
+        if question is not None:
+            img = capture.to_image() if capture is not None else None
+            response = ask_follow_up(self.conversation, question, img, backend=self.session.backend, stream=stream)
+            self.last_response = response
+            self.last_image_hash = None
+            print(f"[DEBUG] Follow-up input: {response.input_path} ({len(self.conversation)} turns, "
+                  f"{self.conversation.compactions} compactions)")
+            return response.text
+        
+        if capture is None:
+            capture = self._capture()
+        img = capture.to_image()
+        response = analyze_image(img, backend=self.session.backend, stream=stream)
+        self.last_response = response
+        # Hashed once: the response cache lookup already did it unless the cache is off
+        image_hash = response.image_hash if response.image_hash is not None else perceptual_hash(img)
+        self.last_image_hash = image_hash
+        if Config.ARCHIVE_SCREENSHOTS:
+            # Encoding the PNG stays off the answer path; repeats of a screen are only indexed
+            threading.Thread(
+                target=archive_frame, args=(img,),
+                kwargs={"captured_at": capture.captured_at, "phash": image_hash, "source": "hotkey"},
+                daemon=True,
+            ).start()
+        # A different screen starts a new conversation; the same one continues it
+        if self.conversation.find_image(image_hash) is None:
+            self.conversation.reset()
+        self.conversation.record_analysis(image_hash, response.text)
+        print(f"[DEBUG] Analysis input: {response.input_path}")
+        if response.prompt_tokens is not None:
+            print(
+                f"[DEBUG] Prompt tokens: {response.billed_prompt_tokens} billed, "
+                f"{response.cached_prompt_tokens or 0} cached"
+            )
+        if response.backend == "cache":
+            print(f"\n⚡ Screen unchanged, reused cached analysis ({get_response_cache().stats()})")
+        return response.text
+    
+    def _run_crew(self):
+        """Capture and analyze the screen through the two-agent CrewAI workflow"""
+        print("[DEBUG] Before session.kickoff()")
+        with self.session.lock, span("crew") as crew_span:
+            crew_output = self.session.kickoff()
+        # Whatever the tools' capture and vision spans don't cover is agent planning
+        record("planning", crew_span.self_seconds)
+        print("[DEBUG] After session.kickoff()")
+        return self._extract_raw_output(crew_output)
     
     def _extract_raw_output(self, crew_output):
         """Extract raw text output from crew result"""
@@ -85,6 +270,10 @@ class LeetCodeCrewManager:
             return str(crew_output)
     
     def run_analysis_async(self):
-        """Run analysis in a separate thread to avoid blocking the hotkey listener"""
+        """Queue an analysis of the current screen without blocking the hotkey listener"""
         print("🔥 Hotkey triggered! Starting analysis...")
-        threading.Thread(target=self.run_analysis, daemon=True).start() 
\ No newline at end of file
+        try:
+            # The grab starts on the capture executor; the listener returns at once
+            self.queue.submit(self._new_job())
+        except Exception as e:
+            print(f"❌ Error queueing analysis: {e}") 
\ No newline at end of file
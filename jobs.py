@@ -0,0 +1,125 @@
+"""
+Hotkey job queue for the LeetCode AI Assistant
+
+Presses are handled by a single consumer thread. Only the newest pending job is
+kept, so a burst of presses collapses into one analysis of the latest screen,
+and a new press cancels the analysis that is still running so its stale answer
+never reaches the console or the log.
+"""
+import time
+import itertools
+import threading
+
+class AnalysisCancelled(Exception):
+    """Raised inside a running analysis once a newer job has superseded it"""
+
+class AnalysisJob:
+    """One hotkey press or follow-up: what to capture and ask, plus a cancellation flag"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, capture=None, question=None, pressed_at=None):
+        self.id = next(self._ids)
+        self.capture = capture  # None means the pipeline captures the screen itself
+        self.pending_capture = None  # Future of capture.grab_timed() started at the press
+        self.question = question  # Set for follow-ups to the current conversation
+        self.pressed_at = pressed_at  # time.time() of the press or request
+        self.created_at = time.perf_counter()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise AnalysisCancelled if the job has been superseded"""
+        if self._cancelled.is_set():
+            raise AnalysisCancelled(f"job {self.id} superseded by a newer screenshot")
+
+class AnalysisQueue:
+    """Single-consumer queue that keeps only the newest pending job"""
+
+    def __init__(self, handler, cancel_in_flight=True):
+        """
+        Args:
+            handler: Called with each AnalysisJob on the consumer thread
+            cancel_in_flight: Cancel the running job when a newer one is submitted
+        """
+        self.handler = handler
+        self.cancel_in_flight = cancel_in_flight
+        self.submitted = 0
+        self.coalesced = 0  # Pending jobs replaced before they started
+        self.cancelled = 0  # Running jobs cancelled by a newer submission
+        self._pending = None
+        self._current = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def busy(self) -> bool:
+        """True while a job is running or waiting to run"""
+        with self._condition:
+            return self._current is not None or self._pending is not None
+
+    def submit(self, job: AnalysisJob) -> AnalysisJob:
+        """Queue a job, replacing any job that hasn't started yet"""
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("AnalysisQueue has been stopped")
+            self.submitted += 1
+            if self._pending is not None:
+                self._pending.cancel()
+                self.coalesced += 1
+            self._pending = job
+            if self.cancel_in_flight and self._current is not None and not self._current.cancelled:
+                self._current.cancel()
+                self.cancelled += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._consume, name="analysis-queue", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return job
+
+    def _consume(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                job, self._pending = self._pending, None
+                self._current = job
+            try:
+                self.handler(job)
+            except Exception as e:
+                print(f"[AnalysisQueue] Job {job.id} failed: {e}")
+            finally:
+                with self._condition:
+                    self._current = None
+                    self._condition.notify_all()
+
+    def join(self, timeout=None) -> bool:
+        """Wait until no job is running or pending; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._current is not None or self._pending is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stop(self):
+        """Cancel everything and let the consumer thread exit"""
+        with self._condition:
+            self._stopped = True
+            if self._pending is not None:
+                self._pending.cancel()
+                self._pending = None
+            if self._current is not None:
+                self._current.cancel()
+            self._condition.notify_all()
@@ -0,0 +1,437 @@
+"""
+Pipeline latency instrumentation for the LeetCode AI Assistant
+
+Each stage of an analysis runs inside a timing span. The stages are capture,
+encode, ocr, cache lookup, agent planning, the vision call and its time to first
+token, log write and cleanup. Finished spans go to the sinks listed in
+Config.METRICS_SINKS:
+
+- "jsonl" appends one line per span to a trace file.
+- "prometheus" keeps per-stage histograms. These are dumped to a text file and
+  can optionally be served over HTTP.
+
+Run this module to get p50/p95/p99 per stage from a trace file:
+
+    python -m screengpt.metrics --trace pipeline_trace.jsonl
+"""
+import os
+import json
+import time
+import bisect
+import argparse
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .config import Config
+
+# Pipeline order, used to sort reports; any other stage name is listed after these
+STAGES = (
+    "capture", "encode", "ocr", "cache_lookup", "planning", "crew",
+    "tiles", "tile_extract", "vision", "first_token", "log_write", "cleanup", "job",
+)
+
+# Histogram bucket bounds in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+@dataclass
+class Span:
+    """Timing of one stage of one analysis"""
+
+    stage: str
+    trace_id: Optional[int] = None  # AnalysisJob id
+    parent: Optional[str] = None  # Stage of the enclosing span
+    attributes: dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+    seconds: float = 0.0
+    child_seconds: float = 0.0  # Time spent in nested spans
+    error: Optional[str] = None
+
+    @property
+    def self_seconds(self) -> float:
+        """Time spent in this stage outside its nested spans"""
+        return max(0.0, self.seconds - self.child_seconds)
+
+    def set(self, **attributes):
+        """Attach details learned while the stage runs (cache hit, input path, ...)"""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        record = {
+            "ts": round(self.timestamp, 3),
+            "trace": self.trace_id,
+            "stage": self.stage,
+            "seconds": round(self.seconds, 6),
+        }
+        if self.parent:
+            record["parent"] = self.parent
+        if self.error:
+            record["error"] = self.error
+        if self.attributes:
+            record["attributes"] = self.attributes
+        return record
+
+class _NullSpan:
+    """Stand-in yielded when metrics are disabled"""
+
+    seconds = 0.0
+    self_seconds = 0.0
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Trace:
+    """The spans one job recorded on its own thread"""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+
+    def summary(self) -> str:
+        """One-line stage breakdown, e.g. "encode 31 ms · vision 2.41 s" """
+        parts = []
+        for span in self.spans:
+            if span.stage == "job":
+                continue
+            seconds = span.seconds
+            parts.append(f"{span.stage} {seconds * 1000:.0f} ms" if seconds < 1 else f"{span.stage} {seconds:.2f} s")
+        return " · ".join(parts)
+
+class JsonlSink:
+    """Appends each finished span as one JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span):
+        line = json.dumps(span.to_dict(), separators=(",", ":"), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class PrometheusSink:
+    """Per-stage latency histograms in the Prometheus text exposition format"""
+
+    def __init__(self, path=None, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            path: File rewritten with the current histograms on every flush (None keeps them in memory)
+            buckets: Upper bounds of the histogram buckets, in seconds
+        """
+        self.path = path
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}  # stage -> [per-bucket counts (last is +Inf), sum, count, errors]
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span):
+        with self._lock:
+            histogram = self._histograms.get(span.stage)
+            if histogram is None:
+                histogram = self._histograms[span.stage] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0]
+            histogram[0][bisect.bisect_left(self.buckets, span.seconds)] += 1
+            histogram[1] += span.seconds
+            histogram[2] += 1
+            if span.error:
+                histogram[3] += 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP screengpt_stage_seconds Time spent in each analysis pipeline stage",
+            "# TYPE screengpt_stage_seconds histogram",
+        ]
+        errors = []
+        with self._lock:
+            for stage in sorted(self._histograms, key=_stage_order):
+                counts, total, count, failed = self._histograms[stage]
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'screengpt_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'screengpt_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'screengpt_stage_seconds_count{{stage="{stage}"}} {count}')
+                errors.append(f'screengpt_stage_errors_total{{stage="{stage}"}} {failed}')
+        lines += [
+            "# HELP screengpt_stage_errors_total Stage spans that ended with an exception",
+            "# TYPE screengpt_stage_errors_total counter",
+        ] + errors
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        if not self.path:
+            return
+        # Replace the file in one step so a scraper never reads half of it
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        self.flush()
+
+class Tracer:
+    """Times pipeline stages and hands the finished spans to the sinks"""
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def trace(self, trace_id):
+        """Attribute the spans opened on this thread to one job; yields the Trace collecting them"""
+        previous = getattr(self._local, "trace", None)
+        current = self._local.trace = Trace(trace_id)
+        try:
+            yield current
+        finally:
+            self._local.trace = previous
+            self.flush()
+
+    @contextmanager
+    def span(self, stage: str, **attributes):
+        """Time the enclosed block as one stage"""
+        if not self.sinks:
+            yield NULL_SPAN
+            return
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        current = getattr(self._local, "trace", None)
+        span = Span(
+            stage,
+            trace_id=current.trace_id if current is not None else None,
+            parent=parent.stage if parent is not None else None,
+            attributes=attributes,
+        )
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = e.__class__.__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started
+            stack.pop()
+            if parent is not None:
+                parent.child_seconds += span.seconds
+            self._emit(span)
+
+    def record(self, stage: str, seconds, **attributes):
+        """Record a duration measured elsewhere, e.g. a model's time to first token"""
+        if not self.sinks or seconds is None:
+            return
+        stack = self._stack()
+        current = getattr(self._local, "trace", None)
+        self._emit(Span(
+            stage,
+            trace_id=current.trace_id if current is not None else None,
+            parent=stack[-1].stage if stack else None,
+            attributes=attributes,
+            seconds=seconds,
+        ))
+
+    def _emit(self, span):
+        current = getattr(self._local, "trace", None)
+        if current is not None:
+            current.spans.append(span)
+        for sink in self.sinks:
+            try:
+                sink.emit(span)
+            except Exception as e:
+                print(f"[metrics] {sink.__class__.__name__} dropped a span: {e}")
+
+    def flush(self):
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                print(f"[metrics] {sink.__class__.__name__} could not flush: {e}")
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+def serve_metrics(sink: PrometheusSink, port: int, host="127.0.0.1"):
+    """Serve the histograms at http://host:port/metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = sink.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[metrics] Serving pipeline metrics at http://{host}:{server.server_port}/metrics")
+    return server
+
+def create_tracer(sinks=None) -> Tracer:
+    """Build a tracer with the sinks named in Config.METRICS_SINKS"""
+    sinks = Config.METRICS_SINKS if sinks is None else sinks
+    instances = []
+    for name in sinks:
+        if name == "jsonl":
+            instances.append(JsonlSink(Config.METRICS_TRACE_FILE))
+        elif name == "prometheus":
+            sink = PrometheusSink(Config.METRICS_PROMETHEUS_FILE)
+            if Config.METRICS_PORT:
+                serve_metrics(sink, Config.METRICS_PORT)
+            instances.append(sink)
+        else:
+            raise ValueError(f"Unknown metrics sink '{name}', expected one of {Config.METRICS_SINK_CHOICES}")
+    return Tracer(instances)
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer() -> Tracer:
+    """Return the shared tracer, creating it from Config on first use"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = create_tracer()
+        return _tracer
+
+def span(stage: str, **attributes):
+    """Time a stage with the shared tracer"""
+    return get_tracer().span(stage, **attributes)
+
+def trace(trace_id):
+    """Group this thread's spans under a job id with the shared tracer"""
+    return get_tracer().trace(trace_id)
+
+def record(stage: str, seconds, **attributes):
+    """Record an externally measured duration with the shared tracer"""
+    get_tracer().record(stage, seconds, **attributes)
+
+def _stage_order(stage):
+    return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage)
+
+def percentile(sorted_values, q) -> float:
+    """Linearly interpolated q-th percentile (0-100) of an ascending list"""
+    if not sorted_values:
+        return float("nan")
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def load_spans(path, since=None):
+    """Read spans back from a JSONL trace file, skipping malformed lines"""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if since is not None and record.get("ts", 0) < since:
+                continue
+            spans.append(Span(
+                record["stage"],
+                trace_id=record.get("trace"),
+                parent=record.get("parent"),
+                attributes=record.get("attributes") or {},
+                timestamp=record.get("ts", 0),
+                seconds=record["seconds"],
+                error=record.get("error"),
+            ))
+    return spans
+
+def summarize(spans) -> list:
+    """Per-stage latency statistics: (stage, count, errors, mean, p50, p95, p99, max), in pipeline order"""
+    by_stage = {}
+    for span in spans:
+        by_stage.setdefault(span.stage, []).append(span)
+    rows = []
+    for stage in sorted(by_stage, key=_stage_order):
+        values = sorted(span.seconds for span in by_stage[stage])
+        rows.append((
+            stage,
+            len(values),
+            sum(1 for span in by_stage[stage] if span.error),
+            sum(values) / len(values),
+            percentile(values, 50),
+            percentile(values, 95),
+            percentile(values, 99),
+            values[-1],
+        ))
+    return rows
+
+def format_summary(rows) -> str:
+    header = f"{'stage':<14}{'count':>7}{'errors':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    lines = [header, "-" * len(header)]
+    for stage, count, errors, *timings in rows:
+        lines.append(f"{stage:<14}{count:>7}{errors:>8}" + "".join(f"{value * 1000:>8.1f}ms" for value in timings))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize pipeline stage latencies from a trace file")
+    parser.add_argument("--trace", default=None, help=f"JSONL trace file (default: {Config.METRICS_TRACE_FILE})")
+    parser.add_argument("--stage", action="append", help="Only report these stages (repeatable)")
+    parser.add_argument("--since-hours", type=float, default=None, help="Only use spans from the last N hours")
+    parser.add_argument("--prometheus", action="store_true", help="Print the spans as Prometheus histograms instead")
+    args = parser.parse_args(argv)
+
+    path = args.trace or Config.METRICS_TRACE_FILE
+    if not os.path.exists(path):
+        parser.error(f"Trace file not found: {path}")
+    since = time.time() - args.since_hours * 3600 if args.since_hours is not None else None
+    spans = load_spans(path, since=since)
+    if args.stage:
+        spans = [span for span in spans if span.stage in args.stage]
+    if not spans:
+        print("No spans recorded")
+        return
+
+    if args.prometheus:
+        sink = PrometheusSink()
+        for span in spans:
+            sink.emit(span)
+        print(sink.render(), end="")
+        return
+
+    traces = len({span.trace_id for span in spans if span.trace_id is not None})
+    print(f"{len(spans)} spans from {traces} analyses in {path}\n")
+    print(format_summary(summarize(spans)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Local OCR pre-pass for the LeetCode AI Assistant
+
+LeetCode screens are mostly text. When Tesseract reads a capture confidently, the
+analysis can send the recognised text (plus a small thumbnail for layout) instead
+of a full-resolution screenshot, which is a far smaller and cheaper request.
+
+Needs the optional pytesseract package and the tesseract binary; without them
+every request simply takes the image path.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from .config import Config
+
+# Which input an analysis request was built from (VisionResponse.input_path)
+PATH_IMAGE = "image"
+PATH_OCR_THUMBNAIL = "ocr+thumbnail"
+PATH_OCR_TEXT = "ocr-text"
+PATH_CACHE = "cache"
+PATH_HISTORY = "history"  # Follow-up answered from the conversation, screenshot not re-sent
+PATH_TILES = "tiles"  # Tiles transcribed separately, then one text request (tiling.py)
+
+OCR_PROMPT_TEMPLATE = """The screen was transcribed locally with OCR instead of being sent as a full screenshot.
+Text blocks appear in reading order, separated by blank lines; code indentation may be approximate.
+{image_note}
+<screen_text>
+{text}
+</screen_text>"""
+
+THUMBNAIL_NOTE = "A small thumbnail of the screen is attached for layout only; rely on the text for details.\n"
+
+_unavailable_reason = None
+
+@dataclass
+class OcrBlock:
+    """One layout block (a paragraph, a code cell, a panel) found by Tesseract"""
+
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+    confidence: float
+
+@dataclass
+class OcrResult:
+    """Recognised text of a capture and how sure Tesseract was about it"""
+
+    blocks: List[OcrBlock] = field(default_factory=list)
+    confidence: float = 0.0  # Mean word confidence, 0-100
+    words: int = 0
+    seconds: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(block.text for block in self.blocks)
+
+    def is_confident(self, min_confidence=None, min_words=None) -> bool:
+        """True when the text alone is trustworthy enough to replace the full image"""
+        min_confidence = Config.OCR_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        min_words = Config.OCR_MIN_WORDS if min_words is None else min_words
+        return self.words >= min_words and self.confidence >= min_confidence
+
+def ocr_available() -> bool:
+    """Check (once) that pytesseract and the tesseract binary can be used"""
+    global _unavailable_reason
+    if _unavailable_reason is None:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            _unavailable_reason = ""
+        except Exception as e:
+            _unavailable_reason = str(e) or e.__class__.__name__
+            print(f"[ocr] OCR pre-pass disabled, Tesseract is unavailable: {_unavailable_reason}")
+    return not _unavailable_reason
+
+def run_ocr(img) -> OcrResult:
+    """
+    Recognise the text of an RGB image, grouped into Tesseract's layout blocks
+
+    Lines keep their leading indentation (estimated from the word's x offset), so
+    code in the editor stays readable.
+    """
+    import pytesseract
+    started = time.perf_counter()
+    data = pytesseract.image_to_data(
+        img.convert("L"),
+        lang=Config.OCR_LANGUAGE,
+        config="--psm 3",
+        output_type=pytesseract.Output.DICT,
+    )
+
+    blocks = {}  # block number -> {(paragraph, line): [(left, word, height)]}
+    boxes = {}
+    block_confidences = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if not word.strip() or confidence < 0:
+            continue
+        confidences.append(confidence)
+        block_id = data["block_num"][i]
+        block_confidences.setdefault(block_id, []).append(confidence)
+        line_key = (data["par_num"][i], data["line_num"][i])
+        blocks.setdefault(block_id, {}).setdefault(line_key, []).append((data["left"][i], word, data["height"][i]))
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        box = boxes.get(block_id)
+        boxes[block_id] = (left, top, right, bottom) if box is None else (
+            min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom))
+
+    result = OcrResult()
+    for block_id, lines in blocks.items():
+        block_left = boxes[block_id][0]
+        text_lines = []
+        for line_key in sorted(lines):
+            words = sorted(lines[line_key])
+            # Roughly one character is half the text height wide
+            char_width = max(1, words[0][2] // 2)
+            indent = " " * max(0, (words[0][0] - block_left) // char_width)
+            text_lines.append(indent + " ".join(word for _, word, _ in words))
+        left, top, right, bottom = boxes[block_id]
+        result.blocks.append(OcrBlock(
+            text="\n".join(text_lines),
+            left=left,
+            top=top,
+            width=right - left,
+            height=bottom - top,
+            confidence=sum(block_confidences[block_id]) / len(block_confidences[block_id]),
+        ))
+
+    # Tesseract numbers blocks in reading order, columns included
+    result.words = len(confidences)
+    result.confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    result.seconds = time.perf_counter() - started
+    return result
+
+def build_ocr_prompt(ocr_result: OcrResult, with_thumbnail: bool) -> str:
+    """Per-request message carrying the recognised screen text (the analysis prompt is sent separately)"""
+    return OCR_PROMPT_TEMPLATE.format(
+        image_note=THUMBNAIL_NOTE if with_thumbnail else "",
+        text=ocr_result.text,
+    )
@@ -1,8 +1,23 @@
+"""
+Stream one LeetCode analysis from a local Ollama model and report its speed
+
+Usage:
+    python ollama_test.py path/to/screenshot.png [--model gemma3:4b-it-qat] [--host http://localhost:11434]
+
+The host can also be benchmarks/fake_server.py, to try the script without a model.
+"""
+import argparse
 import ollama
-import glob, os
+import os
+import time
 
 
-image_path = "/Users/srinathmurali/Desktop/Screenshot 2025-06-01 at 11.25.34 PM.png"
+parser = argparse.ArgumentParser(description="Stream one LeetCode analysis from a local Ollama model")
+parser.add_argument("image_path", help="Screenshot to analyze")
+parser.add_argument("--model", default="gemma3:4b-it-qat", help="Ollama vision model")
+parser.add_argument("--host", default=os.environ.get("OLLAMA_HOST", "http://localhost:11434"), help="Ollama server")
+args = parser.parse_args()
+image_path = args.image_path
 
 
 if not os.path.exists(image_path):
@@ -72,11 +87,13 @@ LEETCODE_ANALYSIS_PROMPT = (
 )
 
 try:
-    client = ollama.Client()
+    client = ollama.Client(host=args.host)
     print("Sending request to Ollama...")
     
-    response = client.chat(
-        model="gemma3:4b-it-qat",  # or your chosen model
+    started = time.perf_counter()
+    first_token_at = None
+    stream = client.chat(
+        model=args.model,
         messages=[
             {
                 "role": "user",
@@ -84,15 +101,31 @@ try:
                 "images": [image_path],  # Fixed: images should be a list
             }
         ],
+        stream=True,
     )
 
-    print("Response received!")
+    # Print tokens as they arrive instead of waiting for the whole answer
     print("=" * 50)
-    print(response["message"]["content"])
+    final_chunk = None
+    for chunk in stream:
+        text = chunk["message"]["content"]
+        if text and first_token_at is None:
+            first_token_at = time.perf_counter()
+        print(text, end="", flush=True)
+        final_chunk = chunk
+    print()
+    print("=" * 50)
+
+    # The last chunk carries Ollama's own token counts and timings (nanoseconds)
+    if first_token_at is not None:
+        print(f"Time to first token: {first_token_at - started:.2f}s")
+    if final_chunk and final_chunk.get("eval_count") and final_chunk.get("eval_duration"):
+        tokens_per_second = final_chunk["eval_count"] / (final_chunk["eval_duration"] / 1e9)
+        print(f"Generation speed: {tokens_per_second:.1f} tokens/s ({final_chunk['eval_count']} tokens)")
     
 except Exception as e:
     print(f"Error occurred: {e}")
     print("Make sure:")
-    print("1. Ollama is running (ollama serve)")
-    print("2. The model 'gemma3:4b-it-qat' is available (ollama list)")
+    print(f"1. Ollama is running at {args.host} (ollama serve)")
+    print(f"2. The model '{args.model}' is available (ollama list)")
     print("3. The image path is correct and accessible")
@@ -1,81 +1,188 @@
 """
 LeetCode Analysis Prompts for AI Assistant
 This module loads prompts from external text files for easier editing and maintenance.
+
+A prompt in `<name>.txt` is used exactly as written. A prompt can opt in to
+templating by living in `<name>.tmpl` instead: its `${name}` placeholders are
+filled from per-call keyword arguments (`$$` is a literal `$`, unknown
+placeholders are left as written), and domain prompts get `${domain}`. Files are
+parsed once and re-read only when their modification time or size changes, so
+edits apply without a restart or a manual reload.
 """
 import os
+import re
+import hashlib
+import threading
+from dataclasses import dataclass
 from pathlib import Path
 
-class PromptLoader:
-    """Loads prompts from external text files"""
+# Same placeholder syntax as string.Template
+_PLACEHOLDER = re.compile(r"\$(?:(\$)|\{([_a-zA-Z][_a-zA-Z0-9]*)\}|([_a-zA-Z][_a-zA-Z0-9]*))")
+
+# Domain -> prompt file
+DOMAIN_PROMPTS = {
+    "leetcode": "leetcode_analysis",
+    "general": "general_coding",
+    "debug": "debug_analysis",
+}
+
+def content_hash(prompt_name: str, prompt_text: str) -> str:
+    """Identify a rendered prompt by name and content ("name:sha1-prefix"), e.g. for cache keys"""
+    digest = hashlib.sha1(prompt_text.encode("utf-8")).hexdigest()[:12]
+    return f"{prompt_name}:{digest}"
+
+@dataclass(frozen=True)
+class RenderedPrompt:
+    """Final prompt text plus a stable hash of it"""
+    
+    name: str
+    text: str
+    version: str
+
+class PromptTemplate:
+    """A prompt file parsed once into literal segments and placeholder names"""
+    
+    def __init__(self, name: str, source: str, substitute=True):
+        """
+        Args:
+            substitute: Parse placeholders; otherwise the source is one literal segment
+        """
+        self.name = name
+        self.source = source
+        self._parts = []  # literal strings and (placeholder name, original text) pairs
+        position = 0
+        for match in _PLACEHOLDER.finditer(source) if substitute else ():
+            self._parts.append(source[position:match.start()])
+            if match.group(1):
+                self._parts.append("$")
+            else:
+                self._parts.append((match.group(2) or match.group(3), match.group(0)))
+            position = match.end()
+        self._parts.append(source[position:])
+        self.placeholders = frozenset(part[0] for part in self._parts if isinstance(part, tuple))
+        self._rendered = {}  # frozen parameters -> RenderedPrompt
+    
+    def render(self, parameters: dict) -> RenderedPrompt:
+        """Fill in the placeholders; each distinct set of values is rendered only once"""
+        used = tuple(sorted((key, str(value)) for key, value in parameters.items() if key in self.placeholders))
+        rendered = self._rendered.get(used)
+        if rendered is None:
+            values = dict(used)
+            text = "".join(
+                part if isinstance(part, str) else values.get(part[0], part[1])
+                for part in self._parts
+            )
+            rendered = RenderedPrompt(self.name, text, content_hash(self.name, text))
+            self._rendered[used] = rendered
+        return rendered
+
+class PromptRegistry:
+    """Loads prompt templates from text files and keeps them until the file changes"""
     
-    def __init__(self):
+    def __init__(self, prompts_dir=None):
         # Get the directory where this file is located
-        self.prompts_dir = Path(__file__).parent / "prompts"
+        self.prompts_dir = Path(prompts_dir) if prompts_dir else Path(__file__).parent / "prompts"
         self._ensure_prompts_directory()
-        self._cache = {}
+        self._templates = {}  # prompt name -> ((mtime_ns, size), PromptTemplate)
+        self._lock = threading.Lock()
     
     def _ensure_prompts_directory(self):
         """Create prompts directory if it doesn't exist"""
         self.prompts_dir.mkdir(exist_ok=True)
     
+    def get_template(self, prompt_name: str) -> PromptTemplate:
+        """
+        Return the parsed template for a prompt file
+        
+        Only the file's metadata is checked on each call; it is re-read and
+        re-parsed when its mtime or size differs from the cached copy. A
+        `<name>.tmpl` file takes precedence over `<name>.txt` and is the only
+        kind whose placeholders are substituted.
+        """
+        for prompt_file in (self.prompts_dir / f"{prompt_name}.tmpl", self.prompts_dir / f"{prompt_name}.txt"):
+            try:
+                stat = os.stat(prompt_file)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+        signature = (str(prompt_file), stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            cached = self._templates.get(prompt_name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            try:
+                with open(prompt_file, 'r', encoding='utf-8') as f:
+                    source = f.read().strip()
+            except Exception as e:
+                raise RuntimeError(f"Error reading prompt file {prompt_file}: {e}")
+            template = PromptTemplate(prompt_name, source, substitute=prompt_file.suffix == ".tmpl")
+            self._templates[prompt_name] = (signature, template)
+            return template
+    
+    def render(self, prompt_name: str, **parameters) -> RenderedPrompt:
+        """Render a prompt, filling a template's placeholders from the keyword arguments"""
+        return self.get_template(prompt_name).render(parameters)
+    
+    def render_domain(self, domain: str, **parameters) -> RenderedPrompt:
+        """Render the prompt for a domain ("leetcode", "general" or "debug"); templates get ${domain}"""
+        if domain not in DOMAIN_PROMPTS:
+            raise ValueError(f"Unknown prompt domain '{domain}', expected one of {list(DOMAIN_PROMPTS)}")
+        return self.render(DOMAIN_PROMPTS[domain], domain=domain, **parameters)
+    
     def load_prompt(self, prompt_name: str) -> str:
         """
         Load a prompt from a text file
         
         Args:
             prompt_name: Name of the prompt file (without .txt extension)
-            
+        
         Returns:
-            The prompt text as a string
+            The prompt text as a string, rendered with the default parameters
         """
-        # Check cache first
-        if prompt_name in self._cache:
-            return self._cache[prompt_name]
-        
-        prompt_file = self.prompts_dir / f"{prompt_name}.txt"
-        
-        if not prompt_file.exists():
-            raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
-        
-        try:
-            with open(prompt_file, 'r', encoding='utf-8') as f:
-                prompt_text = f.read().strip()
-            
-            # Cache the prompt
-            self._cache[prompt_name] = prompt_text
-            return prompt_text
-            
-        except Exception as e:
-            raise RuntimeError(f"Error reading prompt file {prompt_file}: {e}")
+        return self.render(prompt_name).text
     
     def get_available_prompts(self) -> list:
         """Get list of available prompt files"""
         if not self.prompts_dir.exists():
             return []
         
-        return [f.stem for f in self.prompts_dir.glob("*.txt")]
+        return sorted({f.stem for pattern in ("*.tmpl", "*.txt") for f in self.prompts_dir.glob(pattern)})
     
     def reload_prompt(self, prompt_name: str) -> str:
-        """Force reload a prompt from file (clears cache)"""
-        if prompt_name in self._cache:
-            del self._cache[prompt_name]
+        """Force reload a prompt from file (only needed if an edit kept the same mtime and size)"""
+        with self._lock:
+            self._templates.pop(prompt_name, None)
         return self.load_prompt(prompt_name)
 
-# Global prompt loader instance
-_prompt_loader = PromptLoader()
+# Kept for existing imports
+PromptLoader = PromptRegistry
+
+# Global prompt registry instance
+_prompt_loader = PromptRegistry()
+
+def render_prompt(prompt_name: str, **parameters) -> RenderedPrompt:
+    """Render a prompt from the shared registry"""
+    return _prompt_loader.render(prompt_name, **parameters)
+
+def render_domain_prompt(domain: str, **parameters) -> RenderedPrompt:
+    """Render a domain prompt ("leetcode", "general" or "debug") from the shared registry"""
+    return _prompt_loader.render_domain(domain, **parameters)
 
 # Convenience functions for backward compatibility
 def get_leetcode_analysis_prompt() -> str:
     """Get the LeetCode analysis prompt"""
-    return _prompt_loader.load_prompt("leetcode_analysis")
+    return render_domain_prompt("leetcode").text
 
 def get_general_coding_prompt() -> str:
     """Get the general coding prompt"""
-    return _prompt_loader.load_prompt("general_coding")
+    return render_domain_prompt("general").text
 
 def get_debug_analysis_prompt() -> str:
     """Get the debug analysis prompt"""
-    return _prompt_loader.load_prompt("debug_analysis")
+    return render_domain_prompt("debug").text
 
 # For backward compatibility - these will be loaded dynamically
 @property
@@ -91,4 +198,4 @@ def DEBUG_ANALYSIS_PROMPT():
     return get_debug_analysis_prompt()
 
 # Make the prompt loader available for advanced usage
-prompt_loader = _prompt_loader 
\ No newline at end of file
+prompt_loader = _prompt_loader
@@ -2,18 +2,252 @@ import mss
 import time
 import datetime
 import os
+import threading
+from collections import deque
+import numpy as np
+
+try:
+    from PIL import Image
+    from .archive import ScreenshotArchive
+except ImportError:  # Run as a plain script; `python -m screengpt.screenshots` enables the archive
+    ScreenshotArchive = None
 
 # --- Configuration ---
 SCREENSHOT_INTERVAL = 5  # Seconds between screenshots
 OUTPUT_DIRECTORY = "periodic_screenshots"  # Folder to save screenshots
 FILENAME_PREFIX = "screenshot_"
 
+# --- Change detection ---
+SKIP_UNCHANGED = True     # Don't save frames that look the same as the last saved one
+CROP_TO_CHANGES = False   # Save only the bounding box of what changed
+DIFF_DOWNSAMPLE = 4       # Compare every Nth pixel in each direction
+PIXEL_THRESHOLD = 24      # Grayscale difference (0-255) for a pixel to count as changed
+CHANGE_THRESHOLD = 0.001  # Fraction of sampled pixels that must change to save a frame
+CROP_PADDING = 16         # Pixels of context kept around the changed region
+
+# --- Encoding ---
+# Frames are PNG-encoded and written by worker threads (zlib releases the GIL),
+# so the capture loop keeps its cadence however long a large frame takes to save
+ENCODER_WORKERS = 2
+ENCODER_QUEUE_SIZE = 4    # Frames waiting to be encoded before backpressure applies
+# When the queue is full: "drop_oldest" discards the oldest waiting frame;
+# "degrade" first switches to faster compression, then to half resolution, and
+# only drops frames if that still doesn't keep up
+BACKPRESSURE = "drop_oldest"
+PNG_COMPRESSION = 6       # zlib level for normal frames
+STATS_EVERY = 12          # Log cadence and encoder stats every N ticks
+
+# --- Archive ---
+# Store frames by content hash in OUTPUT_DIRECTORY (see archive.py) instead of as
+# timestamp-named files; repeats of a screen are indexed, not written again, and
+# old frames are pruned to the Config.ARCHIVE_MAX_* limits
+USE_ARCHIVE = True
+
+class FrameDiffer:
+    """
+    Compares each grab with the last saved frame on a downsampled grayscale copy
+    """
+
+    def __init__(self, downsample=DIFF_DOWNSAMPLE, pixel_threshold=PIXEL_THRESHOLD,
+                 change_threshold=CHANGE_THRESHOLD):
+        self.downsample = downsample
+        self.pixel_threshold = pixel_threshold
+        self.change_threshold = change_threshold
+        self.reference = None
+
+    def _small_gray(self, frame):
+        """Strided view of the BGRA frame reduced to int32 grayscale"""
+        # int32: 255 * 150 doesn't fit the int16 the weighted sum would otherwise wrap in
+        small = frame[::self.downsample, ::self.downsample, :3].astype(np.int32)
+        # Integer approximation of ITU-R 601 luma for BGR channel order
+        return (small[..., 0] * 29 + small[..., 1] * 150 + small[..., 2] * 77) >> 8
+
+    def compare(self, frame):
+        """
+        Return (changed fraction, bounding box) of a BGRA frame against the reference
+
+        The bounding box is (left, top, right, bottom) in full-resolution pixels,
+        or None when nothing changed. The first frame counts as fully changed.
+        """
+        gray = self._small_gray(frame)
+        if self.reference is None or self.reference.shape != gray.shape:
+            height, width = frame.shape[:2]
+            return 1.0, (0, 0, width, height)
+
+        changed = np.abs(gray - self.reference) > self.pixel_threshold
+        fraction = float(changed.mean())
+        if not changed.any():
+            return fraction, None
+
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        height, width = frame.shape[:2]
+        box = (
+            max(0, int(cols[0]) * self.downsample - CROP_PADDING),
+            max(0, int(rows[0]) * self.downsample - CROP_PADDING),
+            min(width, (int(cols[-1]) + 1) * self.downsample + CROP_PADDING),
+            min(height, (int(rows[-1]) + 1) * self.downsample + CROP_PADDING),
+        )
+        return fraction, box
+
+    def accept(self, frame):
+        """Make a frame the new reference (call after saving it)"""
+        self.reference = self._small_gray(frame)
+
+def frame_array(sct_img):
+    """Zero-copy (height, width, 4) BGRA NumPy view of an mss grab"""
+    return np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+
+def save_frame(frame, box, output_path, level=PNG_COMPRESSION, step=1):
+    """Write the (optionally cropped) BGRA frame as PNG, keeping every `step`-th pixel"""
+    left, top, right, bottom = box
+    rgb = np.ascontiguousarray(frame[top:bottom:step, left:right:step, 2::-1])
+    mss.tools.to_png(rgb.tobytes(), (rgb.shape[1], rgb.shape[0]), level=level, output=output_path)
+
+def archive_frame(archive, frame, box, captured_at, level=PNG_COMPRESSION, step=1):
+    """Add the (optionally cropped) BGRA frame to the archive and return its index entry"""
+    left, top, right, bottom = box
+    rgb = np.ascontiguousarray(frame[top:bottom:step, left:right:step, 2::-1])
+    return archive.add(Image.fromarray(rgb), captured_at=captured_at, source="periodic", compress_level=level)
+
+# Degradation levels for the "degrade" policy: (zlib level, pixel step)
+QUALITY_LEVELS = [(PNG_COMPRESSION, 1), (1, 1), (1, 2)]
+
+class EncoderPool:
+    """
+    Bounded queue of frames waiting to be encoded, drained by worker threads
+
+    When the queue is full, BACKPRESSURE decides what gives: the oldest waiting
+    frame, or the quality of the frames that follow. With an archive, frames are
+    added to it instead of written to their output paths.
+    """
+
+    def __init__(self, workers=ENCODER_WORKERS, max_queue=ENCODER_QUEUE_SIZE, policy=BACKPRESSURE, archive=None):
+        if policy not in ("drop_oldest", "degrade"):
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected 'drop_oldest' or 'degrade'")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.archive = archive
+        self.quality = 0  # Index into QUALITY_LEVELS
+        self.saved = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.encode_seconds = 0.0
+        self._queue = deque()
+        self._busy = 0
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"png-encoder-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def depth(self):
+        """Frames waiting or being encoded"""
+        with self._condition:
+            return len(self._queue) + self._busy
+
+    def submit(self, frame, box, output_path, note="", captured_at=None):
+        """Queue a frame grabbed at captured_at (time.time()); never blocks the capture loop"""
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                if self.policy == "degrade" and self.quality < len(QUALITY_LEVELS) - 1:
+                    self.quality += 1
+                    print(f"Encoders falling behind, degrading quality to level {self.quality} "
+                          f"(zlib {QUALITY_LEVELS[self.quality][0]}, 1/{QUALITY_LEVELS[self.quality][1]} resolution)")
+                else:
+                    _, _, dropped_path, _, _, _ = self._queue.popleft()
+                    self.dropped += 1
+                    print(f"Encoders falling behind, dropped queued frame {os.path.basename(dropped_path)}")
+            elif self.quality and not self._queue and not self._busy:
+                # Caught up again: step quality back up
+                self.quality -= 1
+            level, step = QUALITY_LEVELS[self.quality]
+            self._queue.append((frame, box, output_path, (level, step), note, captured_at or time.time()))
+            self.max_depth = max(self.max_depth, len(self._queue) + self._busy)
+            self._condition.notify()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                frame, box, output_path, (level, step), note, captured_at = self._queue.popleft()
+                self._busy += 1
+            started = time.perf_counter()
+            try:
+                if self.archive is not None:
+                    entry = archive_frame(self.archive, frame, box, captured_at, level=level, step=step)
+                    saved_as = f"{entry.kind} {entry.sha256[:12]}"
+                else:
+                    save_frame(frame, box, output_path, level=level, step=step)
+                    saved_as = output_path
+                elapsed = time.perf_counter() - started
+                with self._condition:
+                    self.saved += 1
+                    self.encode_seconds += elapsed
+                print(f"Screenshot saved: {saved_as}{note} in {elapsed * 1000:.0f} ms")
+            except Exception as e:
+                with self._condition:
+                    self.failed += 1
+                print(f"Error saving {output_path}: {e}")
+            finally:
+                with self._condition:
+                    self._busy -= 1
+                    self._condition.notify_all()
+
+    def close(self):
+        """Finish the queued frames and stop the workers"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+class CadenceStats:
+    """Achieved capture interval and jitter against the ideal schedule"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.missed = 0  # Ticks skipped because a grab overran a whole interval
+        self._jitter = []
+        self._intervals = []
+        self._last_grab = None
+
+    def record(self, scheduled_at, grabbed_at):
+        self._jitter.append(grabbed_at - scheduled_at)
+        if self._last_grab is not None:
+            self._intervals.append(grabbed_at - self._last_grab)
+        self._last_grab = grabbed_at
+
+    def report(self, encoders):
+        """Print and reset the window's cadence and encoder figures"""
+        if not self._jitter:
+            return
+        jitter_ms = [value * 1000 for value in self._jitter]
+        achieved = sum(self._intervals) / len(self._intervals) if self._intervals else self.interval
+        average_encode = encoders.encode_seconds / encoders.saved if encoders.saved else 0.0
+        print(
+            f"[cadence] interval {achieved:.3f}s (target {self.interval}s), jitter mean {sum(jitter_ms) / len(jitter_ms):.1f} ms "
+            f"max {max(jitter_ms):.1f} ms, {self.missed} missed ticks | encoder queue {encoders.depth}/{encoders.max_queue} "
+            f"(peak {encoders.max_depth}), {encoders.saved} saved, {encoders.dropped} dropped, "
+            f"encode {average_encode * 1000:.0f} ms avg, quality level {encoders.quality}"
+        )
+        self._jitter.clear()
+        self._intervals.clear()
+
 def take_periodic_screenshots():
     """
     Takes a screenshot at a regular interval and saves it.
     """
     print(f"--- Periodic Screenshot Script Started ---")
-    print(f"Taking a screenshot every {SCREENSHOT_INTERVAL} seconds.")
+    print(f"Taking a screenshot every {SCREENSHOT_INTERVAL} seconds "
+          f"({ENCODER_WORKERS} encoder threads, backpressure: {BACKPRESSURE}).")
     print(f"Screenshots will be saved in the '{OUTPUT_DIRECTORY}' directory.")
     print("Press Ctrl+C to stop the script.")
 
@@ -42,29 +276,77 @@ def take_periodic_screenshots():
                 print("Error: No monitors found by mss.")
                 return
 
-            while True:
-                try:
-                    # Get current timestamp for a unique filename
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3] # YearMonthDay_HourMinuteSecond_Milliseconds
-                    filename = f"{FILENAME_PREFIX}{timestamp}.png"
-                    full_path = os.path.join(OUTPUT_DIRECTORY, filename)
-
-                    # Capture the screen
-                    sct_img = sct.grab(monitor_to_capture)
-
-                    # Save the_image
-                    mss.tools.to_png(sct_img.rgb, sct_img.size, output=full_path)
-                    print(f"Screenshot saved: {full_path}")
-
-                except mss.exception.ScreenShotError as e_mss:
-                    print(f"MSS Error during capture: {e_mss}")
-                    print("This might happen if the screen is locked or display changes.")
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-
-                # Wait for the next interval
-                print(f"Waiting for {SCREENSHOT_INTERVAL} seconds...")
-                time.sleep(SCREENSHOT_INTERVAL)
+            archive = None
+            if USE_ARCHIVE and ScreenshotArchive is not None:
+                archive = ScreenshotArchive(root=OUTPUT_DIRECTORY)
+                archive.start_retention()
+                print(f"Archiving frames by content hash: {archive.stats()['frames']} frames already indexed.")
+            differ = FrameDiffer()
+            encoders = EncoderPool(archive=archive)
+            cadence = CadenceStats(SCREENSHOT_INTERVAL)
+            skipped = ticks = 0
+            # Ticks are scheduled on the monotonic clock from the start time, so
+            # time spent grabbing never pushes the following captures back
+            next_tick = time.monotonic()
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now < next_tick:
+                        time.sleep(next_tick - now)
+                        continue
+                    scheduled_at = next_tick
+                    # A grab that overran whole intervals skips those ticks instead of bunching up
+                    missed = int((now - next_tick) // SCREENSHOT_INTERVAL)
+                    if missed:
+                        cadence.missed += missed
+                        scheduled_at = next_tick + missed * SCREENSHOT_INTERVAL
+                    next_tick = scheduled_at + SCREENSHOT_INTERVAL
+                    ticks += 1
+
+                    try:
+                        # Get current timestamp for a unique filename
+                        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3] # YearMonthDay_HourMinuteSecond_Milliseconds
+                        filename = f"{FILENAME_PREFIX}{timestamp}.png"
+                        full_path = os.path.join(OUTPUT_DIRECTORY, filename)
+
+                        # Capture the screen
+                        grabbed_at = time.monotonic()
+                        captured_at = time.time()
+                        sct_img = sct.grab(monitor_to_capture)
+                        cadence.record(scheduled_at, grabbed_at)
+                        frame = frame_array(sct_img)
+                        full_box = (0, 0, sct_img.width, sct_img.height)
+
+                        # Skip frames that look like the last saved one
+                        if SKIP_UNCHANGED:
+                            fraction, box = differ.compare(frame)
+                            if fraction < CHANGE_THRESHOLD:
+                                skipped += 1
+                                print(f"Screen unchanged ({fraction:.4%} of pixels differ), skipped. "
+                                      f"[{encoders.saved} saved, {skipped} skipped]")
+                            else:
+                                save_box = box if CROP_TO_CHANGES else full_box
+                                # The frame owns its grab buffer, so the encoder can use it as is
+                                encoders.submit(frame, save_box, full_path, f" ({fraction:.2%} changed, region {save_box})",
+                                                captured_at=captured_at)
+                                differ.accept(frame)
+                        else:
+                            encoders.submit(frame, full_box, full_path, captured_at=captured_at)
+
+                    except mss.exception.ScreenShotError as e_mss:
+                        print(f"MSS Error during capture: {e_mss}")
+                        print("This might happen if the screen is locked or display changes.")
+                    except Exception as e:
+                        print(f"An unexpected error occurred: {e}")
+
+                    if ticks % STATS_EVERY == 0:
+                        cadence.report(encoders)
+            finally:
+                print("Finishing queued screenshots...")
+                encoders.close()
+                cadence.report(encoders)
+                if archive is not None:
+                    archive.close()
 
     except KeyboardInterrupt:
         print("\n--- Script Interrupted by User ---")
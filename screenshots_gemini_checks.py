@@ -1,9 +1,20 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import os
+import json
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PIL import Image
 import time
 from dotenv import load_dotenv
 
+try:
+    from .archive import ScreenshotArchive, INDEX_FILE
+except ImportError:  # Run as a plain script; `python -m screengpt.screenshots_gemini_checks` reads archives
+    ScreenshotArchive, INDEX_FILE = None, "index.jsonl"
+
 load_dotenv()
 
 # --- Configuration ---
@@ -24,26 +35,138 @@ PROMPT_FOR_GEMINI = (
 # Supported image extensions (Pillow can open many, but these are common for screenshots)
 SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
 
-def process_screenshots_with_gemini():
+# --- Batch mode ---
+BATCH_MODE = True            # Analyze several screenshots at once instead of one by one
+MAX_WORKERS = 4              # Concurrent requests in flight
+REQUESTS_PER_MINUTE = 15     # Token-bucket rate limit (free tier gemini-2.0-flash allows 15 RPM)
+MAX_RETRIES = 5              # Retries per image on 429 / 5xx errors
+RETRY_BASE_DELAY = 2         # Seconds; doubled on every retry, plus jitter
+RESULTS_FILE = "screenshot_analyses.jsonl"  # One JSON line per image, written as results arrive
+MANIFEST_FILE = "screenshot_manifest.jsonl" # Which images are done, so reruns only send new/changed ones
+MANIFEST_COMPACT_RATIO = 3   # Rewrite the manifest on load once it has this many lines per live entry
+PROMPT_VERSION = hashlib.sha1(PROMPT_FOR_GEMINI.encode("utf-8")).hexdigest()[:12]
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate_per_minute` acquisitions per minute, with bursts up to `capacity`"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, min(MAX_WORKERS, rate_per_minute))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Manifest:
     """
-    Iterates through screenshots in a folder, sends them to Gemini for analysis,
-    and prints the responses.
+    Append-only record of processed screenshots
+
+    Each line holds an image's path, size/mtime, content hash, model, prompt
+    version and the byte offset of its result in RESULTS_FILE. Later lines win,
+    so a crash can at worst lose the entry being written. Superseded lines are
+    dropped on load once they outnumber the live entries MANIFEST_COMPACT_RATIO
+    to one.
     """
-    print("--- Gemini Screenshot Analyzer ---")
-    print(f"Attempting to process images from folder: '{SCREENSHOT_FOLDER}'")
-    print(f"Using Gemini model: {GEMINI_MODEL_NAME}")
 
+    def __init__(self, path=None):
+        self.path = path or MANIFEST_FILE
+        self.entries = {}
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    self.entries[entry["path"]] = entry
+        if lines > MANIFEST_COMPACT_RATIO * max(1, len(self.entries)):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the manifest with only the latest entry per image"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        # Readers see either the old manifest or the complete new one
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def content_hash(image_path):
+        digest = hashlib.sha256()
+        with open(image_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def fingerprint(self, image_path):
+        """(size, mtime_ns, content hash); the hash is reused when size and mtime are unchanged"""
+        stat = os.stat(image_path)
+        entry = self.entries.get(image_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return stat.st_size, stat.st_mtime_ns, entry["sha256"]
+        return stat.st_size, stat.st_mtime_ns, self.content_hash(image_path)
+
+    def is_done(self, image_path, fingerprint):
+        """True if this exact content was already analyzed with the current model and prompt"""
+        entry = self.entries.get(image_path)
+        return (
+            entry is not None
+            and entry["sha256"] == fingerprint[2]
+            and entry["model"] == GEMINI_MODEL_NAME
+            and entry["prompt_version"] == PROMPT_VERSION
+        )
+
+    def record(self, image_path, fingerprint, result_offset):
+        size, mtime_ns, sha256 = fingerprint
+        entry = {
+            "path": image_path,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "model": GEMINI_MODEL_NAME,
+            "prompt_version": PROMPT_VERSION,
+            "result_offset": result_offset,
+        }
+        self.entries[image_path] = entry
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+def is_retryable(error):
+    """True for rate-limit (429) and server-side (5xx) errors"""
+    # TooManyRequests covers ResourceExhausted; ServerError covers every 5xx
+    if isinstance(error, (google_exceptions.TooManyRequests, google_exceptions.ServerError)):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+def configure_model():
+    """Configure the SDK from the environment and return the Gemini model, or None on error"""
     # 1. Configure API Key
     try:
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             print("\nError: The GOOGLE_API_KEY environment variable is not set.")
             print("Please set it before running the script. You can get a key from https://aistudio.google.com/app/apikey")
-            return
+            return None
         genai.configure(api_key=api_key)
     except Exception as e:
         print(f"Error configuring the Google Generative AI SDK: {e}")
-        return
+        return None
 
     # 2. Initialize the Gemini Model
     # You can customize generation_config for things like temperature, top_p, etc.
@@ -53,11 +176,27 @@ def process_screenshots_with_gemini():
         generation_config={"temperature": 0.3} # Lower temperature for more factual/less creative descriptions
     )
 
+    return model
+
+def list_image_files():
+    """Return the sorted screenshot filenames in SCREENSHOT_FOLDER (empty list on error)"""
     # 3. Check if the screenshot folder exists
     if not os.path.isdir(SCREENSHOT_FOLDER):
         print(f"\nError: The screenshot folder '{SCREENSHOT_FOLDER}' was not found in the current directory.")
         print("Please make sure it exists and contains your screenshot images.")
-        return
+        return []
+
+    # An archive written by screenshots.py lists its frames in time order without walking directories
+    if os.path.exists(os.path.join(SCREENSHOT_FOLDER, INDEX_FILE)):
+        if ScreenshotArchive is None:
+            print(f"\nError: '{SCREENSHOT_FOLDER}' is a screenshot archive; run `python -m screengpt.screenshots_gemini_checks`.")
+            return []
+        archive = ScreenshotArchive(root=SCREENSHOT_FOLDER)
+        image_files = [os.path.relpath(path, SCREENSHOT_FOLDER) for path in archive.object_paths()]
+        archive.close()
+        if not image_files:
+            print(f"\nThe screenshot archive in '{SCREENSHOT_FOLDER}' is empty.")
+        return image_files
 
     # 4. Get list of image files, sorted by name (often chronological if timestamped)
     try:
@@ -67,11 +206,28 @@ def process_screenshots_with_gemini():
         ])
     except FileNotFoundError: # Should be caught by os.path.isdir, but as a safeguard
         print(f"\nError: Screenshot folder '{SCREENSHOT_FOLDER}' not found when listing files.")
-        return
+        return []
 
 
     if not image_files:
         print(f"\nNo supported image files ({', '.join(SUPPORTED_EXTENSIONS)}) found in '{SCREENSHOT_FOLDER}'.")
+        return []
+    return image_files
+
+def process_screenshots_with_gemini():
+    """
+    Iterates through screenshots in a folder, sends them to Gemini for analysis,
+    and prints the responses.
+    """
+    print("--- Gemini Screenshot Analyzer ---")
+    print(f"Attempting to process images from folder: '{SCREENSHOT_FOLDER}'")
+    print(f"Using Gemini model: {GEMINI_MODEL_NAME}")
+
+    model = configure_model()
+    if model is None:
+        return
+    image_files = list_image_files()
+    if not image_files:
         return
 
     print(f"\nFound {len(image_files)} image(s) to process.\n")
@@ -125,5 +281,115 @@ def process_screenshots_with_gemini():
 
     print("--- All screenshots have been processed. ---")
 
+def analyze_with_retries(model, image_path, bucket, stop_event):
+    """
+    Send one screenshot to Gemini, retrying 429/5xx errors with exponential backoff
+
+    Returns:
+        (result dict, number of retries used)
+    """
+    retries = 0
+    while True:
+        if stop_event.is_set():
+            return {"status": "skipped", "error": "Batch stopped"}, retries
+        bucket.acquire()
+        started = time.monotonic()
+        try:
+            with Image.open(image_path) as img:
+                response = model.generate_content([PROMPT_FOR_GEMINI, img])
+            if response.parts:
+                return {"status": "ok", "text": response.text,
+                        "latency": round(time.monotonic() - started, 3)}, retries
+            feedback = getattr(response, "prompt_feedback", None)
+            return {"status": "empty", "error": f"Empty or blocked response: {feedback}"}, retries
+        except Exception as e:
+            if "API key not valid" in str(e):
+                stop_event.set()  # Every other request would fail the same way
+                return {"status": "error", "error": str(e)}, retries
+            if not is_retryable(e) or retries >= MAX_RETRIES:
+                return {"status": "error", "error": str(e)}, retries
+            delay = RETRY_BASE_DELAY * (2 ** retries) * random.uniform(0.8, 1.2)
+            retries += 1
+            print(f"Retrying {os.path.basename(image_path)} in {delay:.1f}s ({retries}/{MAX_RETRIES}): {e}")
+            time.sleep(delay)
+
+def process_screenshots_concurrently():
+    """
+    Analyzes every screenshot in the folder with a bounded pool of workers, rate
+    limited to REQUESTS_PER_MINUTE, appending one JSON line per image to
+    RESULTS_FILE as soon as it completes.
+    """
+    print("--- Gemini Screenshot Analyzer (batch mode) ---")
+    print(f"Attempting to process images from folder: '{SCREENSHOT_FOLDER}'")
+    print(f"Using Gemini model: {GEMINI_MODEL_NAME}, {MAX_WORKERS} workers, {REQUESTS_PER_MINUTE} requests/min")
+
+    model = configure_model()
+    if model is None:
+        return
+    image_files = list_image_files()
+    if not image_files:
+        return
+
+    # Skip images whose current content was already analyzed with this model and prompt
+    manifest = Manifest()
+    pending = []
+    for filename in image_files:
+        image_path = os.path.join(SCREENSHOT_FOLDER, filename)
+        fingerprint = manifest.fingerprint(image_path)
+        if not manifest.is_done(image_path, fingerprint):
+            pending.append((filename, image_path, fingerprint))
+    already_done = len(image_files) - len(pending)
+    if not pending:
+        print(f"\nAll {len(image_files)} image(s) were already processed (see '{MANIFEST_FILE}').")
+        return
+
+    print(f"\nFound {len(image_files)} image(s); {already_done} already processed, {len(pending)} to go. "
+          f"Results go to '{RESULTS_FILE}'.\n")
+
+    bucket = TokenBucket(REQUESTS_PER_MINUTE)
+    stop_event = threading.Event()
+    counts = {"ok": 0, "empty": 0, "error": 0, "skipped": 0}
+    total_retries = 0
+    started = time.monotonic()
+
+    # Binary append mode so tell() gives the byte offset recorded in the manifest
+    with open(RESULTS_FILE, "ab") as results, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(analyze_with_retries, model, image_path, bucket, stop_event): (filename, image_path, fingerprint)
+            for filename, image_path, fingerprint in pending
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            filename, image_path, fingerprint = futures[future]
+            result, retries = future.result()
+            total_retries += retries
+            counts[result["status"]] += 1
+
+            # Results are written from this thread only, so no lock is needed
+            record = {"file": filename, "sha256": fingerprint[2], "model": GEMINI_MODEL_NAME,
+                      "prompt_version": PROMPT_VERSION, "retries": retries, **result}
+            offset = results.tell()
+            results.write((json.dumps(record) + "\n").encode("utf-8"))
+            results.flush()
+            # Failed/skipped images stay out of the manifest so the next run retries them
+            if result["status"] in ("ok", "empty"):
+                manifest.record(image_path, fingerprint, offset)
+
+            elapsed = time.monotonic() - started
+            print(f"[{done}/{len(pending)}] {filename}: {result['status']} "
+                  f"({done / elapsed:.2f} images/s)")
+
+    elapsed = time.monotonic() - started
+    print("\n--- Batch complete ---")
+    print(f"Processed {len(pending)} image(s) in {elapsed:.1f}s ({len(pending) / elapsed:.2f} images/s), "
+          f"{already_done} skipped as already done")
+    print(f"OK: {counts['ok']}, empty/blocked: {counts['empty']}, failed: {counts['error']}, "
+          f"skipped: {counts['skipped']}, retries: {total_retries}")
+    if stop_event.is_set():
+        print("Stopped early: please ensure your GOOGLE_API_KEY is correct and valid.")
+
 if __name__ == "__main__":
-    process_screenshots_with_gemini()
\ No newline at end of file
+    if BATCH_MODE:
+        process_screenshots_concurrently()
+    else:
+        process_screenshots_with_gemini()
\ No newline at end of file
@@ -0,0 +1,382 @@
+"""
+Local HTTP/WebSocket server for the LeetCode AI Assistant
+
+Lets the Electron frontend drive analyses instead of the hotkey. Requests from
+any number of clients run on one pool of Config.SERVER_WORKERS threads that
+share a single vision backend (and with it the provider connection, context
+cache and response cache). Each analysis can be cancelled on its own.
+
+    POST   /analyze        Analyze the screen ({"capture": true}, the default) or an
+                           uploaded image ({"image": "<base64>"} or a raw image body).
+                           With "Accept: text/event-stream" the answer streams as
+                           server-sent events, otherwise it comes back as one JSON object
+    DELETE /analyze/{id}   Cancel an analysis
+    GET    /ws             WebSocket: send {"type": "analyze", ...} (or a binary image
+                           message) and {"type": "cancel", "id": ...}; receive
+                           started/chunk/done/error/cancelled messages tagged with the id
+    GET    /health         Backend, pool and request counters
+
+Events carry JSON: "started" {id}, "chunk" {text}, "done" {text, model, ...},
+"error" {error} and "cancelled" {}. Closing a stream or WebSocket cancels the
+analyses it was waiting for.
+
+    python -m screengpt.server --port 5000
+"""
+import io
+import json
+import time
+import base64
+import asyncio
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from aiohttp import web, WSMsgType
+
+from .config import Config
+from .jobs import AnalysisJob, AnalysisCancelled
+from .capture import capture_screen
+from .analysis import analyze_image, get_vision_backend
+from .solution_store import get_solution_store, extract_problem_title
+from .streaming import CallbackStream
+from .metrics import span, trace
+
+TERMINAL_EVENTS = ("done", "error", "cancelled")
+
+class ServerBusy(Exception):
+    """Raised when Config.SERVER_MAX_PENDING analyses are already waiting for a worker"""
+
+class EventChannel:
+    """Carries one analysis's events from its worker thread to the connection's event loop"""
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def emit(self, event, data=None):
+        """Thread-safe: queue an event for the connection"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, data or {}))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._queue is None:
+            raise StopAsyncIteration
+        event, data = await self._queue.get()
+        if event in TERMINAL_EVENTS:
+            self._queue = None  # Yield the terminal event, then stop
+        return event, data
+
+class AnalysisService:
+    """Runs analyses for all clients on a bounded worker pool sharing one vision backend"""
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or Config.SERVER_WORKERS
+        self.max_pending = Config.SERVER_MAX_PENDING if max_pending is None else max_pending
+        self.backend = get_vision_backend()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        self.jobs = {}  # id -> AnalysisJob still queued or running
+        self.counts = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self.running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Analyses waiting for a worker"""
+        with self._lock:
+            return len(self.jobs) - self.running
+
+    def submit(self, channel, image_data=None) -> AnalysisJob:
+        """
+        Queue an analysis of an uploaded image (encoded bytes) or, without one, of the screen
+
+        Raises:
+            ServerBusy: When too many analyses are already waiting
+        """
+        with self._lock:
+            if len(self.jobs) - self.running >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise ServerBusy(f"{self.max_pending} analyses already waiting")
+            job = AnalysisJob(pressed_at=time.time() if Config.CAPTURE_DAEMON_BEFORE_PRESS else None)
+            self.jobs[job.id] = job
+            self.counts["submitted"] += 1
+        channel.emit("started", {"id": job.id})
+        self.executor.submit(self._run, job, channel, image_data)
+        return job
+
+    def cancel(self, job_id) -> bool:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def _run(self, job, channel, image_data):
+        """Analyze one job on a worker thread, emitting its events to the channel"""
+        with self._lock:
+            self.running += 1
+        outcome = "failed"
+        try:
+            with trace(job.id), span("job", pipeline="server", upload=image_data is not None,
+                                     queued_seconds=round(time.perf_counter() - job.created_at, 6)):
+                job.check()
+                if image_data is not None:
+                    with span("capture", source="upload") as capture_span:
+                        img = Image.open(io.BytesIO(image_data)).convert("RGB")
+                        capture_span.set(width=img.width, height=img.height)
+                else:
+                    # Same capture as the hotkey pipeline: target, margins and auto-crop apply
+                    img = capture_screen(job.pressed_at).to_image()
+                job.check()
+                stream = CallbackStream(lambda text: channel.emit("chunk", {"text": text}), cancel_check=job.check)
+                response = analyze_image(img, backend=self.backend, stream=stream)
+                stream.finish()
+                job.check()
+                solution_id = None
+                if Config.SOLUTION_STORE and response.backend != "cache":
+                    with span("log_write", sink="solution_store"):
+                        solution_id = self._store(response, job)
+            outcome = "completed"
+            channel.emit("done", {
+                "text": response.text,
+                "backend": response.backend,
+                "model": response.model,
+                "input_path": response.input_path,
+                "first_token_seconds": response.time_to_first_token,
+                "seconds": time.perf_counter() - job.created_at,
+                "prompt_tokens": response.prompt_tokens,
+                "output_tokens": response.output_tokens,
+                "solution_id": solution_id,
+            })
+        except AnalysisCancelled:
+            outcome = "cancelled"
+            channel.emit("cancelled")
+        except Exception as e:
+            print(f"[server] Analysis {job.id} failed: {e}")
+            traceback.print_exc()
+            channel.emit("error", {"error": str(e)})
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.jobs.pop(job.id, None)
+                self.counts[outcome] += 1
+
+    def _store(self, response, job):
+        """Index an answer in the solution store and append it to the markdown export"""
+        store = get_solution_store()
+        solution_id = store.add(
+            response.text,
+            title=extract_problem_title(response.text),
+            model=response.model,
+            backend=response.backend,
+            input_path=response.input_path,
+            latency_seconds=time.perf_counter() - job.created_at,
+            first_token_seconds=response.time_to_first_token,
+            prompt_tokens=response.prompt_tokens,
+            output_tokens=response.output_tokens,
+        )
+        store.append_markdown(solution_id)
+        return solution_id
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts, running=self.running, pending=len(self.jobs) - self.running,
+                        workers=self.workers, backend=self.backend.name, model=self.backend.model,
+                        usage=dict(self.backend.usage))
+
+    def close(self):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel()
+        self.executor.shutdown(wait=True)
+
+def _decode_image(value):
+    """Base64 (optionally a data: URL) to bytes"""
+    if not isinstance(value, str):
+        raise ValueError("image must be a base64 string")
+    if value.startswith("data:"):
+        value = value.split(",", 1)[1]
+    return base64.b64decode(value)
+
+def _check_image(data):
+    """Reject an upload PIL can't identify; only the header is read, decoding happens on a worker"""
+    try:
+        Image.open(io.BytesIO(data))
+    except Exception as e:
+        raise ValueError(f"unreadable image ({e})")
+    return data
+
+async def _read_request(request):
+    """The uploaded image bytes of a POST /analyze, or None to capture the screen"""
+    if request.content_type.startswith("image/"):
+        return _check_image(await request.read())
+    if not request.can_read_body:
+        return None
+    body = await request.json()
+    if not isinstance(body, dict):
+        raise ValueError("expected a JSON object")
+    if body.get("image"):
+        return _check_image(_decode_image(body["image"]))
+    if body.get("capture", True):
+        return None
+    raise ValueError("send an image or {\"capture\": true}")
+
+def _sse(event, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+async def handle_analyze(request):
+    service = request.app["service"]
+    try:
+        image_data = await _read_request(request)
+    except (ValueError, TypeError) as e:
+        return web.json_response({"error": f"Invalid request: {e}"}, status=400)
+    channel = EventChannel(asyncio.get_running_loop())
+    try:
+        job = service.submit(channel, image_data)
+    except ServerBusy as e:
+        return web.json_response({"error": str(e)}, status=503, headers={"Retry-After": "1"})
+
+    finished = False
+    try:
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            response = web.StreamResponse(headers={
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+                "X-Analysis-Id": str(job.id),
+            })
+            await response.prepare(request)
+            try:
+                async for event, data in channel:
+                    await response.write(_sse(event, data))
+                    finished = event in TERMINAL_EVENTS
+            except ConnectionResetError:
+                pass  # Client disconnected; the analysis is cancelled below
+            return response
+
+        async for event, data in channel:
+            finished = event in TERMINAL_EVENTS
+            if finished:
+                status = {"done": 200, "cancelled": 409, "error": 500}[event]
+                return web.json_response(dict(data, id=job.id, status=event), status=status)
+    finally:
+        if not finished:
+            # The client went away; stop paying for its answer
+            service.cancel(job.id)
+
+async def handle_cancel(request):
+    try:
+        job_id = int(request.match_info["job_id"])
+    except ValueError:
+        return web.json_response({"error": "Analysis ids are integers"}, status=400)
+    if not request.app["service"].cancel(job_id):
+        return web.json_response({"error": f"No running analysis {job_id}"}, status=404)
+    return web.json_response({"id": job_id, "status": "cancelling"})
+
+async def handle_websocket(request):
+    service = request.app["service"]
+    ws = web.WebSocketResponse(heartbeat=30, max_msg_size=Config.SERVER_MAX_UPLOAD_MB * 2**20)
+    await ws.prepare(request)
+    loop = asyncio.get_running_loop()
+    jobs = {}  # id -> (job, forwarding task) for this connection
+
+    async def forward(job, channel):
+        try:
+            async for event, data in channel:
+                if not ws.closed:
+                    await ws.send_json(dict(data, type=event, id=job.id))
+        finally:
+            jobs.pop(job.id, None)
+
+    def start(image_data, supersede):
+        if supersede:
+            for job, _ in jobs.values():
+                job.cancel()
+        channel = EventChannel(loop)
+        try:
+            job = service.submit(channel, image_data)
+        except ServerBusy as e:
+            return ws.send_json({"type": "error", "id": None, "error": str(e), "busy": True})
+        jobs[job.id] = (job, asyncio.ensure_future(forward(job, channel)))
+        return None
+
+    try:
+        async for message in ws:
+            reply = None
+            if message.type == WSMsgType.BINARY:
+                try:
+                    reply = start(_check_image(message.data), Config.CANCEL_STALE_ANALYSES)
+                except ValueError as e:
+                    reply = ws.send_json({"type": "error", "id": None, "error": f"Invalid message: {e}"})
+            elif message.type == WSMsgType.TEXT:
+                try:
+                    body = json.loads(message.data)
+                    if body.get("type") == "cancel":
+                        if body.get("id") in jobs:
+                            jobs[body["id"]][0].cancel()
+                        else:
+                            reply = ws.send_json({"type": "error", "id": body.get("id"), "error": "No such analysis"})
+                    elif body.get("type") == "analyze":
+                        image_data = _check_image(_decode_image(body["image"])) if body.get("image") else None
+                        reply = start(image_data, body.get("supersede", Config.CANCEL_STALE_ANALYSES))
+                    else:
+                        reply = ws.send_json({"type": "error", "id": None, "error": f"Unknown message type {body.get('type')!r}"})
+                except (ValueError, TypeError, AttributeError) as e:
+                    reply = ws.send_json({"type": "error", "id": None, "error": f"Invalid message: {e}"})
+            if reply is not None:
+                await reply
+    finally:
+        # Closing the socket cancels whatever it was still waiting for
+        for job, task in list(jobs.values()):
+            job.cancel()
+        await asyncio.gather(*(task for _, task in list(jobs.values())), return_exceptions=True)
+    return ws
+
+async def handle_health(request):
+    return web.json_response(dict(request.app["service"].stats(), status="ok"))
+
+def create_app(service=None) -> web.Application:
+    """Build the aiohttp application around an AnalysisService (created from Config if not given)"""
+    Config.initialize()
+    app = web.Application(client_max_size=Config.SERVER_MAX_UPLOAD_MB * 2**20)
+    app["service"] = service or AnalysisService()
+    app.router.add_post("/analyze", handle_analyze)
+    app.router.add_delete("/analyze/{job_id}", handle_cancel)
+    app.router.add_get("/ws", handle_websocket)
+    app.router.add_get("/health", handle_health)
+
+    async def close_service(app):
+        await asyncio.get_running_loop().run_in_executor(None, app["service"].close)
+
+    app.on_cleanup.append(close_service)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the analysis pipeline over HTTP and WebSocket")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS, help="Concurrent analyses")
+    parser.add_argument("--max-pending", type=int, default=Config.SERVER_MAX_PENDING,
+                        help="Queued analyses before requests are turned away")
+    parser.add_argument("--backend", choices=["gemini", "ollama", "fake"], default=None,
+                        help=f"Vision backend (default: {Config.VISION_BACKEND})")
+    args = parser.parse_args()
+
+    if args.backend:
+        Config.VISION_BACKEND = args.backend
+    Config.initialize()
+    service = AnalysisService(workers=args.workers, max_pending=args.max_pending)
+    if Config.WARM_UP_ON_START:
+        try:
+            service.backend.warm_up()
+        except Exception as e:
+            print(f"[server] Warm-up request failed: {e}")
+    print(f"🚀 Serving {service.backend.name} ({service.backend.model}) on http://{args.host}:{args.port} "
+          f"with {service.workers} workers")
+    web.run_app(create_app(service), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
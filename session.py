@@ -0,0 +1,82 @@
+"""
+Long-lived analysis session for the LeetCode AI Assistant
+"""
+import threading
+from .analysis import get_vision_backend
+from .config import Config
+
+class AnalysisSession:
+    """Builds the agents, tasks, crew and vision backend once and reuses them across analyses"""
+    
+    def __init__(self, pipeline_mode="direct"):
+        self.pipeline_mode = pipeline_mode
+        self.lock = threading.Lock()
+        self.backend = None
+        self.crew = None
+        self.is_warm = False  # The backend's connection has been warmed up
+    
+    def _build_crew(self):
+        """Create the CrewAI agents, tasks, and crew"""
+        # CrewAI takes seconds to import, so the direct pipeline never loads it
+        from crewai import Crew, Process
+        from .agents import create_screen_scanner_agent, create_image_analysis_agent
+        from .tasks import create_capture_task, create_analyze_task
+        
+        self.screen_scanner_agent = create_screen_scanner_agent()
+        self.image_analysis_agent = create_image_analysis_agent()
+        
+        self.capture_task = create_capture_task(self.screen_scanner_agent)
+        self.analyze_task = create_analyze_task(self.image_analysis_agent, self.capture_task)
+        
+        self.crew = Crew(
+            agents=[self.screen_scanner_agent, self.image_analysis_agent],
+            tasks=[self.capture_task, self.analyze_task],
+            process=Process.sequential,
+            verbose=Config.VERBOSE,
+            # Tool results must never be replayed: the same (empty) capture input
+            # has to produce a fresh screenshot on every run of the reused crew
+            cache=False
+        )
+    
+    def warm_up(self, connect=True):
+        """
+        Build everything the first analysis needs ahead of the first hotkey press
+        
+        Args:
+            connect: Also let the backend open its connection (and, for Ollama,
+                     load the model into memory) before the first analysis runs
+        """
+        with self.lock:
+            if self.backend is None:
+                self.backend = get_vision_backend()
+            if self.pipeline_mode == "crew" and self.crew is None:
+                self._build_crew()
+            if connect and not self.is_warm:
+                try:
+                    self.backend.warm_up()
+                    self.is_warm = True
+                except Exception as e:
+                    # A failed warm-up only costs the first analysis some latency;
+                    # the next warm_up() call tries again
+                    print(f"[AnalysisSession] Warm-up request failed: {e}")
+    
+    def reset(self):
+        """Clear state left over from the previous run so it cannot leak into the next one"""
+        if self.crew is None:
+            return
+        for task in self.crew.tasks:
+            task.output = None
+        for agent in self.crew.agents:
+            if hasattr(agent, "tools_results"):
+                agent.tools_results = []
+            # CrewAI refuses a tool call that repeats the previous one, which is
+            # exactly what every run of the capture agent looks like
+            if getattr(agent, "tools_handler", None) is not None:
+                agent.tools_handler.last_used_tool = None
+    
+    def kickoff(self):
+        """Run the reused crew once"""
+        if self.crew is None:
+            self._build_crew()
+        self.reset()
+        return self.crew.kickoff()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Indexed solution log for the LeetCode AI Assistant
+
+Analyses are stored in SQLite with an FTS5 full-text index, so "have I solved
+this before?" and searches over past answers are index lookups rather than a
+scan of one ever-growing markdown file. The markdown log is rendered from the
+store as an export.
+
+Usage:
+    python -m screengpt.solution_store search "sliding window"
+    python -m screengpt.solution_store solved "Two Sum"
+    python -m screengpt.solution_store export leetcode_solutions.md
+"""
+import re
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import Config
+from .cache import max_hash_distance
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    title TEXT,
+    title_key TEXT,
+    model TEXT,
+    backend TEXT,
+    input_path TEXT,
+    latency_seconds REAL,
+    first_token_seconds REAL,
+    prompt_tokens INTEGER,
+    output_tokens INTEGER,
+    screenshot_hash TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS solutions_title_key ON solutions(title_key);
+CREATE INDEX IF NOT EXISTS solutions_created_at ON solutions(created_at);
+CREATE TABLE IF NOT EXISTS solution_hash_bands (
+    band INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    solution_id INTEGER NOT NULL REFERENCES solutions(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS solution_hash_bands_lookup ON solution_hash_bands(band, value);
+CREATE VIRTUAL TABLE IF NOT EXISTS solutions_fts USING fts5(
+    title, text, content='solutions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS solutions_ai AFTER INSERT ON solutions BEGIN
+    INSERT INTO solutions_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS solutions_ad AFTER DELETE ON solutions BEGIN
+    INSERT INTO solutions_fts(solutions_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+"""
+
+# "**Problem**: Two Sum", "LeetCode #1: Two Sum", "## 42. Trapping Rain Water"
+_LABELLED_TITLE = re.compile(r"^\W*(?:Problem(?: Title| Name)?|Title)\W*:\s*\**\s*([^\n*]{3,80})", re.MULTILINE | re.IGNORECASE)
+_LEETCODE_TITLE = re.compile(r"LeetCode\s*(?:#|No\.?\s*)?(\d{1,4})\s*[:.\-\u2013\u2014]\s*([A-Z][\w'()\-, ]{2,80}?)\s*(?:\*\*)?$", re.MULTILINE | re.IGNORECASE)
+# Only tried on the leading line, since answers also number their steps ("1. Use a hash map")
+_NUMBERED_TITLE = re.compile(r"^\W*(\d{1,4})\.\s+([A-Z][\w'()\-, ]{2,80}?)\s*(?:\*\*)?$")
+_HEADING = re.compile(r"^#{1,3}\s+([^\n]{3,80})$", re.MULTILINE)
+
+# Section headings of an answer, which say nothing about which problem it solves
+_GENERIC_HEADINGS = frozenset({
+    "analysis", "answer", "approach", "algorithm", "code", "complete solution", "complexity",
+    "complexity analysis", "constraints", "edge cases", "example", "examples", "explanation",
+    "implementation", "intuition", "key insight", "key insights", "notes", "optimal solution",
+    "overview", "problem", "problem analysis", "problem statement", "solution", "space complexity",
+    "summary", "test cases", "time complexity", "walkthrough",
+})
+
+# Screenshot hashes are split into this many bands. Two hashes at most
+# HASH_BANDS - 1 bits apart must agree on at least one whole band, so
+# near-duplicate screens are found through an index instead of a scan.
+# 32 bands of 128 bits cover the default 16-bit threshold of a 4096-bit hash.
+HASH_BANDS = 32
+# Stored as the database's user_version; a database indexed differently is re-indexed on open
+BAND_SCHEME = 2
+
+def hash_bands(screenshot_hash: int, bits=None):
+    """
+    Split a perceptual hash into (band number, hex value) pairs
+
+    Bands whose bits are all zeros or all ones are left out: they come from
+    blank stretches of screen (a nav bar, empty margins) that unrelated screens
+    share, and matching on them would turn the lookup back into a scan.
+    """
+    bits = bits or Config.CACHE_HASH_SIZE ** 2
+    width = -(-bits // HASH_BANDS)
+    mask = (1 << width) - 1
+    bands = []
+    for band in range(HASH_BANDS):
+        value = (screenshot_hash >> (band * width)) & mask
+        if value not in (0, mask):
+            bands.append((band, f"{value:x}"))
+    return bands
+
+def _specific(title: str) -> Optional[str]:
+    """The title, or None for a generic section heading like "Approach" """
+    title = title.strip(" *#:")
+    return None if title_key(title) in _GENERIC_HEADINGS else title
+
+def extract_problem_title(text: str) -> Optional[str]:
+    """Best guess at the problem's title from an analysis"""
+    for match in _LABELLED_TITLE.finditer(text):
+        title = _specific(match.group(1))
+        if title:
+            return title
+    match = _LEETCODE_TITLE.search(text)
+    if match:
+        return f"{match.group(1)}. {match.group(2).strip()}"
+    for match in _HEADING.finditer(text):
+        title = _specific(match.group(1))
+        if title:
+            return title
+    leading = next((line for line in text.splitlines() if line.strip()), "")
+    match = _NUMBERED_TITLE.match(leading.strip())
+    if match and _specific(match.group(2)):
+        return f"{match.group(1)}. {match.group(2).strip()}"
+    return None
+
+def title_key(title: Optional[str]) -> Optional[str]:
+    """Normalised title for exact lookups ("Two  Sum!" -> "two sum")"""
+    if not title:
+        return None
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", title.lower()).split()) or None
+
+@dataclass
+class Solution:
+    """One stored analysis"""
+
+    id: int
+    created_at: float
+    title: Optional[str]
+    model: Optional[str]
+    backend: Optional[str]
+    input_path: Optional[str]
+    latency_seconds: Optional[float]
+    first_token_seconds: Optional[float]
+    prompt_tokens: Optional[int]
+    output_tokens: Optional[int]
+    screenshot_hash: Optional[str]
+    text: str
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.datetime.fromtimestamp(self.created_at).strftime("%Y-%m-%d %H:%M:%S")
+
+    def preview(self, lines=5) -> str:
+        """Title plus the first lines of the answer"""
+        body = "\n".join(line for line in self.text.strip().splitlines()[:lines])
+        return f"{self.title or 'Untitled analysis'} ({self.timestamp})\n{body}"
+
+    def to_markdown(self) -> str:
+        """Same layout as the streamed log entries"""
+        details = [f"Model: {self.model or 'unknown'}"]
+        if self.first_token_seconds is not None:
+            details.append(f"first token after {self.first_token_seconds:.2f}s")
+        if self.latency_seconds is not None:
+            details.append(f"{self.latency_seconds:.2f}s total")
+        heading = self.title or "LeetCode Analysis"
+        return f"\n## {heading} - {self.timestamp}\n\n{self.text.strip()}\n\n*{' · '.join(details)}*\n\n---\n"
+
+_COLUMNS = ("id, created_at, title, model, backend, input_path, latency_seconds, first_token_seconds, "
+            "prompt_tokens, output_tokens, screenshot_hash, text")
+
+class SolutionStore:
+    """SQLite store of analyses with full-text search"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.SOLUTION_DB
+        self._lock = threading.Lock()
+        # Written from the analysis queue thread, read from wherever a lookup happens
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys=ON")
+        if self.path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != BAND_SCHEME:
+            self._reindex_bands()
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _reindex_bands(self):
+        """Rebuild the screenshot hash index after HASH_BANDS or the band rules changed"""
+        self._db.execute("DELETE FROM solution_hash_bands")
+        rows = self._db.execute("SELECT id, screenshot_hash FROM solutions WHERE screenshot_hash IS NOT NULL").fetchall()
+        self._db.executemany(
+            "INSERT INTO solution_hash_bands (band, value, solution_id) VALUES (?, ?, ?)",
+            [(band, value, row["id"]) for row in rows for band, value in hash_bands(int(row["screenshot_hash"], 16))],
+        )
+        self._db.execute(f"PRAGMA user_version = {BAND_SCHEME}")
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [Solution(**{key: row[key] for key in row.keys() if key in Solution.__dataclass_fields__}) for row in rows]
+
+    def add(self, text, title=None, model=None, backend=None, input_path=None, latency_seconds=None,
+            first_token_seconds=None, prompt_tokens=None, output_tokens=None, screenshot_hash=None,
+            created_at=None) -> int:
+        """
+        Store an analysis and return its id
+
+        Args:
+            text: The analysis
+            title: Problem title (extracted from the text when not given)
+            screenshot_hash: Perceptual hash of the analyzed screen (int)
+        """
+        title = title or extract_problem_title(text)
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO solutions (created_at, title, title_key, model, backend, input_path, latency_seconds, "
+                "first_token_seconds, prompt_tokens, output_tokens, screenshot_hash, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    created_at if created_at is not None else time.time(),
+                    title, title_key(title), model, backend, input_path, latency_seconds,
+                    first_token_seconds, prompt_tokens, output_tokens,
+                    f"{screenshot_hash:x}" if screenshot_hash is not None else None,
+                    text,
+                ),
+            )
+            if screenshot_hash is not None:
+                self._db.executemany(
+                    "INSERT INTO solution_hash_bands (band, value, solution_id) VALUES (?, ?, ?)",
+                    [(band, value, cursor.lastrowid) for band, value in hash_bands(screenshot_hash)],
+                )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def get(self, solution_id) -> Optional[Solution]:
+        rows = self._rows(f"SELECT {_COLUMNS} FROM solutions WHERE id = ?", (solution_id,))
+        return rows[0] if rows else None
+
+    def recent(self, limit=10):
+        """Newest analyses first"""
+        return self._rows(f"SELECT {_COLUMNS} FROM solutions ORDER BY created_at DESC LIMIT ?", (limit,))
+
+    def search(self, query, limit=10):
+        """Full-text search over titles and answers, best matches first"""
+        # Quote each term so user input can't be parsed as FTS5 syntax
+        terms = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        if not terms:
+            return []
+        return self._rows(
+            f"SELECT {', '.join('s.' + column.strip() for column in _COLUMNS.split(','))} "
+            "FROM solutions_fts JOIN solutions s ON s.id = solutions_fts.rowid "
+            "WHERE solutions_fts MATCH ? ORDER BY bm25(solutions_fts, 10.0, 1.0) LIMIT ?",
+            (terms, limit),
+        )
+
+    def find_solved(self, title=None, screenshot_hash=None, max_distance=None):
+        """
+        Return the newest stored analysis of the same problem, or None
+
+        Matches the normalised title exactly (indexed), or a screenshot within
+        max_distance bits of screenshot_hash.
+        """
+        key = title_key(title)
+        if key:
+            rows = self._rows(
+                f"SELECT {_COLUMNS} FROM solutions WHERE title_key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+            )
+            if rows:
+                return rows[0]
+        if screenshot_hash is None:
+            return None
+        max_distance = max_hash_distance() if max_distance is None else max_distance
+        with self._lock:
+            if max_distance < HASH_BANDS:
+                bands = hash_bands(screenshot_hash)
+                if not bands:
+                    # A blank screen: nothing to tell it apart from other blank screens
+                    return None
+                candidates = self._db.execute(
+                    "SELECT DISTINCT s.id, s.screenshot_hash FROM solution_hash_bands b "
+                    "JOIN solutions s ON s.id = b.solution_id WHERE "
+                    + " OR ".join("(b.band = ? AND b.value = ?)" for _ in bands)
+                    + " ORDER BY s.created_at DESC",
+                    [item for band in bands for item in band],
+                ).fetchall()
+            else:
+                candidates = self._db.execute(
+                    "SELECT id, screenshot_hash FROM solutions WHERE screenshot_hash IS NOT NULL "
+                    "ORDER BY created_at DESC"
+                ).fetchall()
+        for row in candidates:
+            if bin(int(row["screenshot_hash"], 16) ^ screenshot_hash).count("1") <= max_distance:
+                return self.get(row["id"])
+        return None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def export_markdown(self, path=None) -> int:
+        """Render every stored analysis, oldest first, into a markdown file; returns the entry count"""
+        path = path or Config.LOG_FILE
+        solutions = self._rows(f"SELECT {_COLUMNS} FROM solutions ORDER BY created_at")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# LeetCode Solutions\n")
+            for solution in solutions:
+                f.write(solution.to_markdown())
+        return len(solutions)
+
+    def append_markdown(self, solution_id, path=None):
+        """Add one stored analysis to the markdown export without re-rendering the rest"""
+        solution = self.get(solution_id)
+        if solution is not None:
+            with open(path or Config.LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(solution.to_markdown())
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_solution_store():
+    """Return the shared solution store, opening the database on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SolutionStore()
+        return _store
+
+def main():
+    parser = argparse.ArgumentParser(description="Search and export stored LeetCode analyses")
+    parser.add_argument("--db", help=f"Database file (default: {Config.SOLUTION_DB})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("search", help="Full-text search")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=10)
+    solved = commands.add_parser("solved", help="Look a problem up by title")
+    solved.add_argument("title")
+    recent = commands.add_parser("recent", help="Newest analyses")
+    recent.add_argument("--limit", type=int, default=10)
+    export = commands.add_parser("export", help="Render the markdown log")
+    export.add_argument("path", nargs="?", default=None)
+    args = parser.parse_args()
+
+    store = SolutionStore(args.db)
+    if args.command == "search":
+        results = store.search(args.query, args.limit)
+    elif args.command == "recent":
+        results = store.recent(args.limit)
+    elif args.command == "solved":
+        solution = store.find_solved(title=args.title)
+        results = [solution] if solution else []
+        if not results:
+            print(f"No stored analysis of '{args.title}'")
+    else:
+        count = store.export_markdown(args.path)
+        print(f"Exported {count} analyses to {args.path or Config.LOG_FILE}")
+        return
+    for solution in results:
+        print(f"[{solution.id}] {solution.preview()}\n")
+
+if __name__ == "__main__":
+    main()
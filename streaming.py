@@ -0,0 +1,142 @@
+"""
+Incremental output of streamed model responses for the LeetCode AI Assistant
+"""
+import sys
+import time
+import datetime
+from .config import Config
+
+class StreamStats:
+    """Timing of one streamed response"""
+    
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.characters = 0
+        self.output_tokens = None  # Reported by the provider when available
+        self.prompt_tokens = None
+        self.cached_prompt_tokens = None
+    
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+    
+    @property
+    def tokens(self):
+        """Provider-reported output tokens, or a ~4 characters/token estimate"""
+        if self.output_tokens is not None:
+            return self.output_tokens
+        return self.characters / 4
+    
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        generation_time = self.finished_at - self.first_token_at
+        if generation_time <= 0:
+            return None
+        return self.tokens / generation_time
+    
+    def summary(self) -> str:
+        ttft = self.time_to_first_token
+        tps = self.tokens_per_second
+        ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+        tps_text = f"{tps:.1f} tokens/s" if tps is not None else "n/a tokens/s"
+        summary = f"first token after {ttft_text} · {tps_text}"
+        if self.prompt_tokens is not None:
+            summary += f" · {self.prompt_tokens} prompt tokens ({self.cached_prompt_tokens or 0} cached)"
+        return summary
+
+class TokenStream:
+    """Writes streamed text to the console and the markdown log as it arrives"""
+    
+    def __init__(self, log_file=None, title="LeetCode Analysis", model=None, echo=True, cancel_check=None):
+        self.log_file = log_file or Config.LOG_FILE
+        self.title = title
+        self.model = model or Config.vision_model_name()
+        self.echo = echo
+        # Called before every chunk; raising from it aborts the provider stream
+        self.cancel_check = cancel_check
+        self.stats = StreamStats()
+        self._log = None
+    
+    def __enter__(self):
+        self._log = open(self.log_file, "a", encoding="utf-8")
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._log.write(f"\n## {self.title} - {timestamp}\n\n")
+        self._log.flush()
+        return self
+    
+    def write(self, text: str):
+        """Emit one chunk of the response"""
+        if self.cancel_check is not None:
+            self.cancel_check()
+        if not text:
+            return
+        if self.stats.first_token_at is None:
+            self.stats.first_token_at = time.perf_counter()
+        self.stats.chunks += 1
+        self.stats.characters += len(text)
+        if self.echo:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        if self._log is not None:
+            self._log.write(text)
+            self._log.flush()
+    
+    def record_usage(self, output_tokens=None, prompt_tokens=None, cached_prompt_tokens=None):
+        """Store the provider's token counts once the stream has finished"""
+        if output_tokens:
+            self.stats.output_tokens = output_tokens
+        if prompt_tokens is not None:
+            self.stats.prompt_tokens = prompt_tokens
+            self.stats.cached_prompt_tokens = cached_prompt_tokens
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.finished_at = time.perf_counter()
+        if self.echo:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+        if self._log is not None:
+            if exc_type is not None:
+                self._log.write(f"\n\n*Stream interrupted: {exc}*")
+            self._log.write(f"\n\n*Model: {self.model} · {self.stats.summary()}*\n\n---\n")
+            self._log.close()
+            self._log = None
+        return False
+
+class CallbackStream:
+    """Hands streamed text to a callback instead of the console, e.g. to forward it to a client"""
+    
+    def __init__(self, on_chunk, cancel_check=None):
+        self.on_chunk = on_chunk
+        # Called before every chunk; raising from it aborts the provider stream
+        self.cancel_check = cancel_check
+        self.stats = StreamStats()
+    
+    def write(self, text: str):
+        """Emit one chunk of the response"""
+        if self.cancel_check is not None:
+            self.cancel_check()
+        if not text:
+            return
+        if self.stats.first_token_at is None:
+            self.stats.first_token_at = time.perf_counter()
+        self.stats.chunks += 1
+        self.stats.characters += len(text)
+        self.on_chunk(text)
+    
+    def record_usage(self, output_tokens=None, prompt_tokens=None, cached_prompt_tokens=None):
+        """Store the provider's token counts once the stream has finished"""
+        if output_tokens:
+            self.stats.output_tokens = output_tokens
+        if prompt_tokens is not None:
+            self.stats.prompt_tokens = prompt_tokens
+            self.stats.cached_prompt_tokens = cached_prompt_tokens
+    
+    def finish(self):
+        self.stats.finished_at = time.perf_counter()
@@ -0,0 +1,23 @@
+from PIL import Image
+
+from ..cache import max_hash_distance, perceptual_hash
+
+
+def _reference_hash(img, hash_size):
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            value = (value << 1) | (small.getpixel((col, row)) > small.getpixel((col + 1, row)))
+    return value
+
+
+def test_hash_matches_bitwise_definition():
+    img = Image.effect_mandelbrot((320, 200), (-2, -1, 1, 1), 64).convert("RGB")
+    for hash_size in (5, 8, 64):  # 25 bits exercises the padded last byte
+        assert perceptual_hash(img, hash_size) == _reference_hash(img, hash_size)
+
+
+def test_distance_limit_scales_with_hash_size():
+    assert max_hash_distance(64, 1 / 256) == 16
+    assert max_hash_distance(16, 1 / 256) == 1
@@ -0,0 +1,73 @@
+import multiprocessing
+import time
+import uuid
+
+import pytest
+
+from .. import capture_daemon
+from ..capture_daemon import FrameRing
+
+WIDTH, HEIGHT = 32, 16
+# Big enough that the writer process's copy overlaps the reader's
+TORN_WIDTH, TORN_HEIGHT = 512, 256
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(f"sg-test-{uuid.uuid4().hex[:12]}", slots=4, slot_bytes=WIDTH * HEIGHT * 4, interval=0.0)
+    yield ring
+    ring.close()
+
+
+def _write(ring, value, captured_at):
+    """A frame whose every byte is value, so a torn copy mixes two values"""
+    ring.write(bytes([value]) * (WIDTH * HEIGHT * 4), WIDTH, HEIGHT, 0, 0, captured_at)
+
+
+def _write_forever(name, stop):
+    ring = FrameRing.attach(name)
+    size = TORN_WIDTH * TORN_HEIGHT * 4
+    seq = 0
+    while not stop.is_set():
+        seq += 1
+        ring.write(bytes([seq % 251]) * size, TORN_WIDTH, TORN_HEIGHT, 0, 0, float(seq))
+    ring.close()
+
+
+def test_reads_never_return_torn_frames():
+    # A separate writer process, so copies really run concurrently with reads
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    ring = FrameRing.create(f"sg-test-{uuid.uuid4().hex[:12]}", slots=4,
+                            slot_bytes=TORN_WIDTH * TORN_HEIGHT * 4, interval=0.0)
+    stop = context.Event()
+    writer = context.Process(target=_write_forever, args=(ring.shm.name, stop))
+    writer.start()
+    reads = 0
+    try:
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            frame = ring.read()
+            if frame is None:
+                continue
+            reads += 1
+            # Pixels and header must come from the same write
+            assert set(frame.raw) == {int(frame.captured_at) % 251}
+    finally:
+        stop.set()
+        writer.join()
+        ring.close()
+    assert reads
+
+
+def test_latest_frame_before_press(ring, monkeypatch):
+    monkeypatch.setattr(capture_daemon, "get_capture_daemon", lambda: ring)
+    now = time.time()
+    for i, captured_at in enumerate((now - 0.3, now - 0.2, now - 0.1)):
+        _write(ring, i, captured_at)
+
+    assert capture_daemon.latest_frame().captured_at == now - 0.1
+    assert capture_daemon.latest_frame(before=now - 0.15).captured_at == now - 0.2
+    # Nothing older than the press yet: the newest frame beats a live grab
+    assert capture_daemon.latest_frame(before=now - 1).captured_at == now - 0.1
+    # A stalled daemon's frames are not used
+    assert capture_daemon.latest_frame(max_age=0.05) is None
@@ -0,0 +1,52 @@
+import threading
+
+from ..jobs import AnalysisCancelled, AnalysisJob, AnalysisQueue
+
+
+class BlockingHandler:
+    """Handler whose first job waits for `release`, checking for cancellation meanwhile"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.handled = []
+        self.cancelled = []
+
+    def __call__(self, job):
+        if not self.handled and not self.cancelled:
+            self.started.set()
+            while not self.release.wait(0.01):
+                try:
+                    job.check()
+                except AnalysisCancelled:
+                    self.cancelled.append(job.id)
+                    return
+        self.handled.append(job.id)
+
+
+def test_burst_of_presses_collapses_to_newest():
+    handler = BlockingHandler()
+    queue = AnalysisQueue(handler, cancel_in_flight=False)
+    first = queue.submit(AnalysisJob())
+    assert handler.started.wait(1)
+    burst = [queue.submit(AnalysisJob()) for _ in range(5)]
+    handler.release.set()
+    assert queue.join(timeout=2)
+    queue.stop()
+    assert handler.handled == [first.id, burst[-1].id]
+    assert all(job.cancelled for job in burst[:-1])
+    assert queue.coalesced == 4
+
+
+def test_newer_press_cancels_running_job():
+    handler = BlockingHandler()
+    queue = AnalysisQueue(handler, cancel_in_flight=True)
+    first = queue.submit(AnalysisJob())
+    assert handler.started.wait(1)
+    second = queue.submit(AnalysisJob())
+    assert queue.join(timeout=2)
+    queue.stop()
+    assert first.cancelled and not second.cancelled
+    assert handler.cancelled == [first.id]
+    assert handler.handled == [second.id]
+    assert queue.cancelled == 1
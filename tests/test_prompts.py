@@ -0,0 +1,12 @@
+from ..prompts import PromptRegistry
+
+
+def test_plain_prompt_files_are_not_substituted(tmp_path):
+    (tmp_path / "plain.txt").write_text("Cost: $$5 for ${domain}")
+    assert PromptRegistry(tmp_path).render("plain", domain="debug").text == "Cost: $$5 for ${domain}"
+
+
+def test_template_files_opt_in_to_substitution(tmp_path):
+    (tmp_path / "shared.tmpl").write_text("Cost: $$5 for ${domain}, ${unknown}")
+    (tmp_path / "shared.txt").write_text("ignored")
+    assert PromptRegistry(tmp_path).render("shared", domain="debug").text == "Cost: $5 for debug, ${unknown}"
@@ -0,0 +1,28 @@
+import numpy as np
+
+from ..screenshots import FrameDiffer
+
+
+def _frame(value, width=64, height=48):
+    """Solid BGRA frame as mss returns it"""
+    frame = np.full((height, width, 4), value, dtype=np.uint8)
+    frame[..., 3] = 255
+    return frame
+
+
+def test_first_frame_counts_as_changed():
+    assert FrameDiffer().compare(_frame(0)) == (1.0, (0, 0, 64, 48))
+
+
+def test_black_to_white_is_fully_changed():
+    differ = FrameDiffer()
+    differ.accept(_frame(0))
+    fraction, box = differ.compare(_frame(255))
+    assert fraction == 1.0
+    assert box == (0, 0, 64, 48)
+
+
+def test_identical_frames_are_unchanged():
+    differ = FrameDiffer()
+    differ.accept(_frame(128))
+    assert differ.compare(_frame(128)) == (0.0, None)
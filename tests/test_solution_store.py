@@ -0,0 +1,66 @@
+from ..config import Config
+from ..solution_store import HASH_BANDS, SolutionStore, extract_problem_title, hash_bands
+
+MULTI_STEP_ANSWER = """Here is how to approach this problem.
+
+1. Use a hash map to remember each value's index
+2. For every number, look up its complement
+3. Return both indices when the complement is found
+
+Time complexity is O(n).
+"""
+
+
+def test_labelled_title():
+    assert extract_problem_title("**Problem**: Two Sum\n\n1. Use a hash map") == "Two Sum"
+
+
+def test_leetcode_number_title():
+    assert extract_problem_title("Solving LeetCode #42: Trapping Rain Water\n\n1. Use two pointers") == \
+        "42. Trapping Rain Water"
+
+
+def test_heading_title():
+    assert extract_problem_title("## 42. Trapping Rain Water\n\n1. Use two pointers") == "42. Trapping Rain Water"
+
+
+def test_numbered_title_on_leading_line():
+    assert extract_problem_title("1. Two Sum\n\n1. Use a hash map") == "1. Two Sum"
+
+
+def test_numbered_steps_are_not_a_title():
+    assert extract_problem_title(MULTI_STEP_ANSWER) is None
+
+
+def test_multi_step_answers_are_not_analyzed_before():
+    store = SolutionStore(":memory:")
+    store.add(MULTI_STEP_ANSWER)
+    other = MULTI_STEP_ANSWER.replace("hash map", "sorted array")
+    assert store.find_solved(title=extract_problem_title(other)) is None
+    store.close()
+
+
+def test_generic_headings_are_not_titles():
+    assert extract_problem_title("## Approach\n\n1. Use a hash map\n\n## Complexity\n\nO(n)") is None
+    assert extract_problem_title("## Approach\n\n## 1. Two Sum") == "1. Two Sum"
+
+
+def test_uniform_hash_bands_are_not_indexed():
+    bits = Config.CACHE_HASH_SIZE ** 2
+    width = bits // HASH_BANDS
+    # Band 0 carries detail, every other band is blank screen
+    detail = 0b1011
+    assert hash_bands(detail) == [(0, "b")]
+    assert hash_bands(((1 << width) - 1) << width | detail) == [(0, "b")]
+    assert hash_bands(0) == []
+
+
+def test_near_duplicate_screen_found_through_bands():
+    store = SolutionStore(":memory:")
+    bits = Config.CACHE_HASH_SIZE ** 2
+    screen = int.from_bytes(bytes(range(256)) * (bits // 2048), "big")
+    store.add("Answer", title="1. Two Sum", screenshot_hash=screen)
+    store.add("Other answer", title="2. Add Two Numbers", screenshot_hash=screen ^ ((1 << bits) - 1))
+    assert store.find_solved(screenshot_hash=screen ^ 0b10101).title == "1. Two Sum"
+    assert store.find_solved(screenshot_hash=0) is None
+    store.close()
@@ -0,0 +1,128 @@
+"""
+Tiled analysis of high-resolution screens for the LeetCode AI Assistant
+
+Small local vision models (gemma3:4b and the like) scale a whole 4K screenshot
+down to their native input size of a few hundred pixels, and problem text and
+code become unreadable. In tiling mode the capture is cut into overlapping
+tiles close to that native size. Each tile is transcribed by its own concurrent
+request, and one final text-only request reasons over the transcripts in
+reading order (see analysis.analyze_tiled).
+"""
+import math
+from dataclasses import dataclass
+
+from .config import Config
+
+# Stable across tiles, so it goes out as the cacheable system prompt
+TILE_SYSTEM_PROMPT = """You transcribe screenshots. Reply with every piece of text and code visible in the image, exactly as shown, keeping line breaks and code indentation.
+Do not explain, summarize, answer or solve anything. Text cut off at the image edge may be left partial. Reply with nothing if there is no text."""
+
+TILE_INSTRUCTION = "This is tile {number} of {count} ({position}) of a larger screenshot. Transcribe it."
+
+TILED_PROMPT_TEMPLATE = """The screen was cut into {count} overlapping tiles ({rows} rows x {columns} columns) that were transcribed separately, because a single image would have been too small to read.
+Transcripts appear in reading order. Text along tile edges can repeat in the neighbouring tile or be cut off; treat the tiles as one continuous screen.
+{tiles}"""
+
+@dataclass
+class Tile:
+    """One region of the capture"""
+
+    index: int
+    row: int
+    column: int
+    box: tuple  # (left, top, right, bottom) in capture pixels
+    image: object  # RGB PIL image of the region
+
+    def position(self, rows, columns) -> str:
+        vertical = ("top", "middle", "bottom")[0 if self.row == 0 else 2 if self.row == rows - 1 else 1] if rows > 1 else ""
+        horizontal = ("left", "centre", "right")[0 if self.column == 0 else 2 if self.column == columns - 1 else 1] if columns > 1 else ""
+        where = " ".join(part for part in (vertical, horizontal) if part) or "whole screen"
+        return f"row {self.row + 1}, column {self.column + 1}, {where}"
+
+def _starts(length, tile, overlap):
+    """Evenly spread tile offsets along one axis so neighbours overlap by at least `overlap`"""
+    if length <= tile:
+        return [0]
+    count = math.ceil((length - overlap) / (tile - overlap))
+    step = (length - tile) / (count - 1)
+    return [round(i * step) for i in range(count)]
+
+def tile_grid(width, height, tile_size=None, overlap=None, max_tiles=None):
+    """
+    Tile boxes covering a width x height screen
+
+    Tiles start at tile_size pixels; when that would take more than max_tiles,
+    they grow until the grid fits (and are downscaled to tile_size on upload).
+
+    Returns:
+        (rows, columns, [(row, column, (left, top, right, bottom)), ...])
+    """
+    tile_size = tile_size or Config.TILE_SIZE
+    overlap = Config.TILE_OVERLAP if overlap is None else overlap
+    max_tiles = max_tiles or Config.TILE_MAX_TILES
+    size = tile_size
+    while True:
+        xs = _starts(width, size, overlap)
+        ys = _starts(height, size, overlap)
+        if len(xs) * len(ys) <= max_tiles:
+            break
+        size = math.ceil(size * 1.25)
+    boxes = [
+        (row, column, (x, y, min(width, x + size), min(height, y + size)))
+        for row, y in enumerate(ys)
+        for column, x in enumerate(xs)
+    ]
+    return len(ys), len(xs), boxes
+
+def is_blank(img, tolerance=None) -> bool:
+    """True for a region of a single colour (to within tolerance), which has nothing to transcribe"""
+    tolerance = Config.AUTO_CROP_TOLERANCE if tolerance is None else tolerance
+    low, high = img.convert("L").getextrema()
+    return high - low <= tolerance
+
+def split_tiles(img, tile_size=None, overlap=None, max_tiles=None):
+    """
+    Cut an RGB image into overlapping tiles, leaving out blank ones
+
+    Returns:
+        (tiles, rows, columns)
+    """
+    rows, columns, boxes = tile_grid(img.width, img.height, tile_size, overlap, max_tiles)
+    tiles = []
+    for row, column, box in boxes:
+        region = img.crop(box)
+        if not is_blank(region):
+            tiles.append(Tile(len(tiles), row, column, box, region))
+    return tiles, rows, columns
+
+def should_tile(img, backend, mode=None) -> bool:
+    """
+    Whether an analysis should go through tiling
+
+    "on" tiles every screen larger than one tile; "auto" only does so for the
+    backends in Config.TILE_AUTO_BACKENDS and screens whose long edge is at
+    least Config.TILE_AUTO_MIN_EDGE.
+    """
+    mode = mode or Config.TILING
+    if mode not in Config.TILING_MODES:
+        raise ValueError(f"Unknown tiling mode '{mode}', expected one of {Config.TILING_MODES}")
+    long_edge = max(img.size)
+    if mode == "off" or long_edge <= Config.TILE_SIZE:
+        return False
+    if mode == "on":
+        return True
+    return backend.name in Config.TILE_AUTO_BACKENDS and long_edge >= Config.TILE_AUTO_MIN_EDGE
+
+def tile_instruction(tile, count, rows, columns) -> str:
+    return TILE_INSTRUCTION.format(number=tile.index + 1, count=count, position=tile.position(rows, columns))
+
+def build_tiled_prompt(tiles, transcripts, rows, columns) -> str:
+    """The final request's text: every tile's transcript, tagged with its place on the screen"""
+    sections = []
+    for tile, transcript in zip(tiles, transcripts):
+        if transcript is None:
+            body = "(this tile could not be transcribed)"
+        else:
+            body = transcript.strip() or "(no text)"
+        sections.append(f'<tile number="{tile.index + 1}" position="{tile.position(rows, columns)}">\n{body}\n</tile>')
+    return TILED_PROMPT_TEMPLATE.format(count=len(tiles), rows=rows, columns=columns, tiles="\n".join(sections))